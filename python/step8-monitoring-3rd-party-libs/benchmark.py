@@ -0,0 +1,392 @@
+"""Synthesis benchmark for the containers and monitoring helpers.
+
+Builds synthetic apps shaped like my-container-infra.py with an increasing
+number of services and reports construct-creation time, synth time, peak RSS
+(of Python and of the jsii node runtime) and template size. Everything runs offline; no AWS account or context lookups
+are needed. Rollout time is estimated from the deployment and health check
+settings with containers.estimate_rollout_seconds, as a deployment is not run.
+
+    uv run benchmark.py                      # run default sizes, print a table
+    uv run benchmark.py --save-baseline      # store results in benchmark-baseline.json
+    uv run benchmark.py --compare            # fail if slower/larger than the baseline
+                                             # (saved with the same mode flags)
+    uv run benchmark.py --bulk               # build services with add_services
+    uv run benchmark.py --shared-alb         # ... behind one shared load balancer
+    uv run benchmark.py --deployment fast    # with the fast deployment preset
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, TypedDict
+import aws_cdk as cdk
+from aws_cdk import (
+    aws_cloudwatch as cw,
+    aws_ec2 as ec2,
+    aws_sns as sns,
+)
+import cdk_monitoring_constructs as cdkmon
+import containers
+import monitoring
+
+DEFAULT_SIZES = [1, 10, 50, 100, 200]
+DEFAULT_BASELINE_FILE = "benchmark-baseline.json"
+DEFAULT_TOLERANCE = 0.25
+COMPARED_KEYS = [
+    "construct_seconds",
+    "synth_seconds",
+    "peak_rss_kib",
+    "node_peak_rss_kib",
+    "template_bytes",
+    "rollout_seconds",
+]
+
+
+class BenchmarkResult(TypedDict):
+    services: int
+    construct_seconds: float
+    synth_seconds: float
+    peak_rss_kib: int
+    node_peak_rss_kib: int
+    template_bytes: int
+    rollout_seconds: float
+
+
+class BenchmarkModes(TypedDict):
+    bulk: bool
+    shared_alb: bool
+    deployment: containers.DeploymentPresetName | None
+
+
+class BenchmarkBaseline(TypedDict):
+    modes: BenchmarkModes
+    results: List[BenchmarkResult]
+
+
+def service_specs(
+    service_count: int, deployment: containers.DeploymentConfig | None = None
+) -> List[containers.ServiceSpec]:
+    """Service specs matching the single service in my-container-infra.py."""
+    specs = [
+        containers.ServiceSpec(
+            task=containers.TaskConfig(
+                cpu=512, memory_limit_mib=1024, family=f"webapp{index}"
+            ),
+            container=containers.ContainerConfig(
+                image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+                tcp_ports=[8000],
+            ),
+            port=8000,
+            desired_count=2,
+            use_public_endpoint=True,
+            routing=containers.RoutingConfig(
+                priority=index + 1, path_patterns=[f"/webapp{index}/*"]
+            ),
+            scaling=containers.ServiceScalingConfig(
+                min_count=1,
+                max_count=4,
+                scale_cpu_target=containers.ScalingThreshold(percent=50),
+                scale_memory_target=containers.ScalingThreshold(percent=70),
+            ),
+        )
+        for index in range(service_count)
+    ]
+    if deployment is not None:
+        for spec in specs:
+            spec["deployment"] = deployment
+    return specs
+
+
+def estimate_rollout_seconds(
+    specs: List[containers.ServiceSpec], shared_alb: bool = False
+) -> float:
+    """Estimated rollout time of a deployment that updates all services.
+
+    CloudFormation updates the services in parallel, so this is the time of
+    the slowest service. Services on a shared load balancer get the target
+    group defaults of add_routed_service, otherwise the load balancer's own.
+    """
+    return max(
+        containers.estimate_rollout_seconds(
+            spec["desired_count"],
+            spec.get("deployment"),
+            spec.get("target_group", containers.DEFAULT_TARGET_GROUP_CONFIG if shared_alb else None),
+        )
+        for spec in specs
+    )
+
+
+def build_stack(
+    scope: cdk.App,
+    service_count: int,
+    bulk: bool = False,
+    shared_alb: bool = False,
+    deployment: containers.DeploymentConfig | None = None,
+) -> cdk.Stack:
+    """Build a stack like my-container-infra.py, with service_count services.
+
+    With bulk=True the services are built with containers.add_services,
+    otherwise one at a time as in my-container-infra.py. With shared_alb=True
+    they are built in bulk behind a single shared load balancer.
+    """
+    stack = cdk.Stack(scope, "benchmark-infra")
+    vpc = ec2.Vpc(stack, "vpc", vpc_name="my-vpc", nat_gateways=1, max_azs=2)
+    cluster = containers.add_cluster(
+        stack, "my-test-cluster", containers.ClusterConfig(vpc=vpc)
+    )
+
+    alarm_topic = sns.Topic(stack, "alarm-topic", display_name="Alarm topic")
+    mon = monitoring.init_monitoring(
+        stack,
+        monitoring.MonitoringConfig(
+            dashboard_name="monitoring", default_alarm_topic=alarm_topic
+        ),
+    )
+
+    specs = service_specs(service_count, deployment)
+    if shared_alb:
+        listener = containers.add_shared_load_balancer(stack, "shared-alb", cluster)
+        services = containers.add_services(stack, cluster, specs, listener=listener)
+    elif bulk:
+        services = containers.add_services(stack, cluster, specs)
+    else:
+        services = {}
+        for spec in specs:
+            family = spec["task"]["family"]
+            taskdef = containers.add_task_definition_with_container(
+                stack, f"taskdef-{family}", spec["task"], spec["container"]
+            )
+            service = containers.add_service(
+                stack,
+                f"service-{family}",
+                cluster,
+                taskdef,
+                spec["port"],
+                spec["desired_count"],
+                spec["use_public_endpoint"],
+                deployment=deployment,
+            )
+            containers.set_service_scaling(
+                service=service.service, config=spec["scaling"]
+            )
+            services[family] = service
+
+    for family, service in services.items():
+        running_task_count_alarm = {
+            "alarm1": cdkmon.RunningTaskCountThreshold(
+                max_running_tasks=2,
+                comparison_operator_override=cw.ComparisonOperator.LESS_THAN_THRESHOLD,
+                evaluation_periods=2,
+                datapoints_to_alarm=2,
+                period=cdk.Duration.minutes(5),
+            )
+        }
+        if isinstance(service, dict):
+            mon["handler"].monitor_simple_fargate_service(
+                fargate_service=service["service"],
+                human_readable_name=f"Service {family}",
+                alarm_friendly_name=family,
+                add_running_task_count_alarm=running_task_count_alarm,
+            )
+        else:
+            mon["handler"].monitor_fargate_service(
+                fargate_service=service,
+                human_readable_name=f"Service {family}",
+                alarm_friendly_name=family,
+                add_running_task_count_alarm=running_task_count_alarm,
+            )
+    return stack
+
+
+def _child_peak_rss_kib() -> int:
+    """Peak RSS of the child processes (the jsii node runtime), Linux only."""
+    peak = 0
+    try:
+        tasks = os.listdir("/proc/self/task")
+    except FileNotFoundError:
+        return peak
+    for task in tasks:
+        with open(f"/proc/self/task/{task}/children") as f:
+            children = f.read().split()
+        for pid in children:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = max(peak, int(line.split()[1]))
+    return peak
+
+
+def run_benchmark(
+    service_count: int,
+    bulk: bool = False,
+    shared_alb: bool = False,
+    deployment: containers.DeploymentConfig | None = None,
+) -> BenchmarkResult:
+    """Build and synthesize one app and measure it.
+
+    Peak RSS is the high-water mark of the current process, so each size
+    should be measured in a fresh process to get comparable numbers.
+    """
+    with tempfile.TemporaryDirectory() as outdir:
+        # The per-stack resource limit would stop large sizes from synthesizing.
+        app = cdk.App(
+            outdir=outdir, context={"@aws-cdk/core:stackResourceLimit": 0}
+        )
+        start = time.perf_counter()
+        stack = build_stack(app, service_count, bulk, shared_alb, deployment)
+        construct_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assembly = app.synth()
+        synth_seconds = time.perf_counter() - start
+
+        artifact = assembly.get_stack_artifact(stack.artifact_id)
+        template_bytes = os.path.getsize(artifact.template_full_path)
+
+    return BenchmarkResult(
+        services=service_count,
+        construct_seconds=round(construct_seconds, 3),
+        synth_seconds=round(synth_seconds, 3),
+        peak_rss_kib=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        node_peak_rss_kib=_child_peak_rss_kib(),
+        template_bytes=template_bytes,
+        rollout_seconds=estimate_rollout_seconds(
+            service_specs(service_count, deployment), shared_alb
+        ),
+    )
+
+
+def run_isolated(
+    service_count: int,
+    bulk: bool = False,
+    shared_alb: bool = False,
+    deployment_preset: containers.DeploymentPresetName | None = None,
+) -> BenchmarkResult:
+    """Run a single benchmark size in a separate Python process."""
+    command = [sys.executable, __file__, "--single", str(service_count)]
+    if bulk:
+        command.append("--bulk")
+    if shared_alb:
+        command.append("--shared-alb")
+    if deployment_preset:
+        command += ["--deployment", deployment_preset]
+    output = subprocess.run(
+        command,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare_with_baseline(
+    results: List[BenchmarkResult],
+    baseline: BenchmarkBaseline,
+    modes: BenchmarkModes,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """Return a description of every measurement that regressed beyond tolerance.
+
+    Results of different modes are not comparable, so a baseline saved with
+    other modes, or without its modes, is rejected.
+    """
+    if not isinstance(baseline, dict) or baseline.get("modes") != modes:
+        recorded = baseline.get("modes") if isinstance(baseline, dict) else None
+        raise ValueError(
+            f"Baseline was saved with modes {recorded}, not {modes}; "
+            "save a new baseline with --save-baseline"
+        )
+    baseline_by_size: Dict[int, BenchmarkResult] = {
+        entry["services"]: entry for entry in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        reference = baseline_by_size.get(result["services"])
+        if reference is None:
+            continue
+        for key in COMPARED_KEYS:
+            if key in reference and result[key] > reference[key] * (1 + tolerance):
+                regressions.append(
+                    f"{result['services']} services: {key} {result[key]} > baseline {reference[key]}"
+                )
+    return regressions
+
+
+def format_table(results: List[BenchmarkResult]) -> str:
+    lines = [
+        f"{'services':>8} {'construct s':>12} {'synth s':>9} {'peak RSS KiB':>13} "
+        f"{'node RSS KiB':>13} {'template B':>11} {'rollout s':>10}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['services']:>8} {result['construct_seconds']:>12.3f} "
+            f"{result['synth_seconds']:>9.3f} {result['peak_rss_kib']:>13} "
+            f"{result['node_peak_rss_kib']:>13} "
+            f"{result['template_bytes']:>11} {result['rollout_seconds']:>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument(
+        "--bulk", action="store_true", help="build services with add_services"
+    )
+    parser.add_argument(
+        "--shared-alb",
+        action="store_true",
+        help="build services in bulk behind one shared load balancer",
+    )
+    parser.add_argument(
+        "--deployment",
+        choices=list(containers.DEPLOYMENT_PRESETS),
+        help="deployment preset for the services",
+    )
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    deployment = (
+        containers.DeploymentConfig(preset=args.deployment) if args.deployment else None
+    )
+    if args.single is not None:
+        print(json.dumps(run_benchmark(args.single, args.bulk, args.shared_alb, deployment)))
+        return 0
+
+    modes = BenchmarkModes(bulk=args.bulk, shared_alb=args.shared_alb, deployment=args.deployment)
+    results = [
+        run_isolated(size, args.bulk, args.shared_alb, args.deployment)
+        for size in args.sizes
+    ]
+    print(format_table(results))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(BenchmarkBaseline(modes=modes, results=results), f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare_with_baseline(results, baseline, modes, args.tolerance)
+        except ValueError as error:
+            print(f"ERROR: {error}")
+            return 2
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
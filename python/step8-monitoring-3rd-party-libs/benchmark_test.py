@@ -0,0 +1,93 @@
+import pytest
+import aws_cdk as cdk
+from aws_cdk import assertions
+import benchmark
+import containers
+
+
+def test_build_stack_creates_requested_number_of_services():
+    app = cdk.App()
+    stack = benchmark.build_stack(app, 2)
+
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::ECS::Cluster", 1)
+    template.resource_count_is("AWS::ECS::TaskDefinition", 2)
+    template.resource_count_is("AWS::ECS::Service", 2)
+    template.resource_count_is("AWS::CloudWatch::Dashboard", 1)
+
+
+MODES = benchmark.BenchmarkModes(bulk=False, shared_alb=False, deployment=None)
+
+
+def test_compare_with_baseline_reports_regressions_beyond_tolerance():
+    baseline = benchmark.BenchmarkBaseline(modes=MODES, results=[
+        benchmark.BenchmarkResult(
+            services=10,
+            construct_seconds=1.0,
+            synth_seconds=2.0,
+            peak_rss_kib=1000,
+            node_peak_rss_kib=1000,
+            template_bytes=5000,
+            rollout_seconds=100.0,
+        )
+    ])
+    results = [
+        benchmark.BenchmarkResult(
+            services=10,
+            construct_seconds=1.1,
+            synth_seconds=3.0,
+            peak_rss_kib=1000,
+            node_peak_rss_kib=1000,
+            template_bytes=5000,
+            rollout_seconds=100.0,
+        ),
+        benchmark.BenchmarkResult(
+            services=50,
+            construct_seconds=9.0,
+            synth_seconds=9.0,
+            peak_rss_kib=9000,
+            node_peak_rss_kib=9000,
+            template_bytes=90000,
+            rollout_seconds=900.0,
+        ),
+    ]
+
+    regressions = benchmark.compare_with_baseline(results, baseline, MODES, tolerance=0.25)
+
+    assert len(regressions) == 1
+    assert "synth_seconds" in regressions[0]
+
+
+def test_compare_with_baseline_rejects_other_modes():
+    baseline = benchmark.BenchmarkBaseline(modes=MODES, results=[])
+
+    with pytest.raises(ValueError):
+        benchmark.compare_with_baseline([], baseline, {**MODES, "bulk": True})
+    with pytest.raises(ValueError):
+        benchmark.compare_with_baseline([], [], MODES)  # type: ignore
+
+
+def test_build_stack_in_bulk_mode_shares_log_group():
+    app = cdk.App()
+    stack = benchmark.build_stack(app, 2, bulk=True)
+
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::ECS::Service", 2)
+    template.resource_count_is("AWS::Logs::LogGroup", 1)
+
+
+def test_build_stack_with_shared_alb_creates_one_load_balancer():
+    app = cdk.App()
+    stack = benchmark.build_stack(app, 2, shared_alb=True)
+
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::ECS::Service", 2)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 1)
+
+
+def test_rollout_estimate_uses_deployment_preset():
+    fast = benchmark.estimate_rollout_seconds(
+        benchmark.service_specs(3, containers.DeploymentConfig(preset="fast"))
+    )
+
+    assert fast < benchmark.estimate_rollout_seconds(benchmark.service_specs(3))
@@ -0,0 +1,303 @@
+"""Declarative service catalog for my-container-infra.py.
+
+The catalog is a TOML (or, with PyYAML installed, YAML) file with one entry
+per service. Each entry has the keys of containers.ServiceSpec, with task,
+container and scaling sections, plus a monitoring section:
+
+    [dashboard]
+    dashboard_name = "monitoring"
+    alarm_emails = ["hello@example.com"]
+
+    [services.webapp]
+    port = 8000
+    desired_count = 2
+
+    [services.webapp.task]
+    cpu = 512
+    memory_limit_mib = 1024
+
+    [services.webapp.container]
+    image = "public.ecr.aws/aws-containers/hello-app-runner:latest"
+    tcp_ports = [8000]
+
+    [services.webapp.scaling]
+    min_count = 1
+    max_count = 4
+    scale_cpu_target = { percent = 50 }
+
+    [services.webapp.monitoring]
+    human_readable_name = "My test service"
+    min_running_tasks = 2
+
+The task family defaults to the service name. An optional [network] section
+sets NAT gateways and VPC endpoints, see networking.py, and an optional
+[sharding] section spreads the services over several stacks, see sharding.py.
+An optional [cluster] section sets the Container Insights mode.
+The dashboard section can add anomaly detection and metric math alarms to
+every service, see monitoring.add_service_anomaly_alarms. The whole catalog is
+validated before anything is built, and all problems are reported together.
+"""
+import hashlib
+import json
+import os
+import tomllib
+import types
+import typing
+from typing import Any, Dict, List, Literal, NotRequired, TypedDict
+import containers
+import monitoring
+import networking
+import sharding
+
+DEFAULT_CATALOG_FILE = "services.toml"
+DEFAULT_STATE_FILE = ".catalog-state.json"
+
+
+class CatalogError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("Invalid service catalog:\n  " + "\n  ".join(errors))
+        self.errors = errors
+
+
+class DashboardConfig(TypedDict):
+    dashboard_name: str
+    default_alarm_name_prefix: NotRequired[str]
+    alarm_emails: NotRequired[List[str]]
+    anomaly_detection: NotRequired[monitoring.AnomalyDetectionConfig]
+    metric_math: NotRequired[monitoring.MetricMathConfig]
+
+
+class ServiceMonitoringConfig(TypedDict):
+    human_readable_name: NotRequired[str]
+    min_running_tasks: NotRequired[int]
+    slos: NotRequired[monitoring.ServiceSloConfig]
+    custom_metrics: NotRequired[List[monitoring.CustomMetricConfig]]
+    task_resources: NotRequired[monitoring.TaskResourceMonitoringConfig]
+
+
+class LoadBalancerConfig(TypedDict):
+    shared: bool
+    port: NotRequired[int]
+    use_public_endpoint: NotRequired[bool]
+
+
+class ClusterSettings(TypedDict):
+    container_insights: NotRequired[containers.ContainerInsightsMode]
+    enable_fargate_capacity_providers: NotRequired[bool]
+
+
+class ServiceCatalog(TypedDict):
+    dashboard: DashboardConfig
+    cluster: NotRequired[ClusterSettings]
+    load_balancer: NotRequired[LoadBalancerConfig]
+    network: NotRequired[networking.NetworkConfig]
+    sharding: NotRequired[sharding.ShardingConfig]
+    services: Dict[str, containers.ServiceSpec]
+    monitoring: Dict[str, ServiceMonitoringConfig]
+
+
+def _read(path: str) -> Dict[str, Any]:
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise CatalogError([f"{path}: reading YAML catalogs needs PyYAML installed"])
+        with open(path) as f:
+            return yaml.safe_load(f) or {}
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def _check_type(value: Any, expected: Any, path: str, errors: List[str]):
+    """Check a parsed value against a type annotation from a TypedDict."""
+    origin = typing.get_origin(expected)
+    if typing.is_typeddict(expected):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected a table")
+            return
+        hints = typing.get_type_hints(expected)
+        for key in sorted(expected.__required_keys__ - value.keys()):
+            errors.append(f"{path}.{key}: missing")
+        for key, item in value.items():
+            if key not in hints:
+                errors.append(f"{path}.{key}: unknown key")
+            else:
+                _check_type(item, hints[key], f"{path}.{key}", errors)
+    elif origin is Literal:
+        if value not in typing.get_args(expected):
+            errors.append(f"{path}: {value!r} is not one of {list(typing.get_args(expected))}")
+    elif origin in (list, List):
+        if not isinstance(value, list):
+            errors.append(f"{path}: expected a list")
+            return
+        (item_type,) = typing.get_args(expected)
+        for position, item in enumerate(value):
+            _check_type(item, item_type, f"{path}[{position}]", errors)
+    elif origin in (dict, Dict):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected a table")
+            return
+        _, item_type = typing.get_args(expected)
+        for key, item in value.items():
+            _check_type(item, item_type, f"{path}.{key}", errors)
+    elif origin in (typing.Union, types.UnionType):
+        attempts = []
+        for option in typing.get_args(expected):
+            option_errors: List[str] = []
+            _check_type(value, option, path, option_errors)
+            if not option_errors:
+                return
+            attempts.extend(option_errors)
+        errors.extend(attempts[:1])
+    elif expected is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{path}: expected a number")
+    elif expected in (int, str, bool):
+        if isinstance(value, bool) != (expected is bool) or not isinstance(value, expected):
+            errors.append(f"{path}: expected {expected.__name__}")
+    else:
+        errors.append(f"{path}: cannot be set in a catalog")
+
+
+def _check_service(name: str, spec: containers.ServiceSpec, shared_lb: bool, errors: List[str]):
+    path = f"services.{name}"
+    container_configs = [spec["container"], *spec.get("sidecars", [])]
+    try:
+        containers.validate_task(spec["task"], container_configs, spec.get("logging"))
+    except ValueError as e:
+        errors.append(f"{path}: {e}")
+    if spec["port"] not in spec["container"]["tcp_ports"]:
+        errors.append(f"{path}.port: {spec['port']} is not one of the container tcp_ports")
+    scaling = spec.get("scaling")
+    if scaling is not None and scaling["min_count"] > scaling["max_count"]:
+        errors.append(f"{path}.scaling: min_count is larger than max_count")
+    if "scaling_time_zone" in spec and "scaling_profile" not in spec:
+        errors.append(f"{path}.scaling_time_zone: only used with a scaling_profile")
+    try:
+        deployment = containers.deployment_settings(spec.get("deployment"))
+    except ValueError as e:
+        errors.append(f"{path}.deployment: {e}")
+    else:
+        if shared_lb and deployment.get("strategy") == "blue_green":
+            errors.append(f"{path}.deployment: blue_green needs a load balancer per service")
+        if (
+            deployment.get("strategy") == "blue_green"
+            and deployment.get("test_listener_port", containers.DEFAULT_TEST_LISTENER_PORT) == spec["port"]
+        ):
+            errors.append(f"{path}.deployment.test_listener_port: must differ from the service port")
+    if shared_lb and "routing" not in spec:
+        errors.append(f"{path}.routing: needed with a shared load balancer")
+    if not shared_lb and "routing" in spec:
+        errors.append(f"{path}.routing: only used with a shared load balancer")
+
+
+def parse_catalog(data: Dict[str, Any]) -> ServiceCatalog:
+    """Validate parsed catalog data and split it into service specs and monitoring."""
+    errors: List[str] = []
+    raw_services = data.get("services")
+    if not isinstance(raw_services, dict) or not raw_services:
+        raise CatalogError(["services: at least one service is needed"])
+
+    services: Dict[str, containers.ServiceSpec] = {}
+    monitoring: Dict[str, ServiceMonitoringConfig] = {}
+    for name, entry in raw_services.items():
+        if not isinstance(entry, dict):
+            errors.append(f"services.{name}: expected a table")
+            continue
+        entry = dict(entry)
+        service_monitoring = entry.pop("monitoring", {})
+        if isinstance(entry.get("task"), dict):
+            entry["task"] = {"family": name, **entry["task"]}
+        _check_type(service_monitoring, ServiceMonitoringConfig, f"services.{name}.monitoring", errors)
+        _check_type(entry, containers.ServiceSpec, f"services.{name}", errors)
+        services[name] = entry  # type: ignore
+        monitoring[name] = service_monitoring
+
+    _check_type(data.get("dashboard"), DashboardConfig, "dashboard", errors)
+    if "cluster" in data:
+        _check_type(data["cluster"], ClusterSettings, "cluster", errors)
+    if "load_balancer" in data:
+        _check_type(data["load_balancer"], LoadBalancerConfig, "load_balancer", errors)
+    if "network" in data:
+        _check_type(data["network"], networking.NetworkConfig, "network", errors)
+    if "sharding" in data:
+        _check_type(data["sharding"], sharding.ShardingConfig, "sharding", errors)
+    unknown = set(data) - {"dashboard", "cluster", "load_balancer", "network", "sharding", "services"}
+    errors.extend(f"{key}: unknown key" for key in sorted(unknown))
+    if errors:
+        raise CatalogError(errors)
+
+    shared_lb = data.get("load_balancer", {}).get("shared", False)
+    insights = data.get("cluster", {}).get("container_insights")
+    capacity_providers = data.get("cluster", {}).get("enable_fargate_capacity_providers", False)
+    families = [spec["task"]["family"] for spec in services.values()]
+    duplicates = sorted({family for family in families if families.count(family) > 1})
+    if duplicates:
+        errors.append(f"services: duplicate task families {duplicates}")
+    for name, spec in services.items():
+        _check_service(name, spec, shared_lb, errors)
+        if spec.get("capacity_provider_strategies") and not capacity_providers:
+            errors.append(
+                f"services.{name}.capacity_provider_strategies: "
+                "needs cluster.enable_fargate_capacity_providers = true"
+            )
+        if shared_lb and "max_rejected_connections" in monitoring[name].get("slos", {}):
+            errors.append(
+                f"services.{name}.monitoring.slos.max_rejected_connections: "
+                "not available with a shared load balancer"
+            )
+        if "custom_metrics" in monitoring[name] and "emf_namespace" not in spec.get("logging", {}):
+            errors.append(f"services.{name}.monitoring.custom_metrics: needs logging.emf_namespace")
+        for position, metric in enumerate(monitoring[name].get("custom_metrics", [])):
+            # EMF metrics always have the dimensions the app publishes them with.
+            if "json_field" not in metric and "dimensions" not in metric:
+                errors.append(
+                    f"services.{name}.monitoring.custom_metrics[{position}].dimensions: "
+                    "needed for embedded metric format metrics"
+                )
+        if "task_resources" in monitoring[name] and insights != "enhanced":
+            errors.append(
+                f"services.{name}.monitoring.task_resources: needs cluster.container_insights = \"enhanced\""
+            )
+    if errors:
+        raise CatalogError(errors)
+
+    catalog = ServiceCatalog(
+        dashboard=data["dashboard"], services=services, monitoring=monitoring
+    )
+    for key in ("cluster", "load_balancer", "network", "sharding"):
+        if key in data:
+            catalog[key] = data[key]
+    return catalog
+
+
+def load_catalog(path: str = DEFAULT_CATALOG_FILE) -> ServiceCatalog:
+    return parse_catalog(_read(path))
+
+
+def entry_hashes(catalog: ServiceCatalog) -> Dict[str, str]:
+    """Hash of each service's spec and monitoring settings."""
+    return {
+        name: hashlib.sha256(
+            json.dumps([spec, catalog["monitoring"][name]], sort_keys=True).encode()
+        ).hexdigest()
+        for name, spec in catalog["services"].items()
+    }
+
+
+def changed_services(
+    catalog: ServiceCatalog, state_file: str = DEFAULT_STATE_FILE
+) -> List[str]:
+    """Names of services that are new or changed since the state was last saved."""
+    previous: Dict[str, str] = {}
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            previous = json.load(f)
+    return [
+        name for name, digest in entry_hashes(catalog).items() if previous.get(name) != digest
+    ]
+
+
+def save_state(catalog: ServiceCatalog, state_file: str = DEFAULT_STATE_FILE):
+    with open(state_file, "w") as f:
+        json.dump(entry_hashes(catalog), f, indent=2, sort_keys=True)
@@ -0,0 +1,191 @@
+import copy
+import pytest
+import catalog
+
+VALID_CATALOG = {
+    "dashboard": {"dashboard_name": "monitoring", "alarm_emails": ["hello@example.com"]},
+    "services": {
+        "webapp": {
+            "port": 8000,
+            "desired_count": 2,
+            "task": {"cpu": 512, "memory_limit_mib": 1024},
+            "container": {
+                "image": "public.ecr.aws/aws-containers/hello-app-runner:latest",
+                "tcp_ports": [8000],
+            },
+            "scaling": {
+                "min_count": 1,
+                "max_count": 4,
+                "scale_cpu_target": {"percent": 50},
+            },
+            "monitoring": {"human_readable_name": "My test service", "min_running_tasks": 2},
+        }
+    },
+}
+
+
+def test_catalog_maps_entries_onto_service_specs():
+    service_catalog = catalog.parse_catalog(copy.deepcopy(VALID_CATALOG))
+
+    spec = service_catalog["services"]["webapp"]
+    assert spec["task"] == {"family": "webapp", "cpu": 512, "memory_limit_mib": 1024}
+    assert spec["scaling"]["scale_cpu_target"]["percent"] == 50
+    assert "monitoring" not in spec
+    assert service_catalog["monitoring"]["webapp"]["min_running_tasks"] == 2
+    assert service_catalog["dashboard"]["dashboard_name"] == "monitoring"
+
+
+def test_catalog_reports_all_problems_at_once():
+    data = copy.deepcopy(VALID_CATALOG)
+    service = data["services"]["webapp"]
+    service["task"]["cpu"] = 300
+    service["container"]["tcp_ports"] = ["8000"]
+    service["scaling"]["max_count"] = 0
+    service["desired_count"] = "two"
+    service["unknown"] = True
+    del data["dashboard"]["dashboard_name"]
+
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+
+    messages = "\n".join(error.value.errors)
+    assert "services.webapp.task.cpu" in messages
+    assert "services.webapp.container.tcp_ports[0]" in messages
+    assert "services.webapp.desired_count" in messages
+    assert "services.webapp.unknown: unknown key" in messages
+    assert "dashboard.dashboard_name: missing" in messages
+
+
+def test_catalog_checks_task_size_and_scaling_bounds():
+    data = copy.deepcopy(VALID_CATALOG)
+    data["services"]["webapp"]["task"]["memory_limit_mib"] = 8192
+    data["services"]["webapp"]["scaling"]["min_count"] = 10
+
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+
+    messages = "\n".join(error.value.errors)
+    assert "Invalid Fargate memory" in messages
+    assert "min_count is larger than max_count" in messages
+
+
+def test_load_catalog_from_toml(tmp_path):
+    path = tmp_path / "services.toml"
+    path.write_text(
+        """
+[dashboard]
+dashboard_name = "monitoring"
+
+[services.api]
+port = 8000
+desired_count = 1
+
+[services.api.task]
+cpu = 256
+memory_limit_mib = 512
+
+[services.api.container]
+image = "public.ecr.aws/aws-containers/hello-app-runner:latest"
+tcp_ports = [8000]
+"""
+    )
+
+    service_catalog = catalog.load_catalog(str(path))
+
+    assert list(service_catalog["services"]) == ["api"]
+
+
+def test_changed_services_compares_with_saved_state(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    service_catalog = catalog.parse_catalog(copy.deepcopy(VALID_CATALOG))
+    assert catalog.changed_services(service_catalog, state_file) == ["webapp"]
+
+    catalog.save_state(service_catalog, state_file)
+    assert catalog.changed_services(service_catalog, state_file) == []
+
+    data = copy.deepcopy(VALID_CATALOG)
+    data["services"]["webapp"]["desired_count"] = 3
+    assert catalog.changed_services(catalog.parse_catalog(data), state_file) == ["webapp"]
+
+
+def test_catalog_accepts_sharding_section():
+    data = copy.deepcopy(VALID_CATALOG)
+    data["sharding"] = {"max_resources_per_stack": 200}
+
+    assert catalog.parse_catalog(data)["sharding"] == {"max_resources_per_stack": 200}
+
+    data["sharding"] = {"max_resources": 200}
+    with pytest.raises(catalog.CatalogError):
+        catalog.parse_catalog(data)
+
+
+def test_catalog_checks_network_endpoints():
+    data = copy.deepcopy(VALID_CATALOG)
+    data["network"] = {"nat_gateway_per_az": True, "endpoints": ["s3", "ecr"]}
+
+    assert catalog.parse_catalog(data)["network"]["nat_gateway_per_az"]
+
+    data["network"]["endpoints"] = ["s3", "dynamodb"]
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+    assert "network.endpoints[1]" in error.value.errors[0]
+
+
+def test_catalog_checks_anomaly_metrics():
+    data = copy.deepcopy(VALID_CATALOG)
+    data["dashboard"]["anomaly_detection"] = {"metrics": ["latency_p99", "request_count"]}
+    data["dashboard"]["metric_math"] = {"max_error_ratio_percent": 1}
+
+    assert catalog.parse_catalog(data)["dashboard"]["metric_math"]["max_error_ratio_percent"] == 1
+
+    data["dashboard"]["anomaly_detection"]["metrics"] = ["cpu"]
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+    assert "dashboard.anomaly_detection.metrics[0]" in error.value.errors[0]
+
+
+def test_catalog_custom_metrics_need_an_emf_namespace():
+    data = copy.deepcopy(VALID_CATALOG)
+    data["services"]["webapp"]["monitoring"]["custom_metrics"] = [{"name": "RequestLatency", "max_value": 500}]
+
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+    assert "custom_metrics" in error.value.errors[0]
+
+    data["services"]["webapp"]["logging"] = {"emf_namespace": "MyApp"}
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+    assert error.value.errors == [
+        "services.webapp.monitoring.custom_metrics[0].dimensions: needed for embedded metric format metrics"
+    ]
+
+    data["services"]["webapp"]["monitoring"]["custom_metrics"][0]["dimensions"] = {"ServiceName": "webapp"}
+    assert catalog.parse_catalog(data)["monitoring"]["webapp"]["custom_metrics"][0]["max_value"] == 500
+
+
+def test_catalog_task_resources_need_enhanced_container_insights():
+    data = copy.deepcopy(VALID_CATALOG)
+    data["services"]["webapp"]["monitoring"]["task_resources"] = {"max_task_memory_percent": 90}
+    data["cluster"] = {"container_insights": "enabled"}
+
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+    assert "task_resources" in error.value.errors[0]
+
+    data["cluster"] = {"container_insights": "enhanced"}
+    assert catalog.parse_catalog(data)["cluster"]["container_insights"] == "enhanced"
+
+
+def test_catalog_capacity_provider_strategies_need_cluster_capacity_providers():
+    data = copy.deepcopy(VALID_CATALOG)
+    data["services"]["webapp"]["capacity_provider_strategies"] = [
+        {"capacity_provider": "FARGATE", "weight": 1, "base": 1},
+        {"capacity_provider": "FARGATE_SPOT", "weight": 3},
+    ]
+
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse_catalog(data)
+    assert "capacity_provider_strategies" in error.value.errors[0]
+
+    data["cluster"] = {"enable_fargate_capacity_providers": True}
+    assert catalog.parse_catalog(data)["cluster"]["enable_fargate_capacity_providers"]
@@ -0,0 +1,142 @@
+"""Shared test fixtures and a jsii timing report.
+
+Most of the test time is spent in the jsii node runtime, building constructs
+and synthesizing templates. Tests that only read from a template can get it
+from the session-scoped template_cache, so it is built once per process.
+
+The suite can run across processes with pytest-xdist:
+
+    uv run pytest -n auto
+
+After the run, a summary shows how much time was spent on synthesis
+(assertions.Template.from_stack) and on everything else in each test.
+"""
+import time
+from typing import Any, Callable, Dict, List, Tuple
+import pytest
+import aws_cdk as cdk
+from aws_cdk import (
+    assertions,
+    aws_ec2 as ec2,
+)
+import containers
+
+SLOWEST_TESTS_IN_REPORT = 10
+
+_call_seconds: Dict[str, float] = {}
+_synth_seconds: Dict[str, float] = {}
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+class TemplateCache:
+    """Templates and the objects built for them, keyed by configuration."""
+
+    def __init__(self):
+        self._entries: Dict[Any, Tuple[assertions.Template, Dict[str, Any]]] = {}
+
+    def get(
+        self, key: Any, build: Callable[[], Tuple[cdk.Stack, Dict[str, Any]]]
+    ) -> Tuple[assertions.Template, Dict[str, Any]]:
+        """Return the cached template for key, calling build on the first use.
+
+        build returns the stack and a dict of constructs that tests may read.
+        Tests must not add constructs to a cached stack.
+        """
+        if key in self._entries:
+            _cache_stats["hits"] += 1
+        else:
+            _cache_stats["misses"] += 1
+            stack, built = build()
+            self._entries[key] = (assertions.Template.from_stack(stack), built)
+        return self._entries[key]
+
+
+@pytest.fixture(scope="session")
+def template_cache() -> TemplateCache:
+    return TemplateCache()
+
+
+@pytest.fixture(scope="session")
+def service_template(template_cache):
+    """Template of a cluster, task definition and service built with add_service."""
+
+    def get(
+        port: int = 80, desired_count: int = 1, use_public_endpoint: bool = True
+    ) -> Tuple[assertions.Template, Dict[str, Any]]:
+        def build():
+            stack = cdk.Stack()
+            vpc = ec2.Vpc(stack, "vpc")
+            cluster = containers.add_cluster(
+                stack, "test-cluster", containers.ClusterConfig(vpc=vpc)
+            )
+            taskdef = containers.add_task_definition_with_container(
+                stack,
+                "test-taskdef",
+                containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test"),
+                containers.ContainerConfig(
+                    image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+                    tcp_ports=[8000],
+                ),
+            )
+            service = containers.add_service(
+                stack, "test-service", cluster, taskdef, port, desired_count,
+                use_public_endpoint,
+            )
+            return stack, {"cluster": cluster, "task_definition": taskdef, "service": service}
+
+        return template_cache.get(
+            ("service", port, desired_count, use_public_endpoint), build
+        )
+
+    return get
+
+
+@pytest.fixture(autouse=True)
+def _record_synth_time(request, monkeypatch):
+    from_stack = assertions.Template.from_stack
+    spent = [0.0]
+
+    def timed_from_stack(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return from_stack(*args, **kwargs)
+        finally:
+            spent[0] += time.perf_counter() - start
+
+    monkeypatch.setattr(assertions.Template, "from_stack", timed_from_stack)
+    yield
+    # user_properties travel with the test report, also from xdist workers.
+    request.node.user_properties.append(("synth_seconds", spent[0]))
+
+
+def pytest_runtest_logreport(report):
+    if report.when == "call":
+        _call_seconds[report.nodeid] = report.duration
+    for name, value in report.user_properties:
+        if name == "synth_seconds":
+            _synth_seconds[report.nodeid] = value
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _call_seconds:
+        return
+    total_call = sum(_call_seconds.values())
+    total_synth = sum(_synth_seconds.values())
+    terminalreporter.section("jsii timing")
+    terminalreporter.write_line(
+        f"test calls {total_call:.2f}s: synth {total_synth:.2f}s, "
+        f"constructs and assertions {total_call - total_synth:.2f}s"
+    )
+    if _cache_stats["hits"] or _cache_stats["misses"]:
+        terminalreporter.write_line(
+            f"template cache (this process): {_cache_stats['hits']} hits, "
+            f"{_cache_stats['misses']} misses"
+        )
+    slowest: List[Tuple[str, float]] = sorted(
+        _call_seconds.items(), key=lambda item: item[1], reverse=True
+    )[:SLOWEST_TESTS_IN_REPORT]
+    for nodeid, seconds in slowest:
+        synth = _synth_seconds.get(nodeid, 0.0)
+        terminalreporter.write_line(
+            f"{seconds:7.2f}s  synth {synth:6.2f}s  {nodeid}"
+        )
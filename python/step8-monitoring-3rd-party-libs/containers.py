@@ -1,54 +1,769 @@
-from typing import Literal, TypedDict, List, NotRequired  # noqa
+import re
+from typing import Any, Dict, Literal, Tuple, TypedDict, List, NotRequired  # noqa
 import constructs as cons
+import aws_cdk as cdk
 from aws_cdk import (
+    aws_applicationautoscaling as appscaling,
+    aws_cloudwatch as cw,
+    aws_codedeploy as codedeploy,
     aws_ec2 as ec2,
+    aws_ecr as ecr,
     aws_ecs as ecs,
     aws_ecs_patterns as ecspat,
+    aws_elasticloadbalancingv2 as elbv2,
+    aws_iam as iam,
     aws_logs as logs,
+    aws_s3 as s3,
+    aws_sqs as sqs,
 )
+import sizing
+
+
+CpuArchitecture = Literal["X86_64", "ARM64"]
+OperatingSystemFamily = Literal[
+    "LINUX", "WINDOWS_SERVER_2019_CORE", "WINDOWS_SERVER_2022_CORE"
+]
 
 
 class TaskConfig(TypedDict):
-    cpu: Literal[256, 512, 1024, 2048, 4096]
+    cpu: Literal[256, 512, 1024, 2048, 4096, 8192, 16384]
     memory_limit_mib: int
     family: str
+    cpu_architecture: NotRequired[CpuArchitecture]
+    operating_system_family: NotRequired[OperatingSystemFamily]
+
+
+class ContainerHealthCheck(TypedDict):
+    command: List[str]
+    interval_seconds: NotRequired[int]
+    timeout_seconds: NotRequired[int]
+    retries: NotRequired[int]
+    start_period_seconds: NotRequired[int]
+
+
+class ContainerDependency(TypedDict):
+    container: str
+    condition: Literal["START", "COMPLETE", "SUCCESS", "HEALTHY"]
 
 
 class ContainerConfig(TypedDict):
     image: str
     tcp_ports: List[int]
+    image_architectures: NotRequired[List[CpuArchitecture]]
+    name: NotRequired[str]
+    cpu: NotRequired[int]
+    memory_reservation_mib: NotRequired[int]
+    memory_limit_mib: NotRequired[int]
+    essential: NotRequired[bool]
+    depends_on: NotRequired[List[ContainerDependency]]
+    health_check: NotRequired[ContainerHealthCheck]
+    pull_through_cache: NotRequired[bool]
+    soci_index: NotRequired[bool]
 
 
-def add_task_definition_with_container(
+# ECR repository prefixes for pull-through cache rules of public registries.
+PULL_THROUGH_CACHE_PREFIXES: Dict[str, str] = {
+    "public.ecr.aws": "ecr-public",
+    "quay.io": "quay",
+    "registry.k8s.io": "k8s",
+}
+
+_ECR_REPOSITORY = re.compile(
+    r"^(?P<account>\d{12})\.dkr\.ecr\.(?P<region>[a-z0-9-]+)\.amazonaws\.com/(?P<name>.+)$"
+)
+_DIGEST = re.compile(r"^sha256:[0-9a-f]{64}$")
+
+
+def _split_image_ref(image_ref: str) -> Tuple[str, str | None]:
+    """Split an image reference into repository and tag or digest."""
+    if "@" in image_ref:
+        repository, digest = image_ref.split("@", 1)
+        if not _DIGEST.match(digest):
+            raise ValueError(f"Image {image_ref} has an invalid digest, expected sha256:<64 hex digits>")
+        return repository, digest
+    registry_and_path, _, last = image_ref.rpartition("/")
+    name, _, tag = last.partition(":")
+    repository = f"{registry_and_path}/{name}" if registry_and_path else name
+    return repository, tag or None
+
+
+def _cache_repository_name(image_ref: str) -> str:
+    """Name of the ECR repository a pull-through cache rule puts image_ref in."""
+    repository, _ = _split_image_ref(image_ref)
+    registry, _, path = repository.partition("/")
+    if registry not in PULL_THROUGH_CACHE_PREFIXES:
+        raise ValueError(
+            f"Image {image_ref} is not from a registry with a pull-through cache: "
+            f"{list(PULL_THROUGH_CACHE_PREFIXES)}"
+        )
+    return f"{PULL_THROUGH_CACHE_PREFIXES[registry]}/{path}"
+
+
+def _runtime_platform(
+    task_config: TaskConfig, container_configs: List[ContainerConfig]
+) -> ecs.RuntimePlatform | None:
+    """Runtime platform for a task, checked against the platforms of the images.
+
+    Tasks without an explicit platform run on Fargate's default, X86_64 Linux.
+    """
+    architecture = task_config.get("cpu_architecture", "X86_64")
+    os_family = task_config.get("operating_system_family", "LINUX")
+    if architecture == "ARM64" and os_family != "LINUX":
+        raise ValueError("ARM64 tasks on Fargate must use the LINUX operating system family")
+    for container_config in container_configs:
+        image_architectures = container_config.get("image_architectures")
+        if image_architectures is not None and architecture not in image_architectures:
+            raise ValueError(
+                f"Image {container_config['image']} supports {image_architectures}, "
+                f"not the task architecture {architecture}"
+            )
+    if "cpu_architecture" not in task_config and "operating_system_family" not in task_config:
+        return None
+    return ecs.RuntimePlatform(
+        cpu_architecture=getattr(ecs.CpuArchitecture, architecture),
+        operating_system_family=getattr(ecs.OperatingSystemFamily, os_family),
+    )
+
+
+def _container_name(container_config: ContainerConfig) -> str:
+    return container_config.get(
+        "name", f"container-{_extract_image_name(container_config['image'])}"
+    )
+
+
+def _validate_containers(task_config: TaskConfig, container_configs: List[ContainerConfig]):
+    if not container_configs:
+        raise ValueError("A task definition needs at least one container")
+    names = [_container_name(c) for c in container_configs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Container names in a task must be unique: {names}")
+    if not any(c.get("essential", True) for c in container_configs):
+        raise ValueError("At least one container in a task must be essential")
+    if sum(c.get("cpu", 0) for c in container_configs) > task_config["cpu"]:
+        raise ValueError("Container CPU reservations exceed the task CPU")
+    reserved_memory = sum(
+        c.get("memory_reservation_mib", c.get("memory_limit_mib", 0))
+        for c in container_configs
+    )
+    if reserved_memory > task_config["memory_limit_mib"]:
+        raise ValueError("Container memory reservations exceed the task memory")
+    for container_config in container_configs:
+        image_ref = container_config["image"]
+        repository, _ = _split_image_ref(image_ref)
+        if container_config.get("pull_through_cache", False):
+            _cache_repository_name(image_ref)
+        elif container_config.get("soci_index", False) and not _ECR_REPOSITORY.match(repository):
+            raise ValueError(
+                f"Image {image_ref} needs to be in a private ECR repository, "
+                "directly or through a pull-through cache, to use a SOCI index"
+            )
+        for dependency in container_config.get("depends_on", []):
+            if dependency["container"] not in names:
+                raise ValueError(
+                    f"{_container_name(container_config)} depends on unknown "
+                    f"container {dependency['container']}"
+                )
+            if dependency["container"] == _container_name(container_config):
+                raise ValueError(f"{dependency['container']} cannot depend on itself")
+            target = container_configs[names.index(dependency["container"])]
+            if dependency["condition"] == "HEALTHY" and "health_check" not in target:
+                raise ValueError(
+                    f"{_container_name(container_config)} waits for {dependency['container']} "
+                    "to be healthy, but it has no health check"
+                )
+            # A task stops when an essential container exits, so a container
+            # waiting for one to complete would never start.
+            if dependency["condition"] in ("COMPLETE", "SUCCESS") and target.get("essential", True):
+                raise ValueError(
+                    f"{_container_name(container_config)} waits for {dependency['container']} "
+                    "to exit, so it must not be essential"
+                )
+    _check_dependency_cycles(names, container_configs)
+
+
+def _check_dependency_cycles(names: List[str], container_configs: List[ContainerConfig]):
+    dependencies = {
+        name: [dependency["container"] for dependency in c.get("depends_on", [])]
+        for name, c in zip(names, container_configs)
+    }
+    done: List[str] = []
+
+    def visit(name: str, path: List[str]):
+        if name in path:
+            cycle = path[path.index(name):] + [name]
+            raise ValueError(f"Container dependencies form a cycle: {' -> '.join(cycle)}")
+        if name in done:
+            return
+        for dependency in dependencies[name]:
+            visit(dependency, path + [name])
+        done.append(name)
+
+    for name in names:
+        visit(name, [])
+
+
+LogDriverName = Literal["awslogs", "firelens"]
+LogDestination = Literal["cloudwatch", "firehose", "s3"]
+LogRetention = Literal[
+    "ONE_DAY", "THREE_DAYS", "ONE_WEEK", "TWO_WEEKS", "ONE_MONTH", "THREE_MONTHS",
+    "SIX_MONTHS", "ONE_YEAR", "TWO_YEARS", "FIVE_YEARS", "TEN_YEARS", "INFINITE",
+]
+
+DEFAULT_LOG_ROUTER_IMAGE = "public.ecr.aws/aws-observability/aws-for-fluent-bit:stable"
+LOG_ROUTER_NAME = "log-router"
+
+
+class LoggingConfig(TypedDict):
+    driver: NotRequired[LogDriverName]
+    non_blocking: NotRequired[bool]
+    max_buffer_size_mib: NotRequired[int]
+    retention: NotRequired[LogRetention]
+    destination: NotRequired[LogDestination]
+    delivery_stream_name: NotRequired[str]
+    bucket_name: NotRequired[str]
+    batch_size_mib: NotRequired[int]
+    batch_timeout_seconds: NotRequired[int]
+    log_router_image: NotRequired[str]
+    emf_namespace: NotRequired[str]
+
+
+def _validate_logging(config: LoggingConfig):
+    driver = config.get("driver", "awslogs")
+    destination = config.get("destination", "cloudwatch")
+    if driver == "awslogs":
+        firelens_keys = {"destination", "delivery_stream_name", "bucket_name", "batch_size_mib",
+                         "batch_timeout_seconds", "log_router_image"}
+        if firelens_keys & config.keys():
+            raise ValueError(f"{sorted(firelens_keys & config.keys())} need the firelens log driver")
+        if "max_buffer_size_mib" in config and not config.get("non_blocking", False):
+            raise ValueError("max_buffer_size_mib needs non_blocking awslogs")
+    elif config.get("non_blocking", False):
+        raise ValueError("non_blocking is an awslogs setting, firelens buffers with max_buffer_size_mib")
+    if destination == "firehose" and "delivery_stream_name" not in config:
+        raise ValueError("Logging to firehose needs a delivery_stream_name")
+    if destination == "s3" and "bucket_name" not in config:
+        raise ValueError("Logging to s3 needs a bucket_name")
+    if destination != "s3" and ("batch_size_mib" in config or "batch_timeout_seconds" in config):
+        raise ValueError("Batch settings are only used for s3 log destinations")
+    if destination != "cloudwatch" and "emf_namespace" in config:
+        raise ValueError("Embedded metric format logs must be delivered to CloudWatch Logs")
+
+
+def validate_task(
+    task_config: TaskConfig,
+    container_configs: List[ContainerConfig],
+    logging: LoggingConfig | None = None,
+):
+    """Check task size, containers and runtime platform, raising ValueError if invalid."""
+    sizing.validate_task_size(task_config["cpu"], task_config["memory_limit_mib"])
+    _validate_containers(task_config, container_configs)
+    _runtime_platform(task_config, container_configs)
+    if logging is not None:
+        _validate_logging(logging)
+        if logging.get("driver") == "firelens" and LOG_ROUTER_NAME in [
+            _container_name(c) for c in container_configs
+        ]:
+            raise ValueError(f"Container name {LOG_ROUTER_NAME} is used by the FireLens log router")
+
+
+def _container_health_check(config: ContainerHealthCheck) -> ecs.HealthCheck:
+    def seconds(key: str) -> cdk.Duration | None:
+        return cdk.Duration.seconds(config[key]) if key in config else None
+
+    return ecs.HealthCheck(
+        command=config["command"],
+        interval=seconds("interval_seconds"),
+        timeout=seconds("timeout_seconds"),
+        retries=config.get("retries"),
+        start_period=seconds("start_period_seconds"),
+    )
+
+
+CONTAINER_HEALTH_CHECK_PRESETS: Dict[str, ContainerHealthCheck] = {
+    "fast": ContainerHealthCheck(
+        command=[], interval_seconds=5, timeout_seconds=2, retries=2, start_period_seconds=10
+    ),
+    "standard": ContainerHealthCheck(
+        command=[], interval_seconds=30, timeout_seconds=5, retries=3, start_period_seconds=0
+    ),
+}
+
+
+def http_container_health_check(
+    port: int, path: str = "/", preset: Literal["fast", "standard"] = "fast"
+) -> ContainerHealthCheck:
+    """Container health check that requests path on the container with curl.
+
+    The image must include curl for this check to pass.
+    """
+    return ContainerHealthCheck(
+        **{
+            **CONTAINER_HEALTH_CHECK_PRESETS[preset],
+            "command": ["CMD-SHELL", f"curl -f http://localhost:{port}{path} || exit 1"],
+        }
+    )
+
+
+def _firelens_options(
+    taskdef: ecs.FargateTaskDefinition, config: LoggingConfig, log_group: logs.ILogGroup
+) -> Dict[str, str]:
+    """Fluent Bit output options for the destination, granting the task role access."""
+    region = cdk.Stack.of(taskdef).region
+    destination = config.get("destination", "cloudwatch")
+    if destination == "cloudwatch":
+        log_group.grant_write(taskdef.task_role)
+        options = {
+            "Name": "cloudwatch_logs",
+            "region": region,
+            "log_group_name": log_group.log_group_name,
+            "log_stream_prefix": f"{taskdef.family}/",
+            "auto_create_group": "false",
+        }
+        if "emf_namespace" in config:
+            # CloudWatch only extracts metrics from events that are the EMF
+            # document itself, not wrapped in a Fluent Bit record.
+            options["log_key"] = "log"
+    elif destination == "firehose":
+        taskdef.add_to_task_role_policy(
+            iam.PolicyStatement(
+                actions=["firehose:PutRecordBatch"],
+                resources=[
+                    cdk.Stack.of(taskdef).format_arn(
+                        service="firehose",
+                        resource="deliverystream",
+                        resource_name=config["delivery_stream_name"],
+                    )
+                ],
+            )
+        )
+        options = {
+            "Name": "kinesis_firehose",
+            "region": region,
+            "delivery_stream": config["delivery_stream_name"],
+        }
+    else:
+        bucket = s3.Bucket.from_bucket_name(taskdef, "log-bucket", config["bucket_name"])
+        bucket.grant_put(taskdef.task_role)
+        options = {
+            "Name": "s3",
+            "region": region,
+            "bucket": config["bucket_name"],
+            "s3_key_format": f"/{taskdef.family}/%Y/%m/%d/%H/$UUID",
+            "total_file_size": f"{config.get('batch_size_mib', 50)}M",
+            "upload_timeout": f"{config.get('batch_timeout_seconds', 60)}s",
+        }
+    if "max_buffer_size_mib" in config:
+        options["log-driver-buffer-limit"] = str(config["max_buffer_size_mib"] * 1024 * 1024)
+    return options
+
+
+def _log_driver(
+    taskdef: ecs.FargateTaskDefinition,
+    config: LoggingConfig,
+    log_group: logs.ILogGroup | None,
+    images: Dict[str, ecs.ContainerImage],
+) -> ecs.LogDriver:
+    """Log driver for the containers of taskdef, adding a log router for FireLens.
+
+    Without a log group, awslogs creates one with the configured retention,
+    one day by default.
+    """
+    retention = getattr(logs.RetentionDays, config.get("retention", "ONE_DAY"))
+    if config.get("driver", "awslogs") == "awslogs":
+        return ecs.LogDrivers.aws_logs(
+            stream_prefix=taskdef.family,
+            log_group=log_group,
+            log_retention=retention if log_group is None else None,
+            mode=ecs.AwsLogDriverMode.NON_BLOCKING if config.get("non_blocking") else None,
+            max_buffer_size=cdk.Size.mebibytes(config["max_buffer_size_mib"])
+            if "max_buffer_size_mib" in config
+            else None,
+        )
+
+    if log_group is None:
+        log_group = logs.LogGroup(taskdef, "logs", retention=retention)
+    router_image = config.get("log_router_image", DEFAULT_LOG_ROUTER_IMAGE)
+    if router_image not in images:
+        images[router_image] = ecs.ContainerImage.from_registry(router_image)
+    taskdef.add_firelens_log_router(
+        LOG_ROUTER_NAME,
+        image=images[router_image],
+        firelens_config=ecs.FirelensConfig(type=ecs.FirelensLogRouterType.FLUENTBIT),
+        logging=ecs.LogDrivers.aws_logs(
+            stream_prefix=f"{taskdef.family}-{LOG_ROUTER_NAME}", log_group=log_group
+        ),
+        memory_reservation_mib=50,
+        essential=True,
+    )
+    return ecs.LogDrivers.firelens(options=_firelens_options(taskdef, config, log_group))
+
+
+def _container_image(scope: cons.Construct, container_config: ContainerConfig) -> ecs.ContainerImage:
+    """Image for a container, from ECR when the image is in or cached by ECR.
+
+    ECR images are bound with the repository, so the execution role gets pull
+    access to it. Fargate lazy loads images that have a SOCI index in the
+    repository, without any setting in the task definition.
+    """
+    image_ref = container_config["image"]
+    repository, tag_or_digest = _split_image_ref(image_ref)
+    id = f"{_container_name(container_config)}-repository"
+    if container_config.get("pull_through_cache", False):
+        cached = ecr.Repository.from_repository_name(scope, id, _cache_repository_name(image_ref))
+        return ecs.ContainerImage.from_ecr_repository(cached, tag_or_digest)
+    match = _ECR_REPOSITORY.match(repository)
+    if match:
+        private = ecr.Repository.from_repository_attributes(
+            scope,
+            id,
+            repository_arn=f"arn:{cdk.Aws.PARTITION}:ecr:{match['region']}:{match['account']}:repository/{match['name']}",
+            repository_name=match["name"],
+        )
+        return ecs.ContainerImage.from_ecr_repository(private, tag_or_digest)
+    return ecs.ContainerImage.from_registry(image_ref)
+
+
+def add_pull_through_cache_rules(
+    scope: cons.Construct, registries: List[str] | None = None
+) -> List[ecr.CfnPullThroughCacheRule]:
+    """Create pull-through cache rules for public registries.
+
+    The rules apply to the whole account and region, so create them in one
+    stack per environment.
+    """
+    rules = []
+    for registry in registries or list(PULL_THROUGH_CACHE_PREFIXES):
+        if registry not in PULL_THROUGH_CACHE_PREFIXES:
+            raise ValueError(f"No pull-through cache prefix for registry {registry}")
+        rules.append(
+            ecr.CfnPullThroughCacheRule(
+                scope,
+                f"pull-through-cache-{PULL_THROUGH_CACHE_PREFIXES[registry]}",
+                ecr_repository_prefix=PULL_THROUGH_CACHE_PREFIXES[registry],
+                upstream_registry_url=registry,
+            )
+        )
+    return rules
+
+
+def add_task_definition_with_containers(
     scope: cons.Construct,
     id: str,
     task_config: TaskConfig,
-    container_config: ContainerConfig,
+    container_configs: List[ContainerConfig],
+    log_group: logs.ILogGroup | None = None,
+    images: Dict[str, ecs.ContainerImage] | None = None,
+    logging: LoggingConfig | None = None,
 ) -> ecs.FargateTaskDefinition:
+    """Create a task definition with an app container and its sidecars.
+
+    The first container is the default container, which load balancers
+    route traffic to. Images are looked up in and added to images, keyed
+    by image reference, so that callers can share them between tasks.
+    Images with pull_through_cache are pulled through the ECR cache rules
+    from add_pull_through_cache_rules.
+    Containers log with awslogs in blocking mode, unless logging says otherwise.
+    With an emf_namespace, the containers get the environment for the
+    embedded metric format client libraries to write metrics to stdout, from
+    where CloudWatch extracts them, at up to 1 second resolution.
+    """
+    validate_task(task_config, container_configs, logging)
     taskdef = ecs.FargateTaskDefinition(
         scope,
         id,
         cpu=task_config["cpu"],
         memory_limit_mib=task_config["memory_limit_mib"],
         family=task_config["family"],
+        runtime_platform=_runtime_platform(task_config, container_configs),
     )
 
-    logdriver = ecs.LogDrivers.aws_logs(
-        stream_prefix=taskdef.family,
-        log_retention=logs.RetentionDays.ONE_DAY,
-    )
-    image = ecs.ContainerImage.from_registry(container_config["image"])
-    image_id = f"container-{_extract_image_name(container_config['image'])}"
-    containerdef = taskdef.add_container(image_id, image=image, logging=logdriver)
+    if images is None:
+        images = {}
+    logging = logging or LoggingConfig()
+    logdriver = _log_driver(taskdef, logging, log_group, images)
 
-    for port in container_config["tcp_ports"]:
-        containerdef.add_port_mappings(
-            ecs.PortMapping(container_port=port, protocol=ecs.Protocol.TCP)
+    containerdefs: Dict[str, ecs.ContainerDefinition] = {}
+    for container_config in container_configs:
+        image_ref = container_config["image"]
+        if container_config.get("pull_through_cache", False):
+            # The first pull through the cache creates the repository.
+            taskdef.add_to_execution_role_policy(
+                iam.PolicyStatement(
+                    actions=["ecr:BatchImportUpstreamImage", "ecr:CreateRepository"],
+                    resources=[
+                        cdk.Stack.of(taskdef).format_arn(
+                            service="ecr",
+                            resource="repository",
+                            resource_name=_cache_repository_name(image_ref),
+                        )
+                    ],
+                )
+            )
+            image_ref = f"pull-through-cache:{image_ref}"
+        if image_ref not in images:
+            images[image_ref] = _container_image(taskdef, container_config)
+        name = _container_name(container_config)
+        health_check = container_config.get("health_check")
+        environment = None
+        if "emf_namespace" in logging:
+            environment = {
+                "AWS_EMF_ENVIRONMENT": "Local",
+                "AWS_EMF_NAMESPACE": logging["emf_namespace"],
+                "AWS_EMF_SERVICE_NAME": name,
+                "AWS_EMF_SERVICE_TYPE": "AWS::ECS::Container",
+            }
+        containerdef = taskdef.add_container(
+            name,
+            image=images[image_ref],
+            logging=logdriver,
+            environment=environment,
+            cpu=container_config.get("cpu"),
+            memory_reservation_mib=container_config.get("memory_reservation_mib"),
+            memory_limit_mib=container_config.get("memory_limit_mib"),
+            essential=container_config.get("essential"),
+            health_check=_container_health_check(health_check) if health_check else None,
         )
+        for port in container_config["tcp_ports"]:
+            containerdef.add_port_mappings(
+                ecs.PortMapping(container_port=port, protocol=ecs.Protocol.TCP)
+            )
+        containerdefs[name] = containerdef
 
+    for container_config in container_configs:
+        for dependency in container_config.get("depends_on", []):
+            containerdefs[_container_name(container_config)].add_container_dependencies(
+                ecs.ContainerDependency(
+                    container=containerdefs[dependency["container"]],
+                    condition=getattr(
+                        ecs.ContainerDependencyCondition, dependency["condition"]
+                    ),
+                )
+            )
+
+    # A FireLens log router is added first, but load balancers must route to
+    # the app container.
+    taskdef.default_container = containerdefs[_container_name(container_configs[0])]
     return taskdef
 
 
+def add_task_definition_with_container(
+    scope: cons.Construct,
+    id: str,
+    task_config: TaskConfig,
+    container_config: ContainerConfig,
+    log_group: logs.ILogGroup | None = None,
+    image: ecs.ContainerImage | None = None,
+    logging: LoggingConfig | None = None,
+) -> ecs.FargateTaskDefinition:
+    return add_task_definition_with_containers(
+        scope,
+        id,
+        task_config,
+        [container_config],
+        log_group=log_group,
+        images=None if image is None else {container_config["image"]: image},
+        logging=logging,
+    )
+
+
+class CapacityProviderStrategy(TypedDict):
+    capacity_provider: Literal["FARGATE", "FARGATE_SPOT"]
+    weight: int
+    base: NotRequired[int]
+
+
+def spot_burst_strategy(
+    base_count: int, spot_weight: int = 3
+) -> List[CapacityProviderStrategy]:
+    """Keep base_count tasks on on-demand Fargate and run most burst tasks on Spot."""
+    return [
+        CapacityProviderStrategy(capacity_provider="FARGATE", weight=1, base=base_count),
+        CapacityProviderStrategy(capacity_provider="FARGATE_SPOT", weight=spot_weight),
+    ]
+
+
+def _capacity_provider_strategies(
+    strategies: List[CapacityProviderStrategy] | None,
+) -> List[ecs.CapacityProviderStrategy] | None:
+    if not strategies:
+        return None
+    if len([s for s in strategies if s.get("base")]) > 1:
+        raise ValueError("Only one capacity provider strategy can have a base count")
+    if sum(s["weight"] for s in strategies) <= 0:
+        raise ValueError("At least one capacity provider strategy needs a positive weight")
+    return [
+        ecs.CapacityProviderStrategy(
+            capacity_provider=s["capacity_provider"],
+            weight=s["weight"],
+            base=s.get("base"),
+        )
+        for s in strategies
+    ]
+
+
+class TargetGroupConfig(TypedDict):
+    health_check_path: NotRequired[str]
+    health_check_interval_seconds: NotRequired[int]
+    health_check_timeout_seconds: NotRequired[int]
+    healthy_threshold_count: NotRequired[int]
+    unhealthy_threshold_count: NotRequired[int]
+    deregistration_delay_seconds: NotRequired[int]
+
+
+DEFAULT_TARGET_GROUP_CONFIG = TargetGroupConfig(
+    health_check_path="/",
+    health_check_interval_seconds=10,
+    health_check_timeout_seconds=5,
+    healthy_threshold_count=2,
+    unhealthy_threshold_count=2,
+    deregistration_delay_seconds=30,
+)
+
+
+TARGET_GROUP_PRESETS: Dict[str, TargetGroupConfig] = {
+    "fast": TargetGroupConfig(
+        health_check_interval_seconds=5,
+        health_check_timeout_seconds=4,
+        healthy_threshold_count=2,
+        unhealthy_threshold_count=2,
+        deregistration_delay_seconds=10,
+    ),
+    "standard": TargetGroupConfig(
+        health_check_interval_seconds=30,
+        health_check_timeout_seconds=5,
+        healthy_threshold_count=5,
+        unhealthy_threshold_count=2,
+        deregistration_delay_seconds=300,
+    ),
+}
+
+
+def _target_group_settings(
+    config: TargetGroupConfig | None,
+) -> Tuple[Dict[str, Any], cdk.Duration]:
+    """Health check properties and deregistration delay, unset values from the defaults."""
+    tg_config: TargetGroupConfig = {**DEFAULT_TARGET_GROUP_CONFIG, **(config or {})}
+    health_check = dict(
+        path=tg_config["health_check_path"],
+        interval=cdk.Duration.seconds(tg_config["health_check_interval_seconds"]),
+        timeout=cdk.Duration.seconds(tg_config["health_check_timeout_seconds"]),
+        healthy_threshold_count=tg_config["healthy_threshold_count"],
+        unhealthy_threshold_count=tg_config["unhealthy_threshold_count"],
+    )
+    return health_check, cdk.Duration.seconds(tg_config["deregistration_delay_seconds"])
+
+
+DeploymentPresetName = Literal["fast", "safe"]
+BlueGreenTrafficShift = Literal[
+    "ALL_AT_ONCE",
+    "CANARY_10_PERCENT_5_MINUTES",
+    "CANARY_10_PERCENT_15_MINUTES",
+    "LINEAR_10_PERCENT_EVERY_1_MINUTES",
+    "LINEAR_10_PERCENT_EVERY_3_MINUTES",
+]
+
+
+class DeploymentConfig(TypedDict):
+    preset: NotRequired[DeploymentPresetName]
+    strategy: NotRequired[Literal["rolling", "blue_green"]]
+    min_healthy_percent: NotRequired[int]
+    max_healthy_percent: NotRequired[int]
+    health_check_grace_period_seconds: NotRequired[int]
+    deregistration_delay_seconds: NotRequired[int]
+    traffic_shift: NotRequired[BlueGreenTrafficShift]
+    termination_wait_minutes: NotRequired[int]
+    test_listener_port: NotRequired[int]
+
+
+DEFAULT_TEST_LISTENER_PORT = 9000
+
+DEPLOYMENT_PRESETS: Dict[str, DeploymentConfig] = {
+    # Start a full set of new tasks at once and drain the old ones quickly.
+    "fast": DeploymentConfig(
+        min_healthy_percent=100,
+        max_healthy_percent=200,
+        health_check_grace_period_seconds=10,
+        deregistration_delay_seconds=5,
+        traffic_shift="ALL_AT_ONCE",
+        termination_wait_minutes=0,
+    ),
+    # Replace half the tasks at a time and give requests time to finish.
+    "safe": DeploymentConfig(
+        min_healthy_percent=100,
+        max_healthy_percent=150,
+        health_check_grace_period_seconds=60,
+        deregistration_delay_seconds=60,
+        traffic_shift="CANARY_10_PERCENT_5_MINUTES",
+        termination_wait_minutes=15,
+    ),
+}
+
+
+def deployment_settings(config: DeploymentConfig | None) -> DeploymentConfig:
+    """Deployment config with the preset filled in, explicit settings overriding it."""
+    if config is None:
+        return DeploymentConfig()
+    if "preset" in config and config["preset"] not in DEPLOYMENT_PRESETS:
+        raise ValueError(f"Unknown deployment preset: {config['preset']}")
+    settings: DeploymentConfig = {**DEPLOYMENT_PRESETS.get(config.get("preset", ""), {}), **config}
+    min_healthy = settings.get("min_healthy_percent", 100)
+    max_healthy = settings.get("max_healthy_percent", 200)
+    if not 0 <= min_healthy <= 100 or max_healthy < 100:
+        raise ValueError("min_healthy_percent must be 0-100 and max_healthy_percent at least 100")
+    if min_healthy == 100 and max_healthy == 100:
+        raise ValueError("A rolling deployment needs min_healthy_percent below or max_healthy_percent above 100")
+    if settings.get("strategy", "rolling") == "rolling":
+        for key in ("traffic_shift", "termination_wait_minutes", "test_listener_port"):
+            if key in config:
+                raise ValueError(f"{key} is only used with blue_green deployments")
+    return settings
+
+
+def _seconds(value: int | None) -> cdk.Duration | None:
+    return None if value is None else cdk.Duration.seconds(value)
+
+
+def estimate_rollout_seconds(
+    desired_count: int,
+    deployment: DeploymentConfig | None = None,
+    target_group: TargetGroupConfig | None = None,
+    task_start_seconds: int = 30,
+) -> float:
+    """Rough time for a deployment to replace all tasks of a service.
+
+    A rolling deployment replaces tasks in batches limited by the healthy
+    percentages. Each batch waits for tasks to start, pass the load balancer
+    health checks and drain from the old target. A blue/green deployment
+    starts all new tasks at once, then shifts traffic and waits before
+    stopping the old tasks. A target group of None means the load balancer
+    defaults, as for add_service without a target group config.
+    """
+    settings = deployment_settings(deployment)
+    tg_config: TargetGroupConfig = {
+        **DEFAULT_TARGET_GROUP_CONFIG,
+        **(TARGET_GROUP_PRESETS["standard"] if target_group is None else target_group),
+    }
+    healthy = tg_config["healthy_threshold_count"] * tg_config["health_check_interval_seconds"]
+    draining = settings.get(
+        "deregistration_delay_seconds", tg_config["deregistration_delay_seconds"]
+    )
+    if settings.get("strategy", "rolling") == "blue_green":
+        shift_minutes = {
+            "ALL_AT_ONCE": 0,
+            "CANARY_10_PERCENT_5_MINUTES": 5,
+            "CANARY_10_PERCENT_15_MINUTES": 15,
+            "LINEAR_10_PERCENT_EVERY_1_MINUTES": 9,
+            "LINEAR_10_PERCENT_EVERY_3_MINUTES": 27,
+        }[settings.get("traffic_shift", "ALL_AT_ONCE")]
+        wait_minutes = settings.get("termination_wait_minutes", 0)
+        return task_start_seconds + healthy + 60 * (shift_minutes + wait_minutes) + draining
+    extra = desired_count * settings.get("max_healthy_percent", 200) // 100 - desired_count
+    stoppable = desired_count - -(-desired_count * settings.get("min_healthy_percent", 100) // 100)
+    batch = max(1, extra + stoppable)
+    batches = -(-desired_count // batch)
+    return batches * (task_start_seconds + healthy + draining)
+
+
 def add_service(
     scope: cons.Construct,
     id: str,
@@ -58,7 +773,21 @@ def add_service(
     desired_count: int,
     use_public_endpoint: bool = True,
     service_name: str | None = None,
+    security_groups: List[ec2.ISecurityGroup] | None = None,
+    capacity_provider_strategies: List[CapacityProviderStrategy] | None = None,
+    target_group: TargetGroupConfig | None = None,
+    deployment: DeploymentConfig | None = None,
 ) -> ecspat.ApplicationLoadBalancedFargateService:
+    """Create a service with its own load balancer.
+
+    Deployments roll with a circuit breaker by default. A blue_green
+    deployment strategy hands deployments to CodeDeploy, which shifts the
+    listener between the service's target group and a second one. The second
+    target group is attached to a test listener on test_listener_port, which
+    is not opened to clients, so ECS can register the replacement tasks in it.
+    """
+    settings = deployment_settings(deployment)
+    blue_green = settings.get("strategy", "rolling") == "blue_green"
     service = ecspat.ApplicationLoadBalancedFargateService(
         scope,
         id,
@@ -67,46 +796,575 @@ def add_service(
         listener_port=port,
         desired_count=desired_count,
         service_name=service_name,
-        circuit_breaker=ecs.DeploymentCircuitBreaker(
+        circuit_breaker=None if blue_green else ecs.DeploymentCircuitBreaker(
             rollback=True,
         ),
+        deployment_controller=ecs.DeploymentController(
+            type=ecs.DeploymentControllerType.CODE_DEPLOY
+        ) if blue_green else None,
+        min_healthy_percent=settings.get("min_healthy_percent"),
+        max_healthy_percent=settings.get("max_healthy_percent"),
+        health_check_grace_period=_seconds(settings.get("health_check_grace_period_seconds")),
         public_load_balancer=use_public_endpoint,
+        security_groups=security_groups,
+        capacity_provider_strategies=_capacity_provider_strategies(
+            capacity_provider_strategies
+        ),
     )
+    if target_group is not None:
+        health_check, deregistration_delay = _target_group_settings(target_group)
+        service.target_group.configure_health_check(**health_check)
+        service.target_group.set_attribute(
+            "deregistration_delay.timeout_seconds",
+            str(deregistration_delay.to_seconds()),
+        )
+    if "deregistration_delay_seconds" in settings:
+        service.target_group.set_attribute(
+            "deregistration_delay.timeout_seconds",
+            str(settings["deregistration_delay_seconds"]),
+        )
+    if blue_green:
+        health_check, deregistration_delay = _target_group_settings(
+            target_group or TARGET_GROUP_PRESETS["standard"]
+        )
+        green_target_group = elbv2.ApplicationTargetGroup(
+            scope,
+            f"{id}-green",
+            vpc=cluster.vpc,
+            port=port,
+            protocol=elbv2.ApplicationProtocol.HTTP,
+            target_type=elbv2.TargetType.IP,
+            health_check=elbv2.HealthCheck(**health_check),
+            deregistration_delay=_seconds(settings.get("deregistration_delay_seconds"))
+            or deregistration_delay,
+        )
+        test_port = settings.get("test_listener_port", DEFAULT_TEST_LISTENER_PORT)
+        if test_port == port:
+            raise ValueError(f"The test listener needs a port other than {port}")
+        test_listener = service.load_balancer.add_listener(
+            "test-listener",
+            port=test_port,
+            protocol=elbv2.ApplicationProtocol.HTTP,
+            open=False,
+            default_target_groups=[green_target_group],
+        )
+        codedeploy.EcsDeploymentGroup(
+            scope,
+            f"{id}-deployment",
+            service=service.service,
+            blue_green_deployment_config=codedeploy.EcsBlueGreenDeploymentConfig(
+                blue_target_group=service.target_group,
+                green_target_group=green_target_group,
+                listener=service.listener,
+                test_listener=test_listener,
+                termination_wait_time=cdk.Duration.minutes(
+                    settings.get("termination_wait_minutes", 0)
+                ),
+            ),
+            deployment_config=getattr(
+                codedeploy.EcsDeploymentConfig, settings.get("traffic_shift", "ALL_AT_ONCE")
+            ),
+        )
     return service
 
+
+def add_shared_load_balancer(
+    scope: cons.Construct,
+    id: str,
+    cluster: ecs.Cluster,
+    port: int = 80,
+    use_public_endpoint: bool = True,
+) -> elbv2.ApplicationListener:
+    """Create one load balancer and listener that many services can share.
+
+    Requests that do not match any service routing rule get a 404 response.
+    """
+    loadbalancer = elbv2.ApplicationLoadBalancer(
+        scope, id, vpc=cluster.vpc, internet_facing=use_public_endpoint
+    )
+    return loadbalancer.add_listener(
+        f"{id}-listener",
+        port=port,
+        protocol=elbv2.ApplicationProtocol.HTTP,
+        default_action=elbv2.ListenerAction.fixed_response(
+            404, content_type="text/plain", message_body="Not found"
+        ),
+    )
+
+
+class RoutingConfig(TypedDict):
+    priority: int
+    host_headers: NotRequired[List[str]]
+    path_patterns: NotRequired[List[str]]
+
+
+class RoutedService(TypedDict):
+    service: ecs.FargateService
+    target_group: elbv2.ApplicationTargetGroup
+
+
+def add_routed_service(
+    scope: cons.Construct,
+    id: str,
+    cluster: ecs.Cluster,
+    taskdef: ecs.FargateTaskDefinition,
+    listener: elbv2.ApplicationListener,
+    port: int,
+    desired_count: int,
+    routing: RoutingConfig,
+    target_group: TargetGroupConfig | None = None,
+    service_name: str | None = None,
+    security_groups: List[ec2.ISecurityGroup] | None = None,
+    capacity_provider_strategies: List[CapacityProviderStrategy] | None = None,
+    deployment: DeploymentConfig | None = None,
+) -> RoutedService:
+    """Create a service behind a shared listener, routed by host and/or path.
+
+    Only rolling deployments are supported, as blue/green deployments switch
+    a listener that the service has to itself.
+    """
+    conditions = []
+    if routing.get("host_headers"):
+        conditions.append(elbv2.ListenerCondition.host_headers(routing["host_headers"]))
+    if routing.get("path_patterns"):
+        conditions.append(elbv2.ListenerCondition.path_patterns(routing["path_patterns"]))
+    if not conditions:
+        raise ValueError(f"Routing for {id} needs host_headers or path_patterns")
+
+    settings = deployment_settings(deployment)
+    if settings.get("strategy", "rolling") == "blue_green":
+        raise ValueError(f"Service {id} on a shared listener cannot use blue_green deployments")
+    health_check, deregistration_delay = _target_group_settings(target_group)
+    service = ecs.FargateService(
+        scope,
+        id,
+        cluster=cluster,
+        task_definition=taskdef,
+        desired_count=desired_count,
+        service_name=service_name,
+        circuit_breaker=ecs.DeploymentCircuitBreaker(
+            rollback=True,
+        ),
+        min_healthy_percent=settings.get("min_healthy_percent"),
+        max_healthy_percent=settings.get("max_healthy_percent"),
+        health_check_grace_period=_seconds(settings.get("health_check_grace_period_seconds")),
+        security_groups=security_groups,
+        capacity_provider_strategies=_capacity_provider_strategies(
+            capacity_provider_strategies
+        ),
+    )
+    # Target group and rule are created next to the service rather than under
+    # the listener, so that services in other stacks than the load balancer
+    # keep their own routing resources.
+    target_group = elbv2.ApplicationTargetGroup(
+        scope,
+        f"{id}-target",
+        vpc=cluster.vpc,
+        port=port,
+        protocol=elbv2.ApplicationProtocol.HTTP,
+        targets=[service],
+        health_check=elbv2.HealthCheck(**health_check),
+        deregistration_delay=_seconds(settings.get("deregistration_delay_seconds"))
+        or deregistration_delay,
+    )
+    elbv2.ApplicationListenerRule(
+        scope,
+        f"{id}-rule",
+        listener=listener,
+        priority=routing["priority"],
+        conditions=conditions,
+        action=elbv2.ListenerAction.forward([target_group]),
+    )
+    return RoutedService(service=service, target_group=target_group)
+
+ContainerInsightsMode = Literal["disabled", "enabled", "enhanced"]
+
+
 class ClusterConfig(TypedDict):
     vpc: ec2.IVpc
     enable_container_insights: NotRequired[bool]
+    container_insights: NotRequired[ContainerInsightsMode]
+    enable_fargate_capacity_providers: NotRequired[bool]
 
 def add_cluster(scope: cons.Construct, id: str, config: ClusterConfig) -> ecs.Cluster:
-    return ecs.Cluster(scope, id, vpc=config["vpc"], container_insights=config.get("enable_container_insights", None))
+    """Create a cluster.
+
+    container_insights "enhanced" turns on enhanced observability, which adds
+    per task and per container metrics, see
+    monitoring.add_task_resource_monitoring. enable_container_insights is the
+    older on/off setting and cannot be combined with container_insights.
+    """
+    if "container_insights" in config and "enable_container_insights" in config:
+        raise ValueError("Set either container_insights or enable_container_insights")
+    mode = config.get("container_insights")
+    return ecs.Cluster(
+        scope,
+        id,
+        vpc=config["vpc"],
+        container_insights=config.get("enable_container_insights", None),
+        container_insights_v2=getattr(ecs.ContainerInsights, mode.upper()) if mode else None,
+        enable_fargate_capacity_providers=config.get(
+            "enable_fargate_capacity_providers", None
+        ),
+    )
 
 
 def _extract_image_name(image_ref):
-    name_with_tag = image_ref.split("/")[-1]
-    name = name_with_tag.split(":")[0]
-    return name
+    repository, _ = _split_image_ref(image_ref)
+    return repository.split("/")[-1]
 
 
 class ScalingThreshold(TypedDict):
     percent: float
 
 
+class RequestCountThreshold(TypedDict):
+    requests_per_target: int
+
+
+class ResponseTimeScaling(TypedDict):
+    scale_out_seconds: float
+    scale_in_seconds: float
+
+
+class StepScaling(TypedDict):
+    scale_out: float
+    scale_in: float
+
+
+class QueueDepthScaling(TypedDict):
+    queue: sqs.IQueue
+    scale_out: float
+    scale_in: float
+
+
+class ScheduledScalingWindow(TypedDict):
+    name: str
+    cron: str
+    min_count: int
+    max_count: NotRequired[int]
+    time_zone: NotRequired[str]
+
+
 class ServiceScalingConfig(TypedDict):
     min_count: int
     max_count: int
-    scale_cpu_target: ScalingThreshold
-    scale_memory_target: ScalingThreshold
+    scale_cpu_target: NotRequired[ScalingThreshold]
+    scale_memory_target: NotRequired[ScalingThreshold]
+    scale_request_count_target: NotRequired[RequestCountThreshold]
+    scale_p99_response_time: NotRequired[ResponseTimeScaling]
+    scale_request_count_steps: NotRequired[StepScaling]
+    scale_queue_depth_steps: NotRequired[QueueDepthScaling]
+    schedules: NotRequired[List[ScheduledScalingWindow]]
+    scale_in_cooldown_seconds: NotRequired[int]
+    scale_out_cooldown_seconds: NotRequired[int]
+
+
+def _cooldown(config: ServiceScalingConfig, key: str) -> cdk.Duration | None:
+    seconds = config.get(key)
+    return None if seconds is None else cdk.Duration.seconds(seconds)
+
+
+def _add_step_scaling(
+    scaling: ecs.ScalableTaskCount,
+    id: str,
+    metric: cw.IMetric,
+    scale_out: float,
+    scale_in: float,
+    cooldown: cdk.Duration | None,
+):
+    scaling.scale_on_metric(
+        id,
+        metric=metric,
+        scaling_steps=[
+            appscaling.ScalingInterval(upper=scale_in, change=-1),
+            appscaling.ScalingInterval(lower=scale_out, change=1),
+            appscaling.ScalingInterval(lower=scale_out * 2, change=3),
+        ],
+        adjustment_type=appscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+        cooldown=cooldown,
+    )
+
 
+def set_service_scaling(
+    service: ecs.FargateService,
+    config: ServiceScalingConfig,
+    target_group: elbv2.ApplicationTargetGroup | None = None,
+) -> ecs.ScalableTaskCount:
+    """Set up auto scaling for a service.
 
-def set_service_scaling(service: ecs.FargateService, config: ServiceScalingConfig):
+    Request count and response time scaling use the metrics of the target
+    group, so it must be given if those are configured. Step scaling uses
+    the scale-out cooldown.
+    """
+    needs_target_group = (
+        "scale_request_count_target" in config
+        or "scale_p99_response_time" in config
+        or "scale_request_count_steps" in config
+    )
+    if needs_target_group and target_group is None:
+        raise ValueError("Request count and response time scaling need a target group")
+
+    scale_in_cooldown = _cooldown(config, "scale_in_cooldown_seconds")
+    scale_out_cooldown = _cooldown(config, "scale_out_cooldown_seconds")
     scaling = service.auto_scale_task_count(
         max_capacity=config["max_count"], min_capacity=config["min_count"]
     )
-    scaling.scale_on_cpu_utilization(
-        "CpuScaling", target_utilization_percent=config["scale_cpu_target"]["percent"]
-    )
-    scaling.scale_on_memory_utilization(
-        "MemoryScaling",
-        target_utilization_percent=config["scale_memory_target"]["percent"],
+    if "scale_cpu_target" in config:
+        scaling.scale_on_cpu_utilization(
+            "CpuScaling",
+            target_utilization_percent=config["scale_cpu_target"]["percent"],
+            scale_in_cooldown=scale_in_cooldown,
+            scale_out_cooldown=scale_out_cooldown,
+        )
+    if "scale_memory_target" in config:
+        scaling.scale_on_memory_utilization(
+            "MemoryScaling",
+            target_utilization_percent=config["scale_memory_target"]["percent"],
+            scale_in_cooldown=scale_in_cooldown,
+            scale_out_cooldown=scale_out_cooldown,
+        )
+    if target_group is not None and "scale_request_count_target" in config:
+        scaling.scale_on_request_count(
+            "RequestCountScaling",
+            requests_per_target=config["scale_request_count_target"]["requests_per_target"],
+            target_group=target_group,
+            scale_in_cooldown=scale_in_cooldown,
+            scale_out_cooldown=scale_out_cooldown,
+        )
+    if target_group is not None and "scale_p99_response_time" in config:
+        response_time = config["scale_p99_response_time"]
+        _add_step_scaling(
+            scaling,
+            "ResponseTimeScaling",
+            target_group.metrics.target_response_time(
+                statistic="p99", period=cdk.Duration.minutes(1)
+            ),
+            response_time["scale_out_seconds"],
+            response_time["scale_in_seconds"],
+            scale_out_cooldown,
+        )
+    if target_group is not None and "scale_request_count_steps" in config:
+        steps = config["scale_request_count_steps"]
+        _add_step_scaling(
+            scaling,
+            "RequestCountStepScaling",
+            target_group.metrics.request_count_per_target(period=cdk.Duration.minutes(1)),
+            steps["scale_out"],
+            steps["scale_in"],
+            scale_out_cooldown,
+        )
+    if "scale_queue_depth_steps" in config:
+        queue_depth = config["scale_queue_depth_steps"]
+        _add_step_scaling(
+            scaling,
+            "QueueDepthScaling",
+            queue_depth["queue"].metric_approximate_number_of_messages_visible(
+                period=cdk.Duration.minutes(1)
+            ),
+            queue_depth["scale_out"],
+            queue_depth["scale_in"],
+            scale_out_cooldown,
+        )
+    for window in config.get("schedules", []):
+        scaling.scale_on_schedule(
+            window["name"],
+            schedule=appscaling.Schedule.expression(f"cron({window['cron']})"),
+            min_capacity=window["min_count"],
+            max_capacity=window.get("max_count"),
+            time_zone=cdk.TimeZone.of(window["time_zone"]) if "time_zone" in window else None,
+        )
+    return scaling
+
+
+ScalingProfileName = Literal["steady", "bursty", "business-hours"]
+
+
+def scaling_profile(
+    name: ScalingProfileName,
+    min_count: int,
+    max_count: int,
+    queue: sqs.IQueue | None = None,
+    time_zone: str | None = None,
+) -> ServiceScalingConfig:
+    """Return the scaling config for a named profile.
+
+    steady:         CPU/memory target tracking with slow scale-in.
+    bursty:         fast step scaling on queue depth if a queue is given,
+                    otherwise on requests per target, with CPU as a backstop.
+    business-hours: raises the minimum count ahead of the weekday morning
+                    ramp and lowers it again in the evening, with step
+                    scaling on requests per target in between. The
+                    schedule is 06:30 to 19:00 in time_zone, an IANA name
+                    such as Europe/Stockholm, or in UTC without one.
+    """
+    config = ServiceScalingConfig(min_count=min_count, max_count=max_count)
+    if name == "steady":
+        config["scale_cpu_target"] = ScalingThreshold(percent=60)
+        config["scale_memory_target"] = ScalingThreshold(percent=75)
+        config["scale_in_cooldown_seconds"] = 300
+        config["scale_out_cooldown_seconds"] = 60
+    elif name == "bursty":
+        config["scale_cpu_target"] = ScalingThreshold(percent=50)
+        if queue is not None:
+            config["scale_queue_depth_steps"] = QueueDepthScaling(
+                queue=queue, scale_out=100, scale_in=10
+            )
+        else:
+            config["scale_request_count_steps"] = StepScaling(scale_out=1000, scale_in=200)
+        config["scale_in_cooldown_seconds"] = 300
+        config["scale_out_cooldown_seconds"] = 30
+    elif name == "business-hours":
+        prewarm_count = min(max_count, max(min_count * 2, min_count + 1))
+        config["scale_cpu_target"] = ScalingThreshold(percent=50)
+        config["scale_request_count_steps"] = StepScaling(scale_out=1000, scale_in=200)
+        config["schedules"] = [
+            ScheduledScalingWindow(
+                name="PreWarm", cron="30 6 ? * MON-FRI *", min_count=prewarm_count
+            ),
+            ScheduledScalingWindow(
+                name="WindDown", cron="0 19 ? * MON-FRI *", min_count=min_count
+            ),
+        ]
+        if time_zone is not None:
+            for window in config["schedules"]:
+                window["time_zone"] = time_zone
+        config["scale_in_cooldown_seconds"] = 300
+        config["scale_out_cooldown_seconds"] = 60
+    else:
+        raise ValueError(f"Unknown scaling profile: {name}")
+    return config
+
+
+class ServiceSpec(TypedDict):
+    task: TaskConfig
+    container: ContainerConfig
+    port: int
+    desired_count: int
+    use_public_endpoint: NotRequired[bool]
+    service_name: NotRequired[str]
+    sidecars: NotRequired[List[ContainerConfig]]
+    scaling: NotRequired[ServiceScalingConfig]
+    scaling_profile: NotRequired[ScalingProfileName]
+    scaling_time_zone: NotRequired[str]
+    scaling_queue: NotRequired[sqs.IQueue]
+    capacity_provider_strategies: NotRequired[List[CapacityProviderStrategy]]
+    routing: NotRequired[RoutingConfig]
+    target_group: NotRequired[TargetGroupConfig]
+    logging: NotRequired[LoggingConfig]
+    deployment: NotRequired[DeploymentConfig]
+
+
+def spec_scaling_config(spec: ServiceSpec) -> ServiceScalingConfig | None:
+    """Scaling config of a spec, with explicit settings overriding a profile.
+
+    A profile without explicit counts scales between the desired count and
+    four times the desired count.
+    """
+    if "scaling_profile" not in spec:
+        return spec.get("scaling")
+    explicit = spec.get("scaling", {})
+    min_count = explicit.get("min_count", spec["desired_count"])
+    max_count = explicit.get("max_count", spec["desired_count"] * 4)
+    profile = scaling_profile(
+        spec["scaling_profile"], min_count, max_count, spec.get("scaling_queue"),
+        spec.get("scaling_time_zone"),
     )
+    return ServiceScalingConfig(**{**profile, **explicit})
+
+
+def shared_log_group(scope: cons.Construct, retention: LogRetention = "ONE_DAY") -> logs.ILogGroup:
+    """Log group shared by the services that add_services builds in scope with the same retention."""
+    id = "service-logs" if retention == "ONE_DAY" else f"service-logs-{retention.lower()}"
+    log_group = scope.node.try_find_child(id)
+    if log_group is None:
+        log_group = logs.LogGroup(scope, id, retention=getattr(logs.RetentionDays, retention))
+    return log_group
+
+
+def add_services(
+    scope: cons.Construct,
+    cluster: ecs.Cluster,
+    specs: List[ServiceSpec],
+    listener: elbv2.ApplicationListener | None = None,
+) -> Dict[str, ecspat.ApplicationLoadBalancedFargateService | RoutedService]:
+    """Build many services in one pass, keyed by task family.
+
+    The services share one log group per retention, one security group and
+    one container image object per image reference, instead of creating
+    their own copies.
+    If a listener is given, all services are attached to it with routing rules
+    from their specs instead of getting a load balancer each.
+    """
+    families = [spec["task"]["family"] for spec in specs]
+    duplicates = sorted({family for family in families if families.count(family) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate task families in service specs: {duplicates}")
+    if listener is not None:
+        unrouted = [spec["task"]["family"] for spec in specs if "routing" not in spec]
+        if unrouted:
+            raise ValueError(f"Service specs without routing on shared listener: {unrouted}")
+        priorities = [spec["routing"]["priority"] for spec in specs]
+        if len(set(priorities)) != len(priorities):
+            raise ValueError("Routing priorities must be unique on a shared listener")
+
+    security_group = scope.node.try_find_child("service-sg")
+    if security_group is None:
+        security_group = ec2.SecurityGroup(scope, "service-sg", vpc=cluster.vpc)
+
+    images: Dict[str, ecs.ContainerImage] = {}
+    services: Dict[str, ecspat.ApplicationLoadBalancedFargateService | RoutedService] = {}
+    for spec in specs:
+        family = spec["task"]["family"]
+        logging = spec.get("logging", LoggingConfig())
+        taskdef = add_task_definition_with_containers(
+            scope,
+            f"taskdef-{family}",
+            spec["task"],
+            [spec["container"], *spec.get("sidecars", [])],
+            log_group=shared_log_group(scope, logging.get("retention", "ONE_DAY")),
+            images=images,
+            logging=logging,
+        )
+        if listener is None:
+            service = add_service(
+                scope,
+                f"service-{family}",
+                cluster,
+                taskdef,
+                spec["port"],
+                spec["desired_count"],
+                spec.get("use_public_endpoint", True),
+                spec.get("service_name"),
+                security_groups=[security_group],
+                capacity_provider_strategies=spec.get("capacity_provider_strategies"),
+                target_group=spec.get("target_group"),
+                deployment=spec.get("deployment"),
+            )
+            fargate_service = service.service
+            target_group = service.target_group
+        else:
+            service = add_routed_service(
+                scope,
+                f"service-{family}",
+                cluster,
+                taskdef,
+                listener,
+                spec["port"],
+                spec["desired_count"],
+                spec["routing"],
+                spec.get("target_group"),
+                spec.get("service_name"),
+                security_groups=[security_group],
+                capacity_provider_strategies=spec.get("capacity_provider_strategies"),
+                deployment=spec.get("deployment"),
+            )
+            fargate_service = service["service"]
+            target_group = service["target_group"]
+        scaling_config = spec_scaling_config(spec)
+        if scaling_config is not None:
+            set_service_scaling(
+                service=fargate_service, config=scaling_config, target_group=target_group
+            )
+        services[family] = service
+    return services
@@ -3,6 +3,7 @@ import aws_cdk as cdk
 from aws_cdk import (
     aws_ec2 as ec2,
     aws_ecs as ecs,
+    aws_sqs as sqs,
     assertions,
 )
 import containers
@@ -38,6 +39,24 @@ def test_check_that_container_insights_become_enabled():
         )
     })
 
+def test_enhanced_container_insights():
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+    containers.add_cluster(stack, "test-cluster", containers.ClusterConfig(vpc=vpc, container_insights="enhanced"))
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::Cluster",
+        {"ClusterSettings": [{"Name": "containerInsights", "Value": "enhanced"}]},
+    )
+
+    with pytest.raises(ValueError):
+        containers.add_cluster(
+            stack,
+            "other-cluster",
+            containers.ClusterConfig(vpc=vpc, container_insights="enhanced", enable_container_insights=True),
+        )
+
 def test_ecs_fargate_task_definition_defined():
     stack = cdk.Stack()
     cpuval = 512
@@ -132,22 +151,16 @@ def service_test_input_data():
     return {"stack": stack, "cluster": cluster, "task_definition": taskdef}
 
 
-def test_fargate_service_created_with_only_mandatory_properties(
-    service_test_input_data,
-):
-    stack = service_test_input_data["stack"]
-    cluster = service_test_input_data["cluster"]
-    taskdef = service_test_input_data["task_definition"]
-
+def test_fargate_service_created_with_only_mandatory_properties(service_template):
     port = 80
     desired_count = 1
 
-    service = containers.add_service(
-        stack, "test-service", cluster, taskdef, port, desired_count
-    )
+    template, built = service_template(port, desired_count)
+    cluster = built["cluster"]
+    taskdef = built["task_definition"]
+    service = built["service"]
 
     sg_capture = assertions.Capture()
-    template = assertions.Template.from_stack(stack)
 
     assert service.cluster == cluster
     assert service.task_definition == taskdef
@@ -191,18 +204,11 @@ def test_fargate_service_created_with_only_mandatory_properties(
     )
 
 
-def test_fargate_service_created_without_public_access(service_test_input_data):
-    stack = service_test_input_data["stack"]
-    cluster = service_test_input_data["cluster"]
-    taskdef = service_test_input_data["task_definition"]
-
+def test_fargate_service_created_without_public_access(service_template):
     port = 80
     desired_count = 1
-    containers.add_service(
-        stack, "test-service", cluster, taskdef, port, desired_count, False
-    )
+    template, _ = service_template(port, desired_count, False)
 
-    template = assertions.Template.from_stack(stack)
     template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 1)
     template.has_resource_properties(
         "AWS::ElasticLoadBalancingV2::LoadBalancer",
@@ -272,3 +278,927 @@ def test_scaling_settings_for_service(service_test_input_data):
             ),
         },
     )
+
+
+def test_add_services_shares_log_group_and_security_group():
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+    cluster = containers.add_cluster(stack, "test-cluster", containers.ClusterConfig(vpc=vpc))
+    image_name = "public.ecr.aws/aws-containers/hello-app-runner:latest"
+    specs = [
+        containers.ServiceSpec(
+            task=containers.TaskConfig(cpu=512, memory_limit_mib=1024, family=family),
+            container=containers.ContainerConfig(image=image_name, tcp_ports=[8000]),
+            port=80,
+            desired_count=1,
+            scaling=containers.ServiceScalingConfig(
+                min_count=1,
+                max_count=2,
+                scale_cpu_target=containers.ScalingThreshold(percent=50),
+                scale_memory_target=containers.ScalingThreshold(percent=50),
+            ),
+        )
+        for family in ["first", "second", "third"]
+    ]
+
+    services = containers.add_services(stack, cluster, specs)
+
+    assert sorted(services.keys()) == ["first", "second", "third"]
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::ECS::Service", 3)
+    template.resource_count_is("AWS::Logs::LogGroup", 1)
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 3)
+    sg_ids = {
+        str(service.service.connections.security_groups[0].node.path)
+        for service in services.values()
+    }
+    assert len(sg_ids) == 1
+
+
+def test_add_services_rejects_duplicate_families(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    spec = containers.ServiceSpec(
+        task=containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="dup"),
+        container=containers.ContainerConfig(
+            image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+            tcp_ports=[8000],
+        ),
+        port=80,
+        desired_count=1,
+    )
+
+    with pytest.raises(ValueError):
+        containers.add_services(stack, cluster, [spec, spec])
+
+
+def test_add_services_on_shared_listener_uses_one_load_balancer():
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+    cluster = containers.add_cluster(stack, "test-cluster", containers.ClusterConfig(vpc=vpc))
+    listener = containers.add_shared_load_balancer(stack, "shared-alb", cluster)
+    image_name = "public.ecr.aws/aws-containers/hello-app-runner:latest"
+    specs = [
+        containers.ServiceSpec(
+            task=containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="api"),
+            container=containers.ContainerConfig(image=image_name, tcp_ports=[8000]),
+            port=8000,
+            desired_count=1,
+            routing=containers.RoutingConfig(priority=10, path_patterns=["/api/*"]),
+            target_group=containers.TargetGroupConfig(
+                health_check_path="/health", deregistration_delay_seconds=5
+            ),
+        ),
+        containers.ServiceSpec(
+            task=containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="web"),
+            container=containers.ContainerConfig(image=image_name, tcp_ports=[8000]),
+            port=8000,
+            desired_count=1,
+            routing=containers.RoutingConfig(priority=20, host_headers=["www.example.com"]),
+        ),
+    ]
+
+    containers.add_services(stack, cluster, specs, listener=listener)
+
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 1)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::Listener", 1)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::ListenerRule", 2)
+    template.resource_count_is("AWS::ECS::Service", 2)
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::ListenerRule",
+        {
+            "Priority": 10,
+            "Conditions": [
+                {"Field": "path-pattern", "PathPatternConfig": {"Values": ["/api/*"]}}
+            ],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup",
+        {
+            "HealthCheckPath": "/health",
+            "HealthCheckIntervalSeconds": 10,
+            "TargetGroupAttributes": assertions.Match.array_with(
+                [{"Key": "deregistration_delay.timeout_seconds", "Value": "5"}]
+            ),
+        },
+    )
+
+
+def test_routed_service_requires_a_routing_condition(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    taskdef = service_test_input_data["task_definition"]
+    listener = containers.add_shared_load_balancer(stack, "shared-alb", cluster)
+
+    with pytest.raises(ValueError):
+        containers.add_routed_service(
+            stack, "test-service", cluster, taskdef, listener, 8000, 1,
+            containers.RoutingConfig(priority=1),
+        )
+
+
+def test_scaling_on_request_count_response_time_and_schedule(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    taskdef = service_test_input_data["task_definition"]
+    service = containers.add_service(stack, "test-service", cluster, taskdef, 80, 2, False)
+
+    config = containers.ServiceScalingConfig(
+        min_count=2,
+        max_count=10,
+        scale_request_count_target=containers.RequestCountThreshold(requests_per_target=500),
+        scale_p99_response_time=containers.ResponseTimeScaling(
+            scale_out_seconds=0.5, scale_in_seconds=0.1
+        ),
+        schedules=[
+            containers.ScheduledScalingWindow(
+                name="MorningRamp", cron="30 6 ? * MON-FRI *", min_count=6
+            )
+        ],
+        scale_in_cooldown_seconds=300,
+        scale_out_cooldown_seconds=30,
+    )
+    containers.set_service_scaling(
+        service=service.service, config=config, target_group=service.target_group
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        {
+            "PolicyType": "TargetTrackingScaling",
+            "TargetTrackingScalingPolicyConfiguration": assertions.Match.object_like(
+                {
+                    "PredefinedMetricSpecification": assertions.Match.object_like(
+                        {"PredefinedMetricType": "ALBRequestCountPerTarget"}
+                    ),
+                    "TargetValue": 500,
+                    "ScaleInCooldown": 300,
+                    "ScaleOutCooldown": 30,
+                }
+            ),
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        {"PolicyType": "StepScaling"},
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {"ExtendedStatistic": "p99", "MetricName": "TargetResponseTime"},
+    )
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {
+            "ScheduledActions": [
+                assertions.Match.object_like(
+                    {
+                        "ScheduledActionName": "MorningRamp",
+                        "Schedule": "cron(30 6 ? * MON-FRI *)",
+                        "ScalableTargetAction": {"MinCapacity": 6},
+                    }
+                )
+            ]
+        },
+    )
+
+
+def test_request_count_scaling_requires_target_group(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    taskdef = service_test_input_data["task_definition"]
+    service = containers.add_service(stack, "test-service", cluster, taskdef, 80, 2, False)
+
+    config = containers.ServiceScalingConfig(
+        min_count=1,
+        max_count=4,
+        scale_request_count_target=containers.RequestCountThreshold(requests_per_target=100),
+    )
+    with pytest.raises(ValueError):
+        containers.set_service_scaling(service=service.service, config=config)
+
+
+def test_scaling_profile_business_hours_prewarms_ahead_of_peak():
+    config = containers.scaling_profile("business-hours", min_count=2, max_count=10)
+
+    assert [window["name"] for window in config["schedules"]] == ["PreWarm", "WindDown"]
+    assert config["schedules"][0]["min_count"] == 4
+    assert config["schedules"][1]["min_count"] == 2
+    assert "scale_request_count_steps" in config
+    assert all("time_zone" not in window for window in config["schedules"])
+
+    config = containers.scaling_profile(
+        "business-hours", min_count=2, max_count=10, time_zone="Europe/Stockholm"
+    )
+    assert [window["time_zone"] for window in config["schedules"]] == ["Europe/Stockholm"] * 2
+
+
+def test_scaling_profile_bursty_scales_on_queue_depth_when_queue_given():
+    stack = cdk.Stack()
+    queue = sqs.Queue(stack, "queue")
+
+    config = containers.scaling_profile("bursty", min_count=1, max_count=8, queue=queue)
+
+    assert config["scale_queue_depth_steps"]["queue"] is queue
+    assert "scale_request_count_steps" not in config
+
+
+def test_add_services_applies_scaling_profile_from_spec():
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+    cluster = containers.add_cluster(stack, "test-cluster", containers.ClusterConfig(vpc=vpc))
+    spec = containers.ServiceSpec(
+        task=containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="web"),
+        container=containers.ContainerConfig(
+            image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+            tcp_ports=[8000],
+        ),
+        port=80,
+        desired_count=2,
+        scaling_profile="business-hours",
+        scaling_time_zone="Europe/Stockholm",
+    )
+
+    containers.add_services(stack, cluster, [spec])
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {
+            "MinCapacity": 2,
+            "MaxCapacity": 8,
+            "ScheduledActions": assertions.Match.array_with(
+                [
+                    assertions.Match.object_like(
+                        {
+                            "ScheduledActionName": "PreWarm",
+                            "ScalableTargetAction": {"MinCapacity": 4},
+                            "Timezone": "Europe/Stockholm",
+                        }
+                    )
+                ]
+            ),
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {"MetricName": "RequestCountPerTarget"},
+    )
+
+
+def test_cluster_with_fargate_capacity_providers_and_spot_service():
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+    config = containers.ClusterConfig(vpc=vpc, enable_fargate_capacity_providers=True)
+    cluster = containers.add_cluster(stack, "test-cluster", config)
+    taskdef = containers.add_task_definition_with_container(
+        stack,
+        "test-taskdef",
+        containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test"),
+        containers.ContainerConfig(
+            image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+            tcp_ports=[8000],
+        ),
+    )
+
+    containers.add_service(
+        stack, "test-service", cluster, taskdef, 80, 2,
+        capacity_provider_strategies=containers.spot_burst_strategy(base_count=2),
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::ClusterCapacityProviderAssociations",
+        {"CapacityProviders": assertions.Match.array_with(["FARGATE", "FARGATE_SPOT"])},
+    )
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "CapacityProviderStrategy": [
+                {"CapacityProvider": "FARGATE", "Weight": 1, "Base": 2},
+                {"CapacityProvider": "FARGATE_SPOT", "Weight": 3},
+            ],
+            "LaunchType": assertions.Match.absent(),
+        },
+    )
+
+
+def test_capacity_provider_strategy_allows_only_one_base(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    taskdef = service_test_input_data["task_definition"]
+    strategies = [
+        containers.CapacityProviderStrategy(capacity_provider="FARGATE", weight=1, base=1),
+        containers.CapacityProviderStrategy(capacity_provider="FARGATE_SPOT", weight=1, base=1),
+    ]
+
+    with pytest.raises(ValueError):
+        containers.add_service(
+            stack, "test-service", cluster, taskdef, 80, 2,
+            capacity_provider_strategies=strategies,
+        )
+
+
+def test_task_definition_on_arm64_runtime_platform():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(
+        cpu=512, memory_limit_mib=1024, family="test", cpu_architecture="ARM64"
+    )
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+        tcp_ports=[8000],
+        image_architectures=["X86_64", "ARM64"],
+    )
+    containers.add_task_definition_with_container(stack, "test-taskdef", taskcfg, containercfg)
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "RuntimePlatform": {
+                "CpuArchitecture": "ARM64",
+                "OperatingSystemFamily": "LINUX",
+            }
+        },
+    )
+
+
+def test_task_architecture_must_match_image_platforms():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(
+        cpu=512, memory_limit_mib=1024, family="test", cpu_architecture="ARM64"
+    )
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+        tcp_ports=[8000],
+        image_architectures=["X86_64"],
+    )
+
+    with pytest.raises(ValueError):
+        containers.add_task_definition_with_container(stack, "test-taskdef", taskcfg, containercfg)
+
+
+def test_task_definition_with_sidecars_and_start_order():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=1024, memory_limit_mib=2048, family="test")
+    app = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+        tcp_ports=[8000],
+        name="app",
+        cpu=768,
+        memory_reservation_mib=1536,
+        depends_on=[containers.ContainerDependency(container="cache", condition="HEALTHY")],
+    )
+    cache = containers.ContainerConfig(
+        image="public.ecr.aws/docker/library/redis:7",
+        tcp_ports=[],
+        name="cache",
+        cpu=256,
+        memory_reservation_mib=256,
+        health_check=containers.ContainerHealthCheck(
+            command=["CMD", "redis-cli", "ping"], interval_seconds=5, retries=3
+        ),
+    )
+    agent = containers.ContainerConfig(
+        image="public.ecr.aws/cloudwatch-agent/cloudwatch-agent:latest",
+        tcp_ports=[],
+        name="metrics-agent",
+        essential=False,
+    )
+
+    taskdef = containers.add_task_definition_with_containers(
+        stack, "test-taskdef", taskcfg, [app, cache, agent]
+    )
+
+    assert taskdef.default_container.container_name == "app"
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "Name": "app",
+                        "Cpu": 768,
+                        "MemoryReservation": 1536,
+                        "DependsOn": [{"Condition": "HEALTHY", "ContainerName": "cache"}],
+                    }
+                ),
+                assertions.Match.object_like(
+                    {
+                        "Name": "cache",
+                        "HealthCheck": assertions.Match.object_like(
+                            {"Command": ["CMD", "redis-cli", "ping"], "Interval": 5, "Retries": 3}
+                        ),
+                    }
+                ),
+                assertions.Match.object_like({"Name": "metrics-agent", "Essential": False}),
+            ]
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "app_depends_on, sidecar",
+    [
+        ([], containers.ContainerConfig(image="sidecar:1", tcp_ports=[], cpu=1024)),
+        (
+            [],
+            containers.ContainerConfig(
+                image="sidecar:1",
+                tcp_ports=[],
+                depends_on=[containers.ContainerDependency(container="missing", condition="START")],
+            ),
+        ),
+        (
+            [],
+            containers.ContainerConfig(
+                image="sidecar:1",
+                tcp_ports=[],
+                depends_on=[containers.ContainerDependency(container="container-app", condition="HEALTHY")],
+            ),
+        ),
+        (
+            [containers.ContainerDependency(container="container-sidecar", condition="START")],
+            containers.ContainerConfig(
+                image="sidecar:1",
+                tcp_ports=[],
+                depends_on=[containers.ContainerDependency(container="container-app", condition="START")],
+            ),
+        ),
+        (
+            [containers.ContainerDependency(container="container-sidecar", condition="SUCCESS")],
+            containers.ContainerConfig(image="sidecar:1", tcp_ports=[]),
+        ),
+    ],
+)
+def test_invalid_container_combinations_are_rejected(app_depends_on, sidecar):
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    app = containers.ContainerConfig(image="app:1", tcp_ports=[8000], cpu=256, depends_on=app_depends_on)
+
+    with pytest.raises(ValueError):
+        containers.add_task_definition_with_containers(stack, "test-taskdef", taskcfg, [app, sidecar])
+
+
+def test_service_with_fast_target_group_preset(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    taskdef = service_test_input_data["task_definition"]
+
+    containers.add_service(
+        stack, "test-service", cluster, taskdef, 80, 2,
+        target_group=containers.TargetGroupConfig(
+            **containers.TARGET_GROUP_PRESETS["fast"], health_check_path="/health"
+        ),
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup",
+        {
+            "HealthCheckPath": "/health",
+            "HealthCheckIntervalSeconds": 5,
+            "HealthCheckTimeoutSeconds": 4,
+            "HealthyThresholdCount": 2,
+            "UnhealthyThresholdCount": 2,
+            "TargetGroupAttributes": assertions.Match.array_with(
+                [{"Key": "deregistration_delay.timeout_seconds", "Value": "10"}]
+            ),
+        },
+    )
+
+
+def test_http_container_health_check_preset():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+        tcp_ports=[8000],
+        health_check=containers.http_container_health_check(8000, "/health"),
+    )
+    containers.add_task_definition_with_container(stack, "test-taskdef", taskcfg, containercfg)
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "HealthCheck": {
+                            "Command": [
+                                "CMD-SHELL",
+                                "curl -f http://localhost:8000/health || exit 1",
+                            ],
+                            "Interval": 5,
+                            "Timeout": 2,
+                            "Retries": 2,
+                            "StartPeriod": 10,
+                        }
+                    }
+                )
+            ]
+        },
+    )
+
+
+def test_service_template_is_reused_for_the_same_configuration(service_template):
+    first, first_built = service_template(80, 1, False)
+    second, second_built = service_template(80, 1, False)
+
+    assert first is second
+    assert first_built["service"] is second_built["service"]
+
+
+def test_awslogs_non_blocking_with_buffer_size():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest", tcp_ports=[8000]
+    )
+    logging = containers.LoggingConfig(non_blocking=True, max_buffer_size_mib=25, retention="ONE_WEEK")
+    containers.add_task_definition_with_container(
+        stack, "test-taskdef", taskcfg, containercfg, logging=logging
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties("AWS::Logs::LogGroup", {"RetentionInDays": 7})
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": [
+                assertions.Match.object_like(
+                    {
+                        "LogConfiguration": {
+                            "LogDriver": "awslogs",
+                            "Options": assertions.Match.object_like(
+                                {"mode": "non-blocking", "max-buffer-size": "26214400b"}
+                            ),
+                        }
+                    }
+                )
+            ]
+        },
+    )
+
+
+def test_firelens_to_s3_adds_log_router_with_batching():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest", tcp_ports=[8000]
+    )
+    logging = containers.LoggingConfig(
+        driver="firelens", destination="s3", bucket_name="my-log-bucket",
+        batch_size_mib=10, batch_timeout_seconds=30, max_buffer_size_mib=8,
+    )
+    containers.add_task_definition_with_container(
+        stack, "test-taskdef", taskcfg, containercfg, logging=logging
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": assertions.Match.array_with(
+                [
+                    assertions.Match.object_like(
+                        {
+                            "Name": "log-router",
+                            "FirelensConfiguration": {"Type": "fluentbit"},
+                        }
+                    ),
+                    assertions.Match.object_like(
+                        {
+                            "LogConfiguration": {
+                                "LogDriver": "awsfirelens",
+                                "Options": assertions.Match.object_like(
+                                    {
+                                        "Name": "s3",
+                                        "bucket": "my-log-bucket",
+                                        "total_file_size": "10M",
+                                        "upload_timeout": "30s",
+                                        "log-driver-buffer-limit": str(8 * 1024 * 1024),
+                                    }
+                                ),
+                            }
+                        }
+                    ),
+                ]
+            )
+        },
+    )
+    template.has_resource_properties(
+        "AWS::IAM::Policy",
+        {
+            "PolicyDocument": {
+                "Statement": assertions.Match.array_with(
+                    [assertions.Match.object_like({"Action": assertions.Match.array_with(["s3:PutObject"])})]
+                )
+            }
+        },
+    )
+
+
+def test_load_balanced_service_with_firelens_routes_to_the_app_container():
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+    cluster = containers.add_cluster(stack, "test-cluster", containers.ClusterConfig(vpc=vpc))
+    taskdef = containers.add_task_definition_with_container(
+        stack,
+        "test-taskdef",
+        containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test"),
+        containers.ContainerConfig(
+            image="public.ecr.aws/aws-containers/hello-app-runner:latest", tcp_ports=[8000], name="app"
+        ),
+        logging=containers.LoggingConfig(driver="firelens"),
+    )
+    containers.add_service(stack, "test-service", cluster, taskdef, 8000, 1)
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {"LoadBalancers": [assertions.Match.object_like({"ContainerName": "app", "ContainerPort": 8000})]},
+    )
+
+
+def test_emf_namespace_sets_up_containers_for_embedded_metrics():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest", tcp_ports=[8000], name="app"
+    )
+    logging = containers.LoggingConfig(driver="firelens", emf_namespace="MyApp")
+    containers.add_task_definition_with_container(
+        stack, "test-taskdef", taskcfg, containercfg, logging=logging
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::TaskDefinition",
+        {
+            "ContainerDefinitions": assertions.Match.array_with(
+                [
+                    assertions.Match.object_like(
+                        {
+                            "Name": "app",
+                            "Environment": assertions.Match.array_with(
+                                [
+                                    {"Name": "AWS_EMF_ENVIRONMENT", "Value": "Local"},
+                                    {"Name": "AWS_EMF_NAMESPACE", "Value": "MyApp"},
+                                    {"Name": "AWS_EMF_SERVICE_NAME", "Value": "app"},
+                                ]
+                            ),
+                            "LogConfiguration": {
+                                "LogDriver": "awsfirelens",
+                                "Options": assertions.Match.object_like(
+                                    {"Name": "cloudwatch_logs", "log_key": "log"}
+                                ),
+                            },
+                        }
+                    ),
+                ]
+            )
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "logging",
+    [
+        containers.LoggingConfig(max_buffer_size_mib=25),
+        containers.LoggingConfig(destination="s3", bucket_name="my-log-bucket"),
+        containers.LoggingConfig(driver="firelens", destination="firehose"),
+        containers.LoggingConfig(driver="firelens", non_blocking=True),
+        containers.LoggingConfig(driver="firelens", batch_size_mib=10),
+        containers.LoggingConfig(
+            driver="firelens", destination="s3", bucket_name="my-log-bucket", emf_namespace="MyApp"
+        ),
+    ],
+)
+def test_invalid_logging_settings_are_rejected(logging):
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest", tcp_ports=[8000]
+    )
+
+    with pytest.raises(ValueError):
+        containers.validate_task(taskcfg, [containercfg], logging)
+
+
+def test_service_with_fast_deployment_preset(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    taskdef = service_test_input_data["task_definition"]
+
+    containers.add_service(
+        stack, "test-service", cluster, taskdef, 80, 2,
+        deployment=containers.DeploymentConfig(preset="fast"),
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "DeploymentConfiguration": assertions.Match.object_like(
+                {
+                    "MinimumHealthyPercent": 100,
+                    "MaximumPercent": 200,
+                    "DeploymentCircuitBreaker": {"Enable": True, "Rollback": True},
+                }
+            ),
+            "HealthCheckGracePeriodSeconds": 10,
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup",
+        {
+            "TargetGroupAttributes": assertions.Match.array_with(
+                [{"Key": "deregistration_delay.timeout_seconds", "Value": "5"}]
+            ),
+        },
+    )
+
+
+def test_service_with_blue_green_deployment(service_test_input_data):
+    stack = service_test_input_data["stack"]
+    cluster = service_test_input_data["cluster"]
+    taskdef = service_test_input_data["task_definition"]
+
+    containers.add_service(
+        stack, "test-service", cluster, taskdef, 80, 2,
+        deployment=containers.DeploymentConfig(preset="safe", strategy="blue_green"),
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::Service", {"DeploymentController": {"Type": "CODE_DEPLOY"}}
+    )
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::TargetGroup", 2)
+    green = [
+        logical_id
+        for logical_id in template.find_resources("AWS::ElasticLoadBalancingV2::TargetGroup")
+        if logical_id.startswith("testservicegreen")
+    ]
+    assert len(green) == 1
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::Listener",
+        {
+            "Port": containers.DEFAULT_TEST_LISTENER_PORT,
+            "DefaultActions": [{"Type": "forward", "TargetGroupArn": {"Ref": green[0]}}],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CodeDeploy::DeploymentGroup",
+        {
+            "DeploymentConfigName": "CodeDeployDefault.ECSCanary10Percent5Minutes",
+            "LoadBalancerInfo": {
+                "TargetGroupPairInfoList": [
+                    assertions.Match.object_like(
+                        {"TestTrafficRoute": {"ListenerArns": [assertions.Match.any_value()]}}
+                    )
+                ]
+            },
+            "BlueGreenDeploymentConfiguration": assertions.Match.object_like(
+                {
+                    "TerminateBlueInstancesOnDeploymentSuccess": {
+                        "Action": "TERMINATE",
+                        "TerminationWaitTimeInMinutes": 15,
+                    }
+                }
+            ),
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "deployment",
+    [
+        containers.DeploymentConfig(min_healthy_percent=100, max_healthy_percent=100),
+        containers.DeploymentConfig(min_healthy_percent=120),
+        containers.DeploymentConfig(traffic_shift="ALL_AT_ONCE"),
+        containers.DeploymentConfig(test_listener_port=8080),
+        containers.DeploymentConfig(preset="quick"),  # type: ignore
+    ],
+)
+def test_invalid_deployment_settings_are_rejected(deployment):
+    with pytest.raises(ValueError):
+        containers.deployment_settings(deployment)
+
+
+def test_estimated_rollout_is_faster_with_fast_preset():
+    fast = containers.estimate_rollout_seconds(10, containers.DeploymentConfig(preset="fast"))
+    safe = containers.estimate_rollout_seconds(10, containers.DeploymentConfig(preset="safe"))
+    default = containers.estimate_rollout_seconds(10)
+
+    # One batch of 30s start, 150s of health checks and 5s draining.
+    assert fast == 30 + 150 + 5
+    # Two batches of five tasks.
+    assert safe == 2 * (30 + 150 + 60)
+    assert default == 30 + 150 + 300
+    blue_green = containers.estimate_rollout_seconds(
+        10, containers.DeploymentConfig(preset="safe", strategy="blue_green")
+    )
+    assert blue_green == 30 + 150 + 60 * (5 + 15) + 60
+
+
+DIGEST = "sha256:" + "a" * 64
+
+
+@pytest.mark.parametrize(
+    "image_ref",
+    [
+        "public.ecr.aws/aws-containers/hello-app-runner:latest",
+        f"public.ecr.aws/aws-containers/hello-app-runner@{DIGEST}",
+        f"123456789012.dkr.ecr.eu-west-1.amazonaws.com/team/hello-app-runner@{DIGEST}",
+        "localhost:5000/hello-app-runner",
+    ],
+)
+def test_extract_image_name_handles_tags_and_digests(image_ref):
+    assert containers._extract_image_name(image_ref) == "hello-app-runner"
+
+
+def test_digest_pinned_ecr_image_is_pulled_from_repository():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    containercfg = containers.ContainerConfig(
+        image=f"123456789012.dkr.ecr.eu-west-1.amazonaws.com/team/webapp@{DIGEST}",
+        tcp_ports=[8000],
+        soci_index=True,
+    )
+    containers.add_task_definition_with_container(stack, "test-taskdef", taskcfg, containercfg)
+
+    template = assertions.Template.from_stack(stack)
+    task_definition = list(template.find_resources("AWS::ECS::TaskDefinition").values())[0]
+    image = task_definition["Properties"]["ContainerDefinitions"][0]["Image"]
+    assert f"team/webapp@{DIGEST}" in str(image)
+    policies = str(template.find_resources("AWS::IAM::Policy"))
+    assert ":123456789012:repository/team/webapp" in policies
+    template.has_resource_properties(
+        "AWS::IAM::Policy",
+        {
+            "PolicyDocument": {
+                "Statement": assertions.Match.array_with(
+                    [
+                        assertions.Match.object_like(
+                            {"Action": assertions.Match.array_with(["ecr:BatchGetImage"])}
+                        )
+                    ]
+                )
+            }
+        },
+    )
+
+
+def test_public_image_through_pull_through_cache():
+    stack = cdk.Stack()
+    containers.add_pull_through_cache_rules(stack, ["public.ecr.aws"])
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+        tcp_ports=[8000],
+        pull_through_cache=True,
+    )
+    containers.add_task_definition_with_container(stack, "test-taskdef", taskcfg, containercfg)
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECR::PullThroughCacheRule",
+        {"EcrRepositoryPrefix": "ecr-public", "UpstreamRegistryUrl": "public.ecr.aws"},
+    )
+    task_definition = list(template.find_resources("AWS::ECS::TaskDefinition").values())[0]
+    image = str(task_definition["Properties"]["ContainerDefinitions"][0]["Image"])
+    assert "ecr-public/aws-containers/hello-app-runner:latest" in image
+    assert "public.ecr.aws" not in image
+    template.has_resource_properties(
+        "AWS::IAM::Policy",
+        {
+            "PolicyDocument": {
+                "Statement": assertions.Match.array_with(
+                    [
+                        assertions.Match.object_like(
+                            {"Action": ["ecr:BatchImportUpstreamImage", "ecr:CreateRepository"]}
+                        )
+                    ]
+                )
+            }
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "containercfg",
+    [
+        containers.ContainerConfig(image="docker.io/library/nginx:latest", tcp_ports=[80], pull_through_cache=True),
+        containers.ContainerConfig(image="public.ecr.aws/nginx/nginx:latest", tcp_ports=[80], soci_index=True),
+        containers.ContainerConfig(image="public.ecr.aws/nginx/nginx@sha256:abc", tcp_ports=[80]),
+    ],
+)
+def test_invalid_image_settings_are_rejected(containercfg):
+    taskcfg = containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test")
+
+    with pytest.raises(ValueError):
+        containers.validate_task(taskcfg, [containercfg])
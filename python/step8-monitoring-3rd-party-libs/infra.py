@@ -0,0 +1,196 @@
+"""The container infrastructure of my-container-infra.py, for one environment.
+
+The stacks are built below a scope that can be the App itself, or a Stage per
+environment as in synth_driver.py.
+"""
+from typing import Dict
+import aws_cdk as cdk
+from aws_cdk import (
+    aws_cloudwatch as cw,
+    aws_ec2 as ec2,
+    aws_sns as sns,
+    aws_sns_subscriptions as snssubs,
+)
+import cdk_monitoring_constructs as cdkmon
+import catalog
+import containers
+import monitoring
+import networking
+import sharding
+
+STACK_NAME = "my-container-infra"
+
+_SLO_OBJECTIVES = [
+    "latency_p50_ms", "latency_p90_ms", "latency_p99_ms", "max_5xx_percent", "max_cpu_percent",
+    "max_memory_percent", "max_rejected_connections", "min_healthy_hosts",
+]
+
+
+def monitoring_resources(service_catalog: catalog.ServiceCatalog) -> Dict[str, int]:
+    """Number of alarms and metric filters add_container_infra builds for each service."""
+    dashboard = service_catalog["dashboard"]
+    counts = {}
+    for name, service_monitoring in service_catalog["monitoring"].items():
+        count = 1 if "min_running_tasks" in service_monitoring else 0
+        slos = service_monitoring.get("slos", {})
+        objectives = sum(1 for key in _SLO_OBJECTIVES if key in slos)
+        # One alarm per objective and the composite alarm.
+        count += objectives + 1 if objectives else 0
+        if "anomaly_detection" in dashboard:
+            count += len(dashboard["anomaly_detection"].get("metrics", monitoring.DEFAULT_ANOMALY_METRICS))
+        metric_math = dashboard.get("metric_math", {})
+        count += sum(1 for key in ("max_error_ratio_percent", "max_latency_per_request_ms") if key in metric_math)
+        for metric in service_monitoring.get("custom_metrics", []):
+            count += ("max_value" in metric) + ("json_field" in metric)
+        task_resources = service_monitoring.get("task_resources", {})
+        count += sum(1 for key in ("max_task_cpu_percent", "max_task_memory_percent") if key in task_resources)
+        counts[name] = count
+    return counts
+
+
+def add_container_infra(
+    scope: cdk.App | cdk.Stage,
+    service_catalog: catalog.ServiceCatalog,
+    env: cdk.Environment | None = None,
+) -> cdk.Stack:
+    """Build the cluster, services and monitoring from a service catalog.
+
+    Context values vpcname (use an existing VPC) and shards (a comma-separated
+    list of shard indices to build) are read from the scope.
+    """
+    stack = cdk.Stack(scope, STACK_NAME, env=env)
+
+    network = service_catalog.get("network", networking.NetworkConfig())
+    vpcname = scope.node.try_get_context("vpcname")
+    if vpcname:
+        vpc = ec2.Vpc.from_lookup(stack, "vpc", vpc_name=vpcname)
+        # An existing VPC only gets the endpoints that are asked for.
+        if "endpoints" in network:
+            networking.add_vpc_endpoints(vpc, network["endpoints"])
+    else:
+        vpc_config: networking.NetworkConfig = {"vpc_name": "my-vpc", **network}
+        vpc = networking.add_vpc(stack, "vpc", vpc_config)
+    config = containers.ClusterConfig(vpc=vpc, **service_catalog.get("cluster", {}))
+    cluster = containers.add_cluster(stack, "my-test-cluster", config)
+
+    listener = None
+    load_balancer = service_catalog.get("load_balancer")
+    if load_balancer and load_balancer["shared"]:
+        listener = containers.add_shared_load_balancer(
+            stack,
+            "shared-alb",
+            cluster,
+            load_balancer.get("port", 80),
+            load_balancer.get("use_public_endpoint", True),
+        )
+    # Cache rules are created before the services, which depend on them when
+    # they are in the same stack; shard stacks already depend on this stack.
+    cached_registries = sorted({
+        container["image"].split("/")[0]
+        for spec in service_catalog["services"].values()
+        for container in [spec["container"], *spec.get("sidecars", [])]
+        if container.get("pull_through_cache", False)
+    })
+    cache_rules = containers.add_pull_through_cache_rules(stack, cached_registries) if cached_registries else []
+
+    services_scope = {}
+    if "sharding" in service_catalog:
+        only_shards = scope.node.try_get_context("shards")
+        sharded = sharding.add_sharded_services(
+            scope,
+            stack,
+            cluster,
+            service_catalog["services"],
+            listener=listener,
+            config=service_catalog["sharding"],
+            only_shards=[int(index) for index in str(only_shards).split(",")] if only_shards else None,
+            env=env,
+            # Monitoring is built in the shard of each service.
+            monitoring_resources=monitoring_resources(service_catalog),
+        )
+        services = sharded["services"]
+        services_scope = sharded["shard_of_service"]
+    else:
+        families = containers.add_services(
+            stack, cluster, list(service_catalog["services"].values()), listener=listener
+        )
+        services = {
+            name: families[spec["task"]["family"]]
+            for name, spec in service_catalog["services"].items()
+        }
+        for service in families.values():
+            for rule in cache_rules:
+                (service["service"] if isinstance(service, dict) else service.service).node.add_dependency(rule)
+
+    alarm_topic = sns.Topic(stack, 'alarm-topic', display_name='Alarm topic')
+
+    dashboard = service_catalog["dashboard"]
+    monitoring_contexts = {}
+
+    def monitoring_for(service_stack: cdk.Stack) -> monitoring.MonitoringContext:
+        # Each shard stack gets its own dashboard, so that the base stack never
+        # references resources in a shard.
+        if service_stack.node.id not in monitoring_contexts:
+            suffix = service_stack.node.id.removeprefix(stack.node.id)
+            monitoring_config = monitoring.MonitoringConfig(dashboard_name=dashboard["dashboard_name"] + suffix, default_alarm_topic=alarm_topic)
+            if "default_alarm_name_prefix" in dashboard:
+                monitoring_config["default_alarm_name_prefix"] = dashboard["default_alarm_name_prefix"] + suffix
+            for key in ("anomaly_detection", "metric_math"):
+                if key in dashboard:
+                    monitoring_config[key] = dashboard[key]
+            mon = monitoring.init_monitoring(service_stack, monitoring_config)
+            mon["handler"].add_medium_header("Test App monitoring")
+            monitoring_contexts[service_stack.node.id] = mon
+        return monitoring_contexts[service_stack.node.id]
+
+    for name, service in services.items():
+        mon = monitoring_for(services_scope.get(name, stack))
+        service_monitoring = service_catalog["monitoring"][name]
+        human_readable_name = service_monitoring.get("human_readable_name", name)
+        if "slos" in service_monitoring:
+            monitoring.add_service_slos(mon, service, service_monitoring["slos"])
+        if "anomaly_detection" in dashboard or "metric_math" in dashboard:
+            monitoring.add_service_anomaly_alarms(mon, service)
+        if "custom_metrics" in service_monitoring:
+            logging = service_catalog["services"][name]["logging"]
+            monitoring.add_custom_metrics(
+                mon,
+                name,
+                logging["emf_namespace"],
+                service_monitoring["custom_metrics"],
+                log_group=containers.shared_log_group(
+                    services_scope.get(name, stack), logging.get("retention", "ONE_DAY")
+                ),
+            )
+        if "task_resources" in service_monitoring:
+            monitoring.add_task_resource_monitoring(
+                mon,
+                name,
+                service["service"] if isinstance(service, dict) else service.service,
+                service_monitoring["task_resources"],
+            )
+        # Each registration names its alarms after the service, so that the
+        # alarms of different services do not clash.
+        props = {"human_readable_name": human_readable_name, "alarm_friendly_name": name}
+        if "min_running_tasks" in service_monitoring:
+            props["add_running_task_count_alarm"] = {
+                'alarm1': cdkmon.RunningTaskCountThreshold(
+                    max_running_tasks=service_monitoring["min_running_tasks"],
+                    comparison_operator_override=cw.ComparisonOperator.LESS_THAN_THRESHOLD,
+                    evaluation_periods=2,
+                    datapoints_to_alarm=2,
+                    period=cdk.Duration.minutes(5),
+                )
+            }
+        if isinstance(service, dict):
+            monitoring.monitor_simple_fargate_service(mon, service["service"], **props)
+        else:
+            monitoring.monitor_fargate_service(mon, service, **props)
+
+    for mon in monitoring_contexts.values():
+        monitoring.apply_monitoring(mon)
+
+    for alarm_email in dashboard.get("alarm_emails", []):
+        alarm_topic.add_subscription(snssubs.EmailSubscription(alarm_email))
+
+    return stack
@@ -0,0 +1,88 @@
+import copy
+import pytest
+import aws_cdk as cdk
+from aws_cdk import assertions
+import catalog
+import infra
+
+
+def _service(port: int, priority: int) -> dict:
+    return {
+        "port": port,
+        "desired_count": 2,
+        "task": {"cpu": 512, "memory_limit_mib": 1024},
+        "container": {
+            "image": "public.ecr.aws/aws-containers/hello-app-runner:latest",
+            "tcp_ports": [port],
+        },
+        "routing": {"priority": priority, "path_patterns": [f"/{port}/*"]},
+        "monitoring": {"min_running_tasks": 2},
+    }
+
+
+TWO_SERVICES = {
+    "dashboard": {"dashboard_name": "monitoring"},
+    "load_balancer": {"shared": True},
+    "services": {"webapp": _service(8000, 10), "api": _service(8080, 20)},
+}
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_every_service_gets_its_own_running_task_alarm(shared):
+    data = copy.deepcopy(TWO_SERVICES)
+    if not shared:
+        del data["load_balancer"]
+        for service in data["services"].values():
+            del service["routing"]
+    app = cdk.App()
+
+    stack = infra.add_container_infra(app, catalog.parse_catalog(data))
+
+    template = assertions.Template.from_stack(stack)
+    alarm_names = [
+        alarm["Properties"]["AlarmName"]
+        for alarm in template.find_resources("AWS::CloudWatch::Alarm").values()
+    ]
+    for name in ("webapp", "api"):
+        assert any(alarm_name.startswith(f"monitoring-{name}-") for alarm_name in alarm_names)
+
+
+def test_shards_stay_within_their_resource_limit():
+    data = catalog._read("services.toml")
+    webapp = data["services"].pop("webapp")
+    for index in range(4):
+        data["services"][f"webapp{index}"] = copy.deepcopy(webapp)
+    data["sharding"] = {"max_resources_per_stack": 60}
+    app = cdk.App()
+
+    infra.add_container_infra(app, catalog.parse_catalog(data))
+
+    shards = [child for child in app.node.children if child.node.id.startswith(f"{infra.STACK_NAME}-shard-")]
+    assert len(shards) > 1
+    for shard in shards:
+        resources = assertions.Template.from_stack(shard).to_json()["Resources"]
+        assert len(resources) <= 60
+
+
+def test_spot_strategies_get_the_cluster_capacity_providers():
+    data = copy.deepcopy(TWO_SERVICES)
+    data["cluster"] = {"enable_fargate_capacity_providers": True}
+    data["services"]["webapp"]["capacity_provider_strategies"] = [
+        {"capacity_provider": "FARGATE", "weight": 1, "base": 1},
+        {"capacity_provider": "FARGATE_SPOT", "weight": 3},
+    ]
+    app = cdk.App()
+
+    stack = infra.add_container_infra(app, catalog.parse_catalog(data))
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::ECS::ClusterCapacityProviderAssociations",
+        {"CapacityProviders": assertions.Match.array_with(["FARGATE", "FARGATE_SPOT"])},
+    )
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {"CapacityProviderStrategy": assertions.Match.array_with([
+            assertions.Match.object_like({"CapacityProvider": "FARGATE_SPOT", "Weight": 3}),
+        ])},
+    )
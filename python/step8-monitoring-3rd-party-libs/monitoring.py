@@ -1,23 +1,78 @@
-from typing import NotRequired, TypedDict
+import json
+from typing import Any, Dict, List, Literal, NotRequired, Tuple, TypedDict
 from constructs import Construct
 import aws_cdk as cdk
 from aws_cdk import (
+    aws_cloudwatch as cw,
+    aws_ecs as ecs,
+    aws_ecs_patterns as ecspat,
+    aws_elasticloadbalancingv2 as elbv2,
+    aws_logs as logs,
     aws_sns as sns,
 )
 import cdk_monitoring_constructs as cdkmon
 
+CONTAINER_INSIGHTS_NAMESPACE = "ECS/ContainerInsights"
+
+# CloudWatch quotas for a single dashboard.
+DASHBOARD_WIDGET_LIMIT = 500
+DASHBOARD_METRIC_LIMIT = 2500
+# Size in bytes of the dashboard body, the JSON of all widgets.
+DASHBOARD_BODY_LIMIT = 1_000_000
+# Share of a quota at which apply_monitoring starts warning.
+DASHBOARD_WARNING_RATIO = 0.8
+
+
+AnomalyMetricName = Literal[
+    "latency_p50", "latency_p90", "latency_p99", "request_count", "error_ratio", "latency_per_request"
+]
+DEFAULT_ANOMALY_METRICS: List[AnomalyMetricName] = ["latency_p90", "request_count"]
+
+
+class AnomalyDetectionConfig(TypedDict):
+    metrics: NotRequired[List[AnomalyMetricName]]
+    standard_deviations: NotRequired[float]
+    period_minutes: NotRequired[int]
+    evaluation_periods: NotRequired[int]
+    datapoints_to_alarm: NotRequired[int]
+
+
+class MetricMathConfig(TypedDict):
+    max_error_ratio_percent: NotRequired[float]
+    max_latency_per_request_ms: NotRequired[float]
+    period_minutes: NotRequired[int]
+    evaluation_periods: NotRequired[int]
+    datapoints_to_alarm: NotRequired[int]
+
 
 class MonitoringConfig(TypedDict):
     dashboard_name: str
     default_alarm_topic: NotRequired[sns.ITopic]
     default_alarm_name_prefix: NotRequired[str]
+    anomaly_detection: NotRequired[AnomalyDetectionConfig]
+    metric_math: NotRequired[MetricMathConfig]
+
+
+class MonitoredResource(TypedDict):
+    method: str
+    resource: Construct
+    props: Dict[str, Any]
+    applied: bool
 
 
 class MonitoringContext(TypedDict):
     handler: cdkmon.MonitoringFacade
     default_alarm_topic: NotRequired[sns.ITopic]
     default_alarm_name_prefix: NotRequired[str]
+    registry: NotRequired[Dict[str, MonitoredResource]]
+    anomaly_detection: NotRequired[AnomalyDetectionConfig]
+    metric_math: NotRequired[MetricMathConfig]
+
 
+class DashboardUsage(TypedDict):
+    widgets: int
+    metrics: int
+    body_bytes: int
 
 
 def init_monitoring(scope: Construct, config: MonitoringConfig) -> MonitoringContext:
@@ -27,7 +82,7 @@ def init_monitoring(scope: Construct, config: MonitoringConfig) -> MonitoringCon
     default_alarm_name_prefix = config.get("default_alarm_name_prefix")
     if default_alarm_name_prefix is None:
         default_alarm_name_prefix = config["dashboard_name"]
-    return MonitoringContext(
+    context = MonitoringContext(
         handler=cdkmon.MonitoringFacade(
             scope,
             config["dashboard_name"],
@@ -38,3 +93,554 @@ def init_monitoring(scope: Construct, config: MonitoringConfig) -> MonitoringCon
             )),
             default_alarm_topic=config.get("default_alarm_topic"),
             default_alarm_name_prefix=default_alarm_name_prefix)
+    for key in ("anomaly_detection", "metric_math"):
+        if key in config:
+            context[key] = config[key]
+    return context
+
+
+def _register(context: MonitoringContext, method: str, resource: Construct, props: Dict[str, Any]):
+    """Add a resource to the registry, merging props with earlier registrations.
+
+    Alarm props (add_..._alarm) are merged by alarm name, other props must
+    have the same value in every registration.
+    """
+    path = resource.node.path
+    registry = context.setdefault("registry", {})
+    entry = registry.setdefault(
+        path, MonitoredResource(method=method, resource=resource, props={}, applied=False)
+    )
+    if entry["method"] != method:
+        raise ValueError(f"{path} is already monitored with {entry['method']}")
+    if entry["applied"]:
+        raise ValueError(f"Monitoring of {path} is already applied")
+    for key, value in props.items():
+        current = entry["props"].get(key)
+        if key.startswith("add_") and key.endswith("_alarm"):
+            merged = dict(current or {})
+            for alarm_name, threshold in value.items():
+                if alarm_name in merged and merged[alarm_name] != threshold:
+                    raise ValueError(f"{path}: {key} {alarm_name} is registered with other thresholds")
+                merged[alarm_name] = threshold
+            entry["props"][key] = merged
+        elif current is not None and current != value:
+            raise ValueError(f"{path}: {key} is registered with different values")
+        else:
+            entry["props"][key] = value
+
+
+def monitor_fargate_service(
+    context: MonitoringContext,
+    fargate_service: ecspat.ApplicationLoadBalancedFargateService,
+    **props: Any,
+):
+    """Register a load balanced service, with the props of MonitoringFacade.monitor_fargate_service.
+
+    A service registered more than once gets a single dashboard segment with
+    the alarms of all registrations, when apply_monitoring is called.
+    """
+    _register(context, "monitor_fargate_service", fargate_service, props)
+
+
+def monitor_simple_fargate_service(
+    context: MonitoringContext, fargate_service: ecs.FargateService, **props: Any
+):
+    """Register a service without its own load balancer, see monitor_fargate_service."""
+    _register(context, "monitor_simple_fargate_service", fargate_service, props)
+
+
+def dashboard_usage(context: MonitoringContext) -> DashboardUsage:
+    """Widgets, metrics and body size of the dashboard of the facade so far.
+
+    A SEARCH expression counts as one metric: the number of time series it
+    returns depends on what is running, e.g. one per task, and is not known at
+    synth time. The body size is measured with tokens resolved to their
+    CloudFormation intrinsics, so it is an estimate of the deployed body.
+    """
+    usage = DashboardUsage(widgets=0, metrics=0, body_bytes=0)
+    stack = cdk.Stack.of(context["handler"])
+    widgets = []
+    for segment in context["handler"].created_dashboard_segments():
+        # Dynamic segments only render for a named dashboard type.
+        if not hasattr(segment, "widgets"):
+            continue
+        for widget in segment.widgets():
+            for widget_json in stack.resolve(widget.to_json()):
+                widgets.append(widget_json)
+                usage["metrics"] += len(widget_json.get("properties", {}).get("metrics", []))
+    usage["widgets"] = len(widgets)
+    usage["body_bytes"] = len(json.dumps({"widgets": widgets}, separators=(",", ":")).encode())
+    return usage
+
+
+def apply_monitoring(context: MonitoringContext) -> List[str]:
+    """Create one dashboard segment per registered resource, in registration order.
+
+    Returns warnings for dashboard quotas that are nearly used up; they are
+    also added as warnings to the synth output.
+    """
+    handler = context["handler"]
+    for entry in context.get("registry", {}).values():
+        if entry["applied"]:
+            continue
+        getattr(handler, entry["method"])(fargate_service=entry["resource"], **entry["props"])
+        entry["applied"] = True
+
+    usage = dashboard_usage(context)
+    warnings = []
+    for name, used, limit in [
+        ("widgets", usage["widgets"], DASHBOARD_WIDGET_LIMIT),
+        ("metrics", usage["metrics"], DASHBOARD_METRIC_LIMIT),
+        ("bytes of dashboard body", usage["body_bytes"], DASHBOARD_BODY_LIMIT),
+    ]:
+        if used >= limit * DASHBOARD_WARNING_RATIO:
+            warnings.append(
+                f"Dashboard {handler.node.id} has {used} {name}, the CloudWatch limit is {limit}"
+            )
+    for warning in warnings:
+        cdk.Annotations.of(handler).add_warning(warning)
+    return warnings
+
+
+def _load_balanced_parts(
+    service: ecspat.ApplicationLoadBalancedFargateService | Dict[str, Any],
+) -> Tuple[ecs.FargateService, elbv2.ApplicationTargetGroup, elbv2.IApplicationLoadBalancer | None, str]:
+    """Service, target group, own load balancer (if any) and name of a load balanced service."""
+    if isinstance(service, dict):
+        fargate_service: ecs.FargateService = service["service"]
+        return fargate_service, service["target_group"], None, fargate_service.node.id
+    return service.service, service.target_group, service.load_balancer, service.node.id
+
+
+def _error_ratio(target_group: elbv2.ApplicationTargetGroup, period: cdk.Duration) -> cw.MathExpression:
+    return cw.MathExpression(
+        expression="100 * errors / FILL(requests, 1)",
+        using_metrics={
+            "errors": target_group.metrics.http_code_target(
+                elbv2.HttpCodeTarget.TARGET_5XX_COUNT, statistic="Sum", period=period
+            ),
+            "requests": target_group.metrics.request_count(statistic="Sum", period=period),
+        },
+        label="5xx %",
+        period=period,
+    )
+
+
+def _latency_per_request(target_group: elbv2.ApplicationTargetGroup, period: cdk.Duration) -> cw.MathExpression:
+    return cw.MathExpression(
+        expression="1000 * latency / FILL(requests, 1)",
+        using_metrics={
+            "latency": target_group.metrics.target_response_time(statistic="Sum", period=period),
+            "requests": target_group.metrics.request_count(statistic="Sum", period=period),
+        },
+        label="ms per request",
+        period=period,
+    )
+
+
+class ServiceSloConfig(TypedDict):
+    latency_p50_ms: NotRequired[int]
+    latency_p90_ms: NotRequired[int]
+    latency_p99_ms: NotRequired[int]
+    max_5xx_percent: NotRequired[float]
+    max_cpu_percent: NotRequired[float]
+    max_memory_percent: NotRequired[float]
+    max_rejected_connections: NotRequired[int]
+    min_healthy_hosts: NotRequired[int]
+    period_minutes: NotRequired[int]
+    evaluation_periods: NotRequired[int]
+    datapoints_to_alarm: NotRequired[int]
+
+
+def add_service_slos(
+    context: MonitoringContext,
+    service: ecspat.ApplicationLoadBalancedFargateService | Dict[str, Any],
+    config: ServiceSloConfig,
+) -> cw.CompositeAlarm | None:
+    """Alarms for the service level objectives of a load balanced service.
+
+    service is a service with its own load balancer, or a service on a shared
+    listener as returned by containers.add_routed_service. The objective
+    alarms have no actions of their own. A composite alarm, which fires when
+    any of them is in alarm, sends a single notification to the default alarm
+    topic per incident. Rejected connections are a load balancer metric, so
+    they can only be watched for services with their own load balancer.
+    """
+    fargate_service, target_group, load_balancer, name = _load_balanced_parts(service)
+    if "max_rejected_connections" in config and load_balancer is None:
+        raise ValueError(f"{name} shares its load balancer, rejected connections cannot be watched")
+
+    period = cdk.Duration.minutes(config.get("period_minutes", 1))
+    tag = f"{name}-slo"
+
+    def threshold(value: float, comparison: cw.ComparisonOperator) -> Dict[str, cdkmon.CustomThreshold]:
+        return {
+            "Warning": cdkmon.CustomThreshold(
+                threshold=value,
+                comparison_operator=comparison,
+                evaluation_periods=config.get("evaluation_periods", 5),
+                datapoints_to_alarm=config.get("datapoints_to_alarm", 3),
+                custom_tags=[tag],
+                action_override=cdkmon.NoopAlarmActionStrategy(),
+            )
+        }
+
+    above = cw.ComparisonOperator.GREATER_THAN_THRESHOLD
+    latency_metrics = []
+    for percentile in ("p50", "p90", "p99"):
+        key = f"latency_{percentile}_ms"
+        if key in config:
+            latency_metrics.append(
+                cdkmon.CustomMetricWithAlarm(
+                    metric=target_group.metrics.target_response_time(statistic=percentile, period=period),
+                    alarm_friendly_name=f"latency-{percentile}",
+                    add_alarm=threshold(config[key] / 1000, above),
+                )
+            )
+    error_metrics = []
+    if "max_5xx_percent" in config:
+        error_metrics.append(
+            cdkmon.CustomMetricWithAlarm(
+                metric=_error_ratio(target_group, period),
+                alarm_friendly_name="5xx-rate",
+                add_alarm=threshold(config["max_5xx_percent"], above),
+            )
+        )
+    if "max_rejected_connections" in config:
+        error_metrics.append(
+            cdkmon.CustomMetricWithAlarm(
+                metric=load_balancer.metrics.rejected_connection_count(statistic="Sum", period=period),
+                alarm_friendly_name="rejected-connections",
+                add_alarm=threshold(config["max_rejected_connections"], above),
+            )
+        )
+    if "min_healthy_hosts" in config:
+        error_metrics.append(
+            cdkmon.CustomMetricWithAlarm(
+                metric=target_group.metrics.healthy_host_count(statistic="Minimum", period=period),
+                alarm_friendly_name="healthy-hosts",
+                add_alarm=threshold(config["min_healthy_hosts"], cw.ComparisonOperator.LESS_THAN_THRESHOLD),
+            )
+        )
+    saturation_metrics = []
+    for key, metric, label in [
+        ("max_cpu_percent", fargate_service.metric_cpu_utilization(period=period), "cpu"),
+        ("max_memory_percent", fargate_service.metric_memory_utilization(period=period), "memory"),
+    ]:
+        if key in config:
+            saturation_metrics.append(
+                cdkmon.CustomMetricWithAlarm(
+                    metric=metric,
+                    alarm_friendly_name=label,
+                    add_alarm=threshold(config[key], above),
+                )
+            )
+
+    metric_groups = [
+        cdkmon.CustomMetricGroup(title=title, metrics=metrics)
+        for title, metrics in [
+            ("Latency (s)", latency_metrics),
+            ("Errors and hosts", error_metrics),
+            ("Saturation (%)", saturation_metrics),
+        ]
+        if metrics
+    ]
+    if not metric_groups:
+        raise ValueError(f"No service level objectives configured for {name}")
+    handler = context["handler"]
+    handler.monitor_custom(
+        metric_groups=metric_groups,
+        alarm_friendly_name=f"{name}-slo",
+        human_readable_name=f"{name} service level objectives",
+    )
+    return handler.create_composite_alarm_using_tag(
+        tag, disambiguator="Warning", alarm_name_suffix=f"{name}-slo"
+    )
+
+
+def _anomaly_metric(
+    name: AnomalyMetricName, target_group: elbv2.ApplicationTargetGroup, period: cdk.Duration
+) -> cw.Metric | cw.MathExpression:
+    if name == "request_count":
+        return target_group.metrics.request_count(statistic="Sum", period=period)
+    if name == "error_ratio":
+        return _error_ratio(target_group, period)
+    if name == "latency_per_request":
+        return _latency_per_request(target_group, period)
+    return target_group.metrics.target_response_time(statistic=name.removeprefix("latency_"), period=period)
+
+
+def add_service_anomaly_alarms(
+    context: MonitoringContext,
+    service: ecspat.ApplicationLoadBalancedFargateService | Dict[str, Any],
+):
+    """Anomaly detection and metric math alarms for a load balanced service.
+
+    The settings come from the anomaly_detection and metric_math sections of
+    the MonitoringConfig the context was created with. Anomaly alarms fire
+    when a metric leaves its expected band: above it for latency and errors,
+    on either side for the request count, so that a drop in traffic is
+    noticed too. All alarms get the default alarm name prefix and action.
+    """
+    _, target_group, _, name = _load_balanced_parts(service)
+    metric_groups = []
+
+    anomaly_detection = context.get("anomaly_detection")
+    if anomaly_detection is not None:
+        period = cdk.Duration.minutes(anomaly_detection.get("period_minutes", 5))
+        standard_deviations = anomaly_detection.get("standard_deviations", 2)
+        metrics = []
+        for metric_name in anomaly_detection.get("metrics", DEFAULT_ANOMALY_METRICS):
+            friendly_name = metric_name.replace("_", "-")
+            metrics.append(
+                cdkmon.CustomMetricWithAnomalyDetection(
+                    metric=_anomaly_metric(metric_name, target_group, period),
+                    alarm_friendly_name=friendly_name,
+                    anomaly_detection_standard_deviation_to_render=standard_deviations,
+                    add_alarm_on_anomaly={
+                        "Warning": cdkmon.AnomalyDetectionThreshold(
+                            standard_deviation_for_alarm=standard_deviations,
+                            alarm_when_above_the_band=True,
+                            alarm_when_below_the_band=metric_name == "request_count",
+                            evaluation_periods=anomaly_detection.get("evaluation_periods", 3),
+                            datapoints_to_alarm=anomaly_detection.get("datapoints_to_alarm", 3),
+                        )
+                    },
+                )
+            )
+        if metrics:
+            metric_groups.append(cdkmon.CustomMetricGroup(title="Anomalies", metrics=metrics))
+
+    metric_math = context.get("metric_math")
+    if metric_math is not None:
+        period = cdk.Duration.minutes(metric_math.get("period_minutes", 1))
+        metrics = []
+        for key, metric in [
+            ("max_error_ratio_percent", _error_ratio(target_group, period)),
+            ("max_latency_per_request_ms", _latency_per_request(target_group, period)),
+        ]:
+            if key in metric_math:
+                metrics.append(
+                    cdkmon.CustomMetricWithAlarm(
+                        metric=metric,
+                        alarm_friendly_name=key.removeprefix("max_").replace("_", "-"),
+                        add_alarm={
+                            "Warning": cdkmon.CustomThreshold(
+                                threshold=metric_math[key],
+                                comparison_operator=cw.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                                evaluation_periods=metric_math.get("evaluation_periods", 5),
+                                datapoints_to_alarm=metric_math.get("datapoints_to_alarm", 3),
+                            )
+                        },
+                    )
+                )
+        if metrics:
+            metric_groups.append(cdkmon.CustomMetricGroup(title="Ratios", metrics=metrics))
+
+    if not metric_groups:
+        raise ValueError(f"No anomaly detection or metric math configured for {name}")
+    context["handler"].monitor_custom(
+        metric_groups=metric_groups,
+        alarm_friendly_name=f"{name}-anomaly",
+        human_readable_name=f"{name} anomalies",
+    )
+
+
+class CustomMetricConfig(TypedDict):
+    name: str
+    statistic: NotRequired[str]
+    dimensions: NotRequired[Dict[str, str]]
+    json_field: NotRequired[str]
+    period_seconds: NotRequired[int]
+    max_value: NotRequired[float]
+    alarm_period_seconds: NotRequired[int]
+    evaluation_periods: NotRequired[int]
+    datapoints_to_alarm: NotRequired[int]
+
+
+def _check_period(name: str, key: str, seconds: int, sub_minute: List[int]):
+    if seconds not in sub_minute and seconds % 60 != 0:
+        raise ValueError(f"{name}: {key} must be one of {sub_minute} or a multiple of 60")
+
+
+def add_custom_metrics(
+    context: MonitoringContext,
+    name: str,
+    namespace: str,
+    metrics: List[CustomMetricConfig],
+    log_group: logs.ILogGroup | None = None,
+):
+    """Dashboard widgets and alarms for metrics an app publishes itself.
+
+    Apps publish high resolution metrics in the embedded metric format (EMF),
+    which CloudWatch extracts from the task logs, see
+    containers.LoggingConfig.emf_namespace. The dimensions must be exactly
+    the ones the app publishes: the EMF client libraries add LogGroup,
+    ServiceName and ServiceType by default, unless the app replaces them,
+    e.g. with set_dimensions. A metric without dimensions only matches when
+    the app publishes it without any. Metrics with a json_field are instead
+    taken from plain JSON log events of log_group by a metric filter; those
+    have the standard resolution of 1 minute. The widgets show the Maximum
+    every second by default, so that short spikes stay visible; alarms
+    evaluate 10 second periods. Both only get sub-minute data when the app
+    publishes the metric with StorageResolution 1.
+    """
+    metric_groups = []
+    for config in metrics:
+        metric_name = config["name"]
+        filtered = "json_field" in config
+        period_seconds = config.get("period_seconds", 60 if filtered else 1)
+        alarm_period_seconds = config.get("alarm_period_seconds", 60 if filtered else 10)
+        _check_period(metric_name, "period_seconds", period_seconds, [] if filtered else [1, 5, 10, 30])
+        _check_period(metric_name, "alarm_period_seconds", alarm_period_seconds, [] if filtered else [10, 30])
+        if filtered:
+            if log_group is None:
+                raise ValueError(f"{metric_name}: metrics from a json_field need a log group")
+            if "dimensions" in config:
+                raise ValueError(f"{metric_name}: metrics from a json_field have no dimensions")
+            log_group.add_metric_filter(
+                f"{name}-{metric_name}",
+                filter_pattern=logs.FilterPattern.exists(f"$.{config['json_field']}"),
+                metric_namespace=namespace,
+                metric_name=metric_name,
+                metric_value=f"$.{config['json_field']}",
+            )
+
+        metric = cw.Metric(
+            namespace=namespace,
+            metric_name=metric_name,
+            dimensions_map=config.get("dimensions"),
+            statistic=config.get("statistic", "Maximum"),
+            period=cdk.Duration.seconds(period_seconds),
+        )
+        if "max_value" in config:
+            custom_metric = cdkmon.CustomMetricWithAlarm(
+                metric=metric,
+                alarm_friendly_name=metric_name,
+                add_alarm={
+                    "Warning": cdkmon.CustomThreshold(
+                        threshold=config["max_value"],
+                        comparison_operator=cw.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                        period=cdk.Duration.seconds(alarm_period_seconds),
+                        evaluation_periods=config.get("evaluation_periods", 3),
+                        datapoints_to_alarm=config.get("datapoints_to_alarm", 3),
+                    )
+                },
+            )
+        else:
+            custom_metric = metric
+        metric_groups.append(cdkmon.CustomMetricGroup(title=metric_name, metrics=[custom_metric]))
+
+    if not metric_groups:
+        raise ValueError(f"No custom metrics configured for {name}")
+    context["handler"].monitor_custom(
+        metric_groups=metric_groups,
+        alarm_friendly_name=f"{name}-custom",
+        human_readable_name=f"{name} custom metrics",
+    )
+
+
+# Dimensions of the per task and per container metrics of Container Insights
+# with enhanced observability.
+_TASK_DIMENSIONS = ["ClusterName", "TaskDefinitionFamily", "TaskId"]
+_CONTAINER_DIMENSIONS = ["ClusterName", "ContainerName", "TaskDefinitionFamily", "TaskId"]
+_TASK_RESOURCE_WIDGETS: List[Tuple[str, List[str], List[str]]] = [
+    ("Task CPU (%)", _TASK_DIMENSIONS, ["TaskCpuUtilization"]),
+    ("Task memory (%)", _TASK_DIMENSIONS, ["TaskMemoryUtilization"]),
+    ("Task network (bytes)", _TASK_DIMENSIONS, ["NetworkRxBytes", "NetworkTxBytes"]),
+    ("Task storage I/O (bytes)", _TASK_DIMENSIONS, ["StorageReadBytes", "StorageWriteBytes"]),
+    ("Container CPU (%)", _CONTAINER_DIMENSIONS, ["ContainerCpuUtilization"]),
+    ("Container memory (%)", _CONTAINER_DIMENSIONS, ["ContainerMemoryUtilization"]),
+    ("Container network (bytes)", _CONTAINER_DIMENSIONS, ["ContainerNetworkRxBytes", "ContainerNetworkTxBytes"]),
+    ("Container storage I/O (bytes)", _CONTAINER_DIMENSIONS, ["ContainerStorageReadBytes", "ContainerStorageWriteBytes"]),
+]
+
+
+class TaskResourceMonitoringConfig(TypedDict):
+    max_task_cpu_percent: NotRequired[float]
+    max_task_memory_percent: NotRequired[float]
+    period_minutes: NotRequired[int]
+    evaluation_periods: NotRequired[int]
+    datapoints_to_alarm: NotRequired[int]
+
+
+def add_task_resource_monitoring(
+    context: MonitoringContext,
+    name: str,
+    fargate_service: ecs.FargateService,
+    config: TaskResourceMonitoringConfig | None = None,
+):
+    """Per task and per container CPU, memory, network and storage I/O widgets.
+
+    The metrics come from Container Insights with enhanced observability,
+    see containers.ClusterConfig. Each widget has a line per running task or
+    container, so that noisy tasks and growing memory stand out. With
+    max_task_cpu_percent or max_task_memory_percent, an alarm fires when any
+    single task is above the limit, i.e. is being throttled or is about to
+    run out of memory, even when the service average looks fine.
+    """
+    config = config or TaskResourceMonitoringConfig()
+    seconds = config.get("period_minutes", 1) * 60
+    period = cdk.Duration.seconds(seconds)
+    cluster_name = fargate_service.cluster.cluster_name
+    family = fargate_service.task_definition.family
+
+    metric_groups = []
+    for title, dimensions, metric_names in _TASK_RESOURCE_WIDGETS:
+        schema = ",".join([CONTAINER_INSIGHTS_NAMESPACE, *dimensions])
+        metric_groups.append(
+            cdkmon.CustomMetricGroup(
+                title=title,
+                metrics=[
+                    cw.MathExpression(
+                        expression=(
+                            f"SEARCH('{{{schema}}} MetricName=\"{metric_name}\" "
+                            f"ClusterName=\"{cluster_name}\" TaskDefinitionFamily=\"{family}\"', "
+                            f"'Maximum', {seconds})"
+                        ),
+                        using_metrics={},
+                        period=period,
+                    )
+                    for metric_name in metric_names
+                ],
+            )
+        )
+
+    # Metrics Insights queries aggregate over the tasks, so they can be alarmed on.
+    alarm_metrics = []
+    for key, metric_name, label in [
+        ("max_task_cpu_percent", "TaskCpuUtilization", "task-cpu"),
+        ("max_task_memory_percent", "TaskMemoryUtilization", "task-memory"),
+    ]:
+        if key in config:
+            alarm_metrics.append(
+                cdkmon.CustomMetricWithAlarm(
+                    metric=cw.MathExpression(
+                        expression=(
+                            f"SELECT MAX({metric_name}) "
+                            f"FROM SCHEMA(\"{CONTAINER_INSIGHTS_NAMESPACE}\", {', '.join(_TASK_DIMENSIONS)}) "
+                            f"WHERE ClusterName = '{cluster_name}' AND TaskDefinitionFamily = '{family}'"
+                        ),
+                        using_metrics={},
+                        label=f"busiest task {metric_name}",
+                        period=period,
+                    ),
+                    alarm_friendly_name=label,
+                    add_alarm={
+                        "Warning": cdkmon.CustomThreshold(
+                            threshold=config[key],
+                            comparison_operator=cw.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                            evaluation_periods=config.get("evaluation_periods", 5),
+                            datapoints_to_alarm=config.get("datapoints_to_alarm", 3),
+                        )
+                    },
+                )
+            )
+    if alarm_metrics:
+        metric_groups.append(cdkmon.CustomMetricGroup(title="Busiest task (%)", metrics=alarm_metrics))
+
+    context["handler"].monitor_custom(
+        metric_groups=metric_groups,
+        alarm_friendly_name=f"{name}-tasks",
+        human_readable_name=f"{name} tasks",
+    )
@@ -1,10 +1,14 @@
+import json
 import pytest
 import aws_cdk as cdk
 from aws_cdk import (
     assertions,
+    aws_cloudwatch as cw,
     aws_ec2 as ec2,
     aws_sns as sns,
 )
+import cdk_monitoring_constructs as cdkmon
+import containers
 import monitoring as mon
 
 
@@ -33,3 +37,278 @@ def test_init_monitoring_of_stack_with_sns_alarm_topic():
     monitoring = mon.init_monitoring(stack, config=monitoring_config)
     assert(monitoring.get("default_alarm_topic") == monitoring_config.get("default_alarm_topic"))
     assert(monitoring.get("default_alarm_name_prefix") == monitoring_config.get("dashboard_name"))
+
+
+def _monitored_service(stack):
+    vpc = ec2.Vpc(stack, "vpc")
+    cluster = containers.add_cluster(stack, "cluster", containers.ClusterConfig(vpc=vpc))
+    taskdef = containers.add_task_definition_with_container(
+        stack,
+        "taskdef",
+        containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test"),
+        containers.ContainerConfig(
+            image="public.ecr.aws/aws-containers/hello-app-runner:latest", tcp_ports=[8000]
+        ),
+    )
+    return containers.add_service(stack, "service", cluster, taskdef, 80, 1)
+
+
+def _running_task_alarm(tasks):
+    return cdkmon.RunningTaskCountThreshold(
+        max_running_tasks=tasks,
+        comparison_operator_override=cw.ComparisonOperator.LESS_THAN_THRESHOLD,
+    )
+
+
+def test_repeated_registrations_share_one_segment():
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+    service = _monitored_service(stack)
+
+    mon.monitor_fargate_service(context, service, human_readable_name="Test service")
+    mon.monitor_fargate_service(
+        context, service, human_readable_name="Test service",
+        add_running_task_count_alarm={"alarm1": _running_task_alarm(2)},
+    )
+    warnings = mon.apply_monitoring(context)
+
+    assert warnings == []
+    assert len(context["handler"].created_dashboard_segments()) == 1
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::CloudWatch::Alarm", 1)
+
+
+def test_conflicting_alarm_registrations_are_rejected():
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+    service = _monitored_service(stack)
+
+    mon.monitor_fargate_service(
+        context, service, add_running_task_count_alarm={"alarm1": _running_task_alarm(2)}
+    )
+    with pytest.raises(ValueError):
+        mon.monitor_fargate_service(
+            context, service, add_running_task_count_alarm={"alarm1": _running_task_alarm(3)}
+        )
+
+
+def test_apply_monitoring_warns_near_dashboard_limits(monkeypatch):
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+    mon.monitor_fargate_service(context, _monitored_service(stack))
+    monkeypatch.setattr(mon, "DASHBOARD_WIDGET_LIMIT", 5)
+
+    warnings = mon.apply_monitoring(context)
+
+    assert len(warnings) == 1
+    assert "widgets" in warnings[0]
+
+
+def test_apply_monitoring_warns_near_the_dashboard_body_limit(monkeypatch):
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+    mon.monitor_fargate_service(context, _monitored_service(stack))
+    assert mon.apply_monitoring(context) == []
+    monkeypatch.setattr(mon, "DASHBOARD_BODY_LIMIT", mon.dashboard_usage(context)["body_bytes"])
+
+    warnings = mon.apply_monitoring(context)
+
+    assert len(warnings) == 1
+    assert "dashboard body" in warnings[0]
+
+
+def test_service_slos_page_once_through_a_composite_alarm():
+    stack = cdk.Stack()
+    alarm_topic = sns.Topic(stack, "alarm-topic")
+    context = mon.init_monitoring(
+        stack, mon.MonitoringConfig(dashboard_name="test-monitoring", default_alarm_topic=alarm_topic)
+    )
+    service = _monitored_service(stack)
+
+    composite = mon.add_service_slos(
+        context,
+        service,
+        mon.ServiceSloConfig(
+            latency_p50_ms=100,
+            latency_p90_ms=300,
+            latency_p99_ms=1000,
+            max_5xx_percent=1,
+            max_cpu_percent=80,
+            max_memory_percent=80,
+            max_rejected_connections=0,
+            min_healthy_hosts=1,
+        ),
+    )
+
+    assert composite is not None
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::CloudWatch::Alarm", 8)
+    template.resource_count_is("AWS::CloudWatch::CompositeAlarm", 1)
+    for alarm in template.find_resources("AWS::CloudWatch::Alarm").values():
+        assert "AlarmActions" not in alarm["Properties"]
+    template.has_resource_properties(
+        "AWS::CloudWatch::CompositeAlarm",
+        {"AlarmActions": [{"Ref": assertions.Match.string_like_regexp("alarmtopic")}]},
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {"ExtendedStatistic": "p99", "Threshold": 1, "MetricName": "TargetResponseTime"},
+    )
+
+
+def test_service_slos_need_at_least_one_objective():
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+
+    with pytest.raises(ValueError):
+        mon.add_service_slos(context, _monitored_service(stack), mon.ServiceSloConfig(period_minutes=5))
+
+
+def test_anomaly_alarms_use_the_default_prefix_and_topic():
+    stack = cdk.Stack()
+    alarm_topic = sns.Topic(stack, "alarm-topic")
+    context = mon.init_monitoring(
+        stack,
+        mon.MonitoringConfig(
+            dashboard_name="test-monitoring",
+            default_alarm_topic=alarm_topic,
+            default_alarm_name_prefix="team",
+            anomaly_detection=mon.AnomalyDetectionConfig(standard_deviations=3),
+            metric_math=mon.MetricMathConfig(max_error_ratio_percent=1, max_latency_per_request_ms=250),
+        ),
+    )
+
+    mon.add_service_anomaly_alarms(context, _monitored_service(stack))
+
+    template = assertions.Template.from_stack(stack)
+    alarms = template.find_resources("AWS::CloudWatch::Alarm")
+    assert len(alarms) == 4
+    for alarm in alarms.values():
+        assert alarm["Properties"]["AlarmName"].startswith("team-")
+        assert alarm["Properties"]["AlarmActions"][0]["Ref"].startswith("alarmtopic")
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "ComparisonOperator": "LessThanLowerOrGreaterThanUpperThreshold",
+            "Metrics": assertions.Match.array_with([
+                assertions.Match.object_like(
+                    {"Expression": assertions.Match.string_like_regexp(r"ANOMALY_DETECTION_BAND\(.*,3\)")}
+                ),
+            ]),
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "Threshold": 250,
+            "Metrics": assertions.Match.array_with([
+                assertions.Match.object_like({"Expression": "1000 * latency / FILL(requests, 1)"}),
+            ]),
+        },
+    )
+
+
+def test_anomaly_alarms_need_a_configuration():
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+
+    with pytest.raises(ValueError):
+        mon.add_service_anomaly_alarms(context, _monitored_service(stack))
+
+
+def test_custom_metrics_from_emf_and_metric_filters():
+    stack = cdk.Stack()
+    alarm_topic = sns.Topic(stack, "alarm-topic")
+    context = mon.init_monitoring(
+        stack, mon.MonitoringConfig(dashboard_name="test-monitoring", default_alarm_topic=alarm_topic)
+    )
+    log_group = containers.shared_log_group(stack)
+
+    mon.add_custom_metrics(
+        context,
+        "webapp",
+        "MyApp",
+        [
+            mon.CustomMetricConfig(name="RequestLatency", dimensions={"ServiceName": "webapp"}, max_value=500),
+            mon.CustomMetricConfig(name="QueueDepth", json_field="queue_depth", max_value=100),
+        ],
+        log_group=log_group,
+    )
+
+    template = assertions.Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::Logs::MetricFilter",
+        {
+            "FilterPattern": "{ $.queue_depth = \"*\" }",
+            "MetricTransformations": [
+                {"MetricNamespace": "MyApp", "MetricName": "QueueDepth", "MetricValue": "$.queue_depth"}
+            ],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "MetricName": "RequestLatency",
+            "Period": 10,
+            "Statistic": "Maximum",
+            "Threshold": 500,
+            "AlarmActions": [{"Ref": assertions.Match.string_like_regexp("alarmtopic")}],
+        },
+    )
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {"MetricName": "QueueDepth", "Period": 60})
+    dashboard = json.dumps(template.find_resources("AWS::CloudWatch::Dashboard"))
+    assert '\\"period\\":1' in dashboard
+
+
+@pytest.mark.parametrize(
+    "metric",
+    [
+        mon.CustomMetricConfig(name="RequestLatency", period_seconds=2),
+        mon.CustomMetricConfig(name="RequestLatency", alarm_period_seconds=5),
+        mon.CustomMetricConfig(name="QueueDepth", json_field="queue_depth", period_seconds=10),
+        mon.CustomMetricConfig(name="QueueDepth", json_field="queue_depth", dimensions={"a": "b"}),
+    ],
+)
+def test_invalid_custom_metrics_are_rejected(metric):
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+
+    with pytest.raises(ValueError):
+        mon.add_custom_metrics(context, "webapp", "MyApp", [metric], containers.shared_log_group(stack))
+
+
+def test_task_resource_monitoring_alarms_on_the_busiest_task():
+    stack = cdk.Stack()
+    context = mon.init_monitoring(stack, mon.MonitoringConfig(dashboard_name="test-monitoring"))
+    service = _monitored_service(stack)
+
+    mon.add_task_resource_monitoring(
+        context, "test", service.service, mon.TaskResourceMonitoringConfig(max_task_memory_percent=90)
+    )
+
+    assert mon.dashboard_usage(context)["widgets"] == 10
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::CloudWatch::Alarm", 1)
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {
+            "Threshold": 90,
+            "Metrics": [
+                assertions.Match.object_like(
+                    {
+                        "Expression": {
+                            "Fn::Join": [
+                                "",
+                                assertions.Match.array_with([
+                                    assertions.Match.string_like_regexp(
+                                        r"SELECT MAX\(TaskMemoryUtilization\) FROM SCHEMA"
+                                    ),
+                                    "' AND TaskDefinitionFamily = 'test'",
+                                ]),
+                            ]
+                        }
+                    }
+                )
+            ],
+        },
+    )
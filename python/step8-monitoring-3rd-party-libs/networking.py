@@ -0,0 +1,70 @@
+"""VPC for the container cluster, with endpoints that keep traffic off NAT.
+
+Fargate tasks in private subnets pull images from ECR (with the image layers
+in S3), ship logs to CloudWatch Logs and fetch credentials from STS. Without
+VPC endpoints all of that goes through the NAT gateways, which adds latency,
+costs money per GB and is shared by the whole fleet.
+"""
+from typing import Dict, List, Literal, NotRequired, TypedDict
+import constructs as cons
+from aws_cdk import (
+    aws_ec2 as ec2,
+)
+
+VpcEndpointName = Literal["s3", "ecr", "ecr_docker", "logs", "sts"]
+
+DEFAULT_ENDPOINTS: List[VpcEndpointName] = ["s3", "ecr", "ecr_docker", "logs", "sts"]
+
+_GATEWAY_ENDPOINTS: Dict[str, ec2.GatewayVpcEndpointAwsService] = {
+    "s3": ec2.GatewayVpcEndpointAwsService.S3,
+}
+_INTERFACE_ENDPOINTS: Dict[str, ec2.InterfaceVpcEndpointAwsService] = {
+    "ecr": ec2.InterfaceVpcEndpointAwsService.ECR,
+    "ecr_docker": ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER,
+    "logs": ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS,
+    "sts": ec2.InterfaceVpcEndpointAwsService.STS,
+}
+
+
+class NetworkConfig(TypedDict):
+    vpc_name: NotRequired[str]
+    max_azs: NotRequired[int]
+    nat_gateway_per_az: NotRequired[bool]
+    endpoints: NotRequired[List[VpcEndpointName]]
+
+
+def add_vpc_endpoints(
+    vpc: ec2.IVpc, endpoints: List[VpcEndpointName] = DEFAULT_ENDPOINTS
+) -> Dict[str, ec2.GatewayVpcEndpoint | ec2.InterfaceVpcEndpoint]:
+    """Add gateway and interface endpoints to vpc, keyed by endpoint name.
+
+    Interface endpoints are placed in the private subnets with private DNS,
+    and accept HTTPS from the whole VPC.
+    """
+    added: Dict[str, ec2.GatewayVpcEndpoint | ec2.InterfaceVpcEndpoint] = {}
+    for name in endpoints:
+        if name in _GATEWAY_ENDPOINTS:
+            added[name] = vpc.add_gateway_endpoint(f"{name}-endpoint", service=_GATEWAY_ENDPOINTS[name])
+        elif name in _INTERFACE_ENDPOINTS:
+            added[name] = vpc.add_interface_endpoint(
+                f"{name}-endpoint",
+                service=_INTERFACE_ENDPOINTS[name],
+                private_dns_enabled=True,
+            )
+        else:
+            raise ValueError(f"Unknown VPC endpoint {name}, must be one of {DEFAULT_ENDPOINTS}")
+    return added
+
+
+def add_vpc(scope: cons.Construct, id: str, config: NetworkConfig) -> ec2.Vpc:
+    """VPC with one NAT gateway, or one per AZ, and the configured endpoints."""
+    max_azs = config.get("max_azs", 2)
+    vpc = ec2.Vpc(
+        scope,
+        id,
+        vpc_name=config.get("vpc_name"),
+        max_azs=max_azs,
+        nat_gateways=max_azs if config.get("nat_gateway_per_az", False) else 1,
+    )
+    add_vpc_endpoints(vpc, config.get("endpoints", DEFAULT_ENDPOINTS))
+    return vpc
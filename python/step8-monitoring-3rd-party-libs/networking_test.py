@@ -0,0 +1,46 @@
+import pytest
+import aws_cdk as cdk
+from aws_cdk import (
+    assertions,
+    aws_ec2 as ec2,
+)
+import networking
+
+
+def test_vpc_has_endpoints_for_image_pulls_and_logs():
+    stack = cdk.Stack()
+
+    networking.add_vpc(stack, "vpc", networking.NetworkConfig(vpc_name="my-vpc"))
+
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::EC2::NatGateway", 1)
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 5)
+    template.has_resource_properties(
+        "AWS::EC2::VPCEndpoint", {"VpcEndpointType": "Gateway"}
+    )
+    template.resource_properties_count_is(
+        "AWS::EC2::VPCEndpoint",
+        {"VpcEndpointType": "Interface", "PrivateDnsEnabled": True},
+        4,
+    )
+
+
+def test_vpc_with_nat_gateway_per_az():
+    stack = cdk.Stack()
+
+    networking.add_vpc(
+        stack, "vpc", networking.NetworkConfig(max_azs=3, nat_gateway_per_az=True, endpoints=[])
+    )
+
+    template = assertions.Template.from_stack(stack)
+    # An environment-agnostic stack only knows of two AZs.
+    template.resource_count_is("AWS::EC2::NatGateway", 2)
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 0)
+
+
+def test_unknown_endpoint_is_rejected():
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+
+    with pytest.raises(ValueError):
+        networking.add_vpc_endpoints(vpc, ["dynamodb"])  # type: ignore
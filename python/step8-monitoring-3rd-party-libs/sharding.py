@@ -0,0 +1,150 @@
+"""Spread services built through containers over several stacks.
+
+A base stack keeps the shared resources, such as the VPC, the cluster, a
+shared load balancer and the alarm topic. Services are bin-packed into shard
+stacks by their estimated resource count, so that no stack gets near the
+CloudFormation limit of 500 resources. The shards only reference the base
+stack, never each other, so they can be synthesized and deployed in parallel,
+e.g. with cdk deploy --all --concurrency 4.
+"""
+from typing import Dict, List, NotRequired, TypedDict
+import aws_cdk as cdk
+from aws_cdk import (
+    aws_ecs as ecs,
+    aws_ecs_patterns as ecspat,
+    aws_elasticloadbalancingv2 as elbv2,
+)
+import containers
+
+CLOUDFORMATION_RESOURCE_LIMIT = 500
+DEFAULT_MAX_RESOURCES_PER_STACK = 400
+
+# Resources per service, measured from synthesized templates.
+_RESOURCES_PER_SERVICE = 11  # task definition, roles, service, load balancer, listener, ...
+_RESOURCES_PER_ROUTED_SERVICE = 7  # task definition, roles, service, target group, rule
+_RESOURCES_FOR_FIRELENS = 1  # task role policy for the log destination
+_RESOURCES_FOR_BLUE_GREEN = 5  # green target group, test listener, CodeDeploy application, group and role
+_RESOURCES_PER_SHARD = 2  # shared log group and security group from add_services
+_RESOURCES_PER_ROUTED_SHARD = 4  # also ingress rules from the shared load balancer
+_RESOURCES_PER_DASHBOARD = 1
+
+
+class ShardingConfig(TypedDict):
+    max_resources_per_stack: NotRequired[int]
+    alarms_per_service: NotRequired[int]
+
+
+class ShardedServices(TypedDict):
+    shards: List[cdk.Stack]
+    services: Dict[str, ecspat.ApplicationLoadBalancedFargateService | containers.RoutedService]
+    shard_of_service: Dict[str, cdk.Stack]
+
+
+def estimate_resources(
+    spec: containers.ServiceSpec, shared_listener: bool, alarms_per_service: int = 0
+) -> int:
+    """Estimate the number of CloudFormation resources a service spec creates.
+
+    alarms_per_service counts the monitoring resources, such as alarms and
+    metric filters, that are built in the same stack as the service.
+    """
+    count = _RESOURCES_PER_ROUTED_SERVICE if shared_listener else _RESOURCES_PER_SERVICE
+    if spec.get("logging", {}).get("driver") == "firelens":
+        count += _RESOURCES_FOR_FIRELENS
+    if containers.deployment_settings(spec.get("deployment")).get("strategy") == "blue_green":
+        count += _RESOURCES_FOR_BLUE_GREEN
+    scaling = containers.spec_scaling_config(spec)
+    if scaling is not None:
+        count += 1
+        for key in ("scale_cpu_target", "scale_memory_target", "scale_request_count_target"):
+            count += 1 if key in scaling else 0
+        # Step scaling creates a policy and an alarm for each direction.
+        for key in ("scale_p99_response_time", "scale_request_count_steps", "scale_queue_depth_steps"):
+            count += 4 if key in scaling else 0
+    return count + alarms_per_service
+
+
+def assign_shards(
+    specs: Dict[str, containers.ServiceSpec],
+    shared_listener: bool,
+    config: ShardingConfig | None = None,
+    monitoring_resources: Dict[str, int] | None = None,
+) -> List[List[str]]:
+    """Bin-pack service names into shards with first-fit decreasing.
+
+    Larger services are placed first; services of equal size are placed in
+    name order, so the assignment only depends on the specs.
+    monitoring_resources has the number of monitoring resources per service
+    for services that are monitored in their shard, which then also gets a
+    dashboard. Without it, config's alarms_per_service is used for all.
+    """
+    config = config or ShardingConfig()
+    capacity = config.get("max_resources_per_stack", DEFAULT_MAX_RESOURCES_PER_STACK)
+    if capacity > CLOUDFORMATION_RESOURCE_LIMIT:
+        raise ValueError(
+            f"max_resources_per_stack cannot exceed {CLOUDFORMATION_RESOURCE_LIMIT}"
+        )
+    sizes = {
+        name: estimate_resources(
+            spec,
+            shared_listener,
+            config.get("alarms_per_service", 0)
+            if monitoring_resources is None
+            else monitoring_resources.get(name, 0),
+        )
+        for name, spec in specs.items()
+    }
+    per_shard = _RESOURCES_PER_ROUTED_SHARD if shared_listener else _RESOURCES_PER_SHARD
+    if monitoring_resources is not None:
+        per_shard += _RESOURCES_PER_DASHBOARD
+    shards: List[List[str]] = []
+    free: List[int] = []
+    for name in sorted(sizes, key=lambda name: (-sizes[name], name)):
+        size = sizes[name]
+        if size + per_shard > capacity:
+            raise ValueError(f"Service {name} needs {size} resources, more than a stack allows")
+        for position, space in enumerate(free):
+            if size <= space:
+                shards[position].append(name)
+                free[position] -= size
+                break
+        else:
+            shards.append([name])
+            free.append(capacity - per_shard - size)
+    return shards
+
+
+def add_sharded_services(
+    app: cdk.App | cdk.Stage,
+    base_stack: cdk.Stack,
+    cluster: ecs.Cluster,
+    specs: Dict[str, containers.ServiceSpec],
+    listener: elbv2.ApplicationListener | None = None,
+    config: ShardingConfig | None = None,
+    only_shards: List[int] | None = None,
+    env: cdk.Environment | None = None,
+    monitoring_resources: Dict[str, int] | None = None,
+) -> ShardedServices:
+    """Build services in shard stacks next to base_stack, which holds the cluster.
+
+    Shard stacks are named after the base stack, e.g. my-stack-shard-0, and
+    must use the same env as the base stack. If
+    only_shards is given, only those shards are built, so that separate
+    processes can synthesize different shards at the same time.
+    See assign_shards for monitoring_resources.
+    """
+    assignment = assign_shards(specs, listener is not None, config, monitoring_resources)
+    result = ShardedServices(shards=[], services={}, shard_of_service={})
+    for index, names in enumerate(assignment):
+        if only_shards is not None and index not in only_shards:
+            continue
+        shard = cdk.Stack(app, f"{base_stack.node.id}-shard-{index}", env=env)
+        shard.add_stack_dependency(base_stack)
+        services = containers.add_services(
+            shard, cluster, [specs[name] for name in names], listener=listener
+        )
+        for name in names:
+            result["services"][name] = services[specs[name]["task"]["family"]]
+            result["shard_of_service"][name] = shard
+        result["shards"].append(shard)
+    return result
@@ -0,0 +1,112 @@
+import pytest
+import aws_cdk as cdk
+from aws_cdk import (
+    assertions,
+    aws_ec2 as ec2,
+)
+import containers
+import sharding
+
+
+def _specs(count: int, scaling: bool = False):
+    specs = {}
+    for index in range(count):
+        spec = containers.ServiceSpec(
+            task=containers.TaskConfig(cpu=512, memory_limit_mib=1024, family=f"svc{index}"),
+            container=containers.ContainerConfig(
+                image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+                tcp_ports=[8000],
+            ),
+            port=8000,
+            desired_count=1,
+            routing=containers.RoutingConfig(priority=index + 1, path_patterns=[f"/svc{index}/*"]),
+        )
+        if scaling:
+            spec["scaling"] = containers.ServiceScalingConfig(
+                min_count=1,
+                max_count=2,
+                scale_cpu_target=containers.ScalingThreshold(percent=50),
+            )
+        specs[f"svc{index}"] = spec
+    return specs
+
+
+def test_estimate_resources_counts_load_balancer_and_scaling():
+    spec = _specs(1, scaling=True)["svc0"]
+
+    assert sharding.estimate_resources(spec, shared_listener=False) == 13
+    assert sharding.estimate_resources(spec, shared_listener=True) == 9
+    assert sharding.estimate_resources(spec, shared_listener=True, alarms_per_service=2) == 11
+
+    spec["logging"] = containers.LoggingConfig(driver="firelens")
+    spec["deployment"] = containers.DeploymentConfig(strategy="blue_green")
+    assert sharding.estimate_resources(spec, shared_listener=False) == 19
+
+
+def test_assign_shards_counts_monitoring_per_service():
+    specs = _specs(4)
+    config = sharding.ShardingConfig(max_resources_per_stack=30)
+
+    shards = sharding.assign_shards(
+        specs, shared_listener=True, config=config, monitoring_resources={"svc0": 10}
+    )
+
+    # 25 resources are free next to the dashboard, svc0 with its alarms takes 17.
+    assert shards == [["svc0", "svc1"], ["svc2", "svc3"]]
+
+
+def test_assign_shards_respects_capacity_and_is_deterministic():
+    specs = _specs(10)
+    config = sharding.ShardingConfig(max_resources_per_stack=30)
+
+    shards = sharding.assign_shards(specs, shared_listener=True, config=config)
+
+    assert [len(shard) for shard in shards] == [3, 3, 3, 1]
+    assert sorted(name for shard in shards for name in shard) == sorted(specs)
+    assert sharding.assign_shards(specs, shared_listener=True, config=config) == shards
+
+
+def test_assign_shards_rejects_limits_above_cloudformation_maximum():
+    with pytest.raises(ValueError):
+        sharding.assign_shards(
+            _specs(1), True, sharding.ShardingConfig(max_resources_per_stack=600)
+        )
+
+
+def test_sharded_services_reference_only_the_base_stack():
+    app = cdk.App()
+    base = cdk.Stack(app, "base")
+    vpc = ec2.Vpc(base, "vpc")
+    cluster = containers.add_cluster(base, "cluster", containers.ClusterConfig(vpc=vpc))
+    listener = containers.add_shared_load_balancer(base, "shared-alb", cluster)
+
+    sharded = sharding.add_sharded_services(
+        app, base, cluster, _specs(5), listener=listener,
+        config=sharding.ShardingConfig(max_resources_per_stack=30),
+    )
+
+    assert [shard.stack_name for shard in sharded["shards"]] == ["base-shard-0", "base-shard-1"]
+    assert set(sharded["services"]) == {f"svc{index}" for index in range(5)}
+    for shard, service_count in zip(sharded["shards"], [3, 2]):
+        assert shard.dependencies == [base]
+        template = assertions.Template.from_stack(shard)
+        template.resource_count_is("AWS::ECS::Service", service_count)
+        template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 0)
+    base_template = assertions.Template.from_stack(base)
+    base_template.resource_count_is("AWS::ECS::Service", 0)
+    base_template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 1)
+
+
+def test_only_selected_shards_are_built():
+    app = cdk.App()
+    base = cdk.Stack(app, "base")
+    vpc = ec2.Vpc(base, "vpc")
+    cluster = containers.add_cluster(base, "cluster", containers.ClusterConfig(vpc=vpc))
+    listener = containers.add_shared_load_balancer(base, "shared-alb", cluster)
+
+    sharded = sharding.add_sharded_services(
+        app, base, cluster, _specs(5), listener=listener,
+        config=sharding.ShardingConfig(max_resources_per_stack=30), only_shards=[1],
+    )
+
+    assert [shard.stack_name for shard in sharded["shards"]] == ["base-shard-1"]
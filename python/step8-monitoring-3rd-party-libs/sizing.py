@@ -0,0 +1,52 @@
+from typing import Dict, List, TypedDict
+
+# Valid Fargate task sizes: CPU units mapped to the allowed memory values in MiB.
+FARGATE_TASK_SIZES: Dict[int, List[int]] = {
+    256: [512, 1024, 2048],
+    512: list(range(1024, 4096 + 1, 1024)),
+    1024: list(range(2048, 8192 + 1, 1024)),
+    2048: list(range(4096, 16384 + 1, 1024)),
+    4096: list(range(8192, 30720 + 1, 1024)),
+    8192: list(range(16384, 61440 + 1, 4096)),
+    16384: list(range(32768, 122880 + 1, 8192)),
+}
+
+
+class TaskSize(TypedDict):
+    cpu: int
+    memory_limit_mib: int
+
+
+def valid_memory_sizes(cpu: int) -> List[int]:
+    if cpu not in FARGATE_TASK_SIZES:
+        raise ValueError(
+            f"Invalid Fargate CPU value {cpu}, must be one of {list(FARGATE_TASK_SIZES)}"
+        )
+    return FARGATE_TASK_SIZES[cpu]
+
+
+def validate_task_size(cpu: int, memory_limit_mib: int):
+    memory_sizes = valid_memory_sizes(cpu)
+    if memory_limit_mib not in memory_sizes:
+        raise ValueError(
+            f"Invalid Fargate memory {memory_limit_mib} MiB for CPU {cpu}, "
+            f"must be one of {memory_sizes}"
+        )
+
+
+def smallest_task_size(vcpu: float, memory_mib: int) -> TaskSize:
+    """Return the smallest valid Fargate size with at least the requested vCPU and memory.
+
+    Sizes are ordered by CPU first, then memory, so a request is never moved
+    up to a larger CPU size if a smaller one can hold the memory.
+    """
+    cpu_units = vcpu * 1024
+    for cpu, memory_sizes in FARGATE_TASK_SIZES.items():
+        if cpu < cpu_units:
+            continue
+        for memory in memory_sizes:
+            if memory >= memory_mib:
+                return TaskSize(cpu=cpu, memory_limit_mib=memory)
+    raise ValueError(
+        f"No Fargate task size has {vcpu} vCPU and {memory_mib} MiB memory"
+    )
@@ -0,0 +1,48 @@
+import pytest
+import aws_cdk as cdk
+import containers
+import sizing
+
+
+def test_valid_task_sizes_pass_validation():
+    sizing.validate_task_size(256, 512)
+    sizing.validate_task_size(4096, 30720)
+    sizing.validate_task_size(16384, 122880)
+
+
+@pytest.mark.parametrize("cpu,memory", [(256, 4096), (512, 512), (1024, 1536), (3072, 8192)])
+def test_invalid_task_sizes_fail_validation(cpu, memory):
+    with pytest.raises(ValueError):
+        sizing.validate_task_size(cpu, memory)
+
+
+@pytest.mark.parametrize(
+    "vcpu,memory,expected",
+    [
+        (0.25, 512, (256, 512)),
+        (0.25, 3000, (512, 3072)),
+        (1, 100, (1024, 2048)),
+        (3, 10000, (4096, 10240)),
+        (8, 20000, (8192, 20480)),
+    ],
+)
+def test_smallest_task_size(vcpu, memory, expected):
+    size = sizing.smallest_task_size(vcpu, memory)
+    assert (size["cpu"], size["memory_limit_mib"]) == expected
+
+
+def test_smallest_task_size_fails_when_nothing_is_large_enough():
+    with pytest.raises(ValueError):
+        sizing.smallest_task_size(16, 200000)
+
+
+def test_task_definition_with_invalid_size_is_rejected():
+    stack = cdk.Stack()
+    taskcfg = containers.TaskConfig(cpu=256, memory_limit_mib=4096, family="test")
+    containercfg = containers.ContainerConfig(
+        image="public.ecr.aws/aws-containers/hello-app-runner:latest", tcp_ports=[8000]
+    )
+
+    with pytest.raises(ValueError):
+        containers.add_task_definition_with_container(stack, "test-taskdef", taskcfg, containercfg)
+    assert len(stack.node.children) == 0
@@ -0,0 +1,234 @@
+"""Template snapshots of my-container-infra.py with fast structural diffs.
+
+A snapshot holds the synthesized template of every stack in the cloud
+assembly, such as the base stack and its shards, with CDK bookkeeping removed
+and resources indexed by type and logical ID. It is saved together with the
+synth cache key, which covers the source files, the CDK context and the
+installed CDK library versions. CI can use it to skip a full synth when none
+of those have changed:
+
+    uv run snapshots.py status -c vpcname=my-vpc   # exit 0 if unchanged, 1 otherwise
+    cdk synth -c vpcname=my-vpc
+    uv run snapshots.py update -c vpcname=my-vpc   # diff cdk.out against the snapshot and save it
+
+Pass the same -c context values as to cdk synth.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, TypedDict
+import synth_cache
+
+DEFAULT_SNAPSHOT_FILE = os.path.join("snapshots", "my-container-infra.json")
+
+# Parts of a template that change without the infrastructure changing.
+_IGNORED_RESOURCE_TYPES = {"AWS::CDK::Metadata"}
+_IGNORED_SECTIONS = {"Parameters", "Rules", "Conditions"}
+
+
+ResourceIndex = Dict[str, Dict[str, Any]]
+
+
+class Snapshot(TypedDict):
+    resources: Dict[str, ResourceIndex]
+    outputs: Dict[str, Any]
+
+
+class AssemblySnapshot(TypedDict):
+    fingerprint: str
+    stacks: Dict[str, Snapshot]
+
+
+class SnapshotDiff(TypedDict):
+    added: List[str]
+    removed: List[str]
+    changed: Dict[str, List[str]]
+
+
+def normalize_template(template: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop CDK metadata, bootstrap parameters and rules from a template."""
+    resources = {}
+    for logical_id, resource in template.get("Resources", {}).items():
+        if resource.get("Type") in _IGNORED_RESOURCE_TYPES:
+            continue
+        resource = dict(resource)
+        resource.pop("Metadata", None)
+        resources[logical_id] = resource
+    normalized = {
+        key: value
+        for key, value in template.items()
+        if key not in _IGNORED_SECTIONS and key != "Resources"
+    }
+    normalized["Resources"] = resources
+    return normalized
+
+
+def index_resources(template: Dict[str, Any]) -> Dict[str, ResourceIndex]:
+    """Index the resources of a normalized template by type, then logical ID."""
+    index: Dict[str, ResourceIndex] = {}
+    for logical_id, resource in template.get("Resources", {}).items():
+        index.setdefault(resource["Type"], {})[logical_id] = resource
+    return index
+
+
+def make_snapshot(template: Dict[str, Any]) -> Snapshot:
+    normalized = normalize_template(template)
+    return Snapshot(resources=index_resources(normalized), outputs=normalized.get("Outputs", {}))
+
+
+def stack_templates(cdk_out: str) -> Dict[str, Dict[str, Any]]:
+    """Templates of the stacks in a cloud assembly, keyed by stack artifact ID."""
+    with open(os.path.join(cdk_out, "manifest.json")) as f:
+        manifest = json.load(f)
+    templates = {}
+    for artifact_id, artifact in manifest.get("artifacts", {}).items():
+        if artifact.get("type") != "aws:cloudformation:stack":
+            continue
+        with open(os.path.join(cdk_out, artifact["properties"]["templateFile"])) as f:
+            templates[artifact_id] = json.load(f)
+    return templates
+
+
+def snapshot_assembly(cdk_out: str, fingerprint: str) -> AssemblySnapshot:
+    return AssemblySnapshot(
+        fingerprint=fingerprint,
+        stacks={name: make_snapshot(template) for name, template in stack_templates(cdk_out).items()},
+    )
+
+
+def _changed_paths(old: Any, new: Any, path: str) -> List[str]:
+    if type(old) is not type(new):
+        return [path]
+    if isinstance(old, dict):
+        paths = []
+        for key in sorted(old.keys() | new.keys()):
+            if key not in old or key not in new:
+                paths.append(f"{path}/{key}")
+            else:
+                paths.extend(_changed_paths(old[key], new[key], f"{path}/{key}"))
+        return paths
+    if isinstance(old, list):
+        if len(old) != len(new):
+            return [path]
+        paths = []
+        for position, (old_item, new_item) in enumerate(zip(old, new)):
+            paths.extend(_changed_paths(old_item, new_item, f"{path}/{position}"))
+        return paths
+    return [] if old == new else [path]
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> SnapshotDiff:
+    """Structural diff of two snapshots.
+
+    Resources are named as Type/LogicalId, changed properties as paths
+    below the resource, e.g. /Properties/DesiredCount.
+    """
+    diff = SnapshotDiff(added=[], removed=[], changed={})
+    for resource_type in sorted(old["resources"].keys() | new["resources"].keys()):
+        old_resources = old["resources"].get(resource_type, {})
+        new_resources = new["resources"].get(resource_type, {})
+        for logical_id in sorted(old_resources.keys() | new_resources.keys()):
+            name = f"{resource_type}/{logical_id}"
+            if logical_id not in old_resources:
+                diff["added"].append(name)
+            elif logical_id not in new_resources:
+                diff["removed"].append(name)
+            else:
+                paths = _changed_paths(old_resources[logical_id], new_resources[logical_id], "")
+                if paths:
+                    diff["changed"][name] = paths
+    output_paths = _changed_paths(old["outputs"], new["outputs"], "")
+    if output_paths:
+        diff["changed"]["Outputs"] = output_paths
+    return diff
+
+
+def diff_assemblies(old: AssemblySnapshot, new: AssemblySnapshot) -> Dict[str, SnapshotDiff]:
+    """Diff of each stack that changed; added or removed stacks diff against an empty one."""
+    empty = Snapshot(resources={}, outputs={})
+    diffs = {}
+    for name in sorted(old["stacks"].keys() | new["stacks"].keys()):
+        diff = diff_snapshots(old["stacks"].get(name, empty), new["stacks"].get(name, empty))
+        if not is_empty(diff):
+            diffs[name] = diff
+    return diffs
+
+
+def is_empty(diff: SnapshotDiff) -> bool:
+    return not (diff["added"] or diff["removed"] or diff["changed"])
+
+
+def fingerprint(context: Dict[str, Any] | None = None) -> str:
+    """Synth cache key of my-container-infra.py, with context added to the CDK context."""
+    cdk_context = {**synth_cache.cdk_context(), **(context or {})}
+    catalog_file = cdk_context.get("catalog", "services.toml")
+    return synth_cache.cache_key(synth_cache.DEFAULT_SOURCES + [catalog_file], context=cdk_context)
+
+
+def load_snapshot(path: str) -> AssemblySnapshot | None:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_snapshot(path: str, snapshot: AssemblySnapshot):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(snapshot, f, indent=1, sort_keys=True)
+
+
+def format_diff(diff: SnapshotDiff) -> str:
+    lines = [f"+ {name}" for name in diff["added"]]
+    lines += [f"- {name}" for name in diff["removed"]]
+    for name, paths in diff["changed"].items():
+        lines.append(f"~ {name}")
+        lines += [f"    {path}" for path in paths]
+    return "\n".join(lines) if lines else "No changes"
+
+
+def format_diffs(diffs: Dict[str, SnapshotDiff]) -> str:
+    if not diffs:
+        return "No changes"
+    return "\n".join(f"Stack {name}:\n{format_diff(diff)}" for name, diff in diffs.items())
+
+
+def _parse_context(values: List[str]) -> Dict[str, str]:
+    context = {}
+    for value in values:
+        key, separator, item = value.partition("=")
+        if not separator:
+            raise ValueError(f"Context {value} is not KEY=VALUE")
+        context[key] = item
+    return context
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["status", "update"])
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_FILE)
+    parser.add_argument("--cdk-out", default="cdk.out")
+    parser.add_argument("-c", "--context", action="append", default=[], help="KEY=VALUE, as for cdk synth")
+    args = parser.parse_args(argv)
+
+    key = fingerprint(_parse_context(args.context))
+    previous = load_snapshot(args.snapshot)
+
+    if args.command == "status":
+        if previous is not None and previous["fingerprint"] == key:
+            print("Inputs unchanged since last snapshot, synth can be skipped")
+            return 0
+        print("Inputs changed since last snapshot, synth needed")
+        return 1
+
+    snapshot = snapshot_assembly(args.cdk_out, key)
+    if previous is not None:
+        print(format_diffs(diff_assemblies(previous, snapshot)))
+    save_snapshot(args.snapshot, snapshot)
+    print(f"Snapshot of {len(snapshot['stacks'])} stacks saved to {args.snapshot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import aws_cdk as cdk
+from aws_cdk import (
+    assertions,
+    aws_ec2 as ec2,
+    aws_sns as sns,
+)
+import containers
+import snapshots
+
+
+def _service_template(desired_count: int) -> dict:
+    stack = cdk.Stack()
+    vpc = ec2.Vpc(stack, "vpc")
+    cluster = containers.add_cluster(stack, "test-cluster", containers.ClusterConfig(vpc=vpc))
+    taskdef = containers.add_task_definition_with_container(
+        stack,
+        "test-taskdef",
+        containers.TaskConfig(cpu=512, memory_limit_mib=1024, family="test"),
+        containers.ContainerConfig(
+            image="public.ecr.aws/aws-containers/hello-app-runner:latest",
+            tcp_ports=[8000],
+        ),
+    )
+    containers.add_service(stack, "test-service", cluster, taskdef, 80, desired_count)
+    return assertions.Template.from_stack(stack).to_json()
+
+
+def test_snapshot_indexes_resources_by_type_and_logical_id():
+    snapshot = snapshots.make_snapshot(_service_template(1))
+
+    assert len(snapshot["resources"]["AWS::ECS::Service"]) == 1
+    assert len(snapshot["resources"]["AWS::ECS::TaskDefinition"]) == 1
+    assert "AWS::CDK::Metadata" not in snapshot["resources"]
+    for resources in snapshot["resources"].values():
+        for resource in resources.values():
+            assert "Metadata" not in resource
+
+
+def test_diff_reports_changed_property_paths():
+    old = snapshots.make_snapshot(_service_template(1))
+    new = snapshots.make_snapshot(_service_template(3))
+
+    diff = snapshots.diff_snapshots(old, new)
+
+    assert diff["added"] == []
+    assert diff["removed"] == []
+    [(name, paths)] = diff["changed"].items()
+    assert name.startswith("AWS::ECS::Service/")
+    assert paths == ["/Properties/DesiredCount"]
+
+
+def test_diff_reports_added_and_removed_resources():
+    old = snapshots.Snapshot(
+        resources={"AWS::SNS::Topic": {"TopicA": {"Type": "AWS::SNS::Topic"}}},
+        outputs={},
+    )
+    new = snapshots.Snapshot(
+        resources={"AWS::SQS::Queue": {"QueueB": {"Type": "AWS::SQS::Queue"}}},
+        outputs={},
+    )
+
+    diff = snapshots.diff_snapshots(old, new)
+
+    assert diff["added"] == ["AWS::SQS::Queue/QueueB"]
+    assert diff["removed"] == ["AWS::SNS::Topic/TopicA"]
+    assert not snapshots.is_empty(diff)
+    assert snapshots.is_empty(snapshots.diff_snapshots(new, new))
+
+
+def test_status_covers_cdk_context(tmp_path):
+    snapshot_file = tmp_path / "snapshot.json"
+    snapshots.save_snapshot(
+        str(snapshot_file), snapshots.AssemblySnapshot(fingerprint=snapshots.fingerprint(), stacks={})
+    )
+    args = ["status", "--snapshot", str(snapshot_file)]
+
+    assert snapshots.main(args) == 0
+    assert snapshots.main(args + ["-c", "vpcname=my-vpc"]) == 1
+
+
+def _synth_assembly(outdir: str, shard_topics: int):
+    app = cdk.App(outdir=outdir)
+    base = cdk.Stack(app, "base")
+    sns.Topic(base, "topic")
+    shard = cdk.Stack(app, "base-shard-0")
+    for index in range(shard_topics):
+        sns.Topic(shard, f"topic-{index}")
+    app.synth()
+
+
+def test_update_diffs_every_stack_in_the_assembly(tmp_path):
+    snapshot_file = str(tmp_path / "snapshot.json")
+    _synth_assembly(str(tmp_path / "old"), 1)
+    _synth_assembly(str(tmp_path / "new"), 2)
+
+    assert snapshots.main(["update", "--cdk-out", str(tmp_path / "old"), "--snapshot", snapshot_file]) == 0
+    old = snapshots.load_snapshot(snapshot_file)
+    new = snapshots.snapshot_assembly(str(tmp_path / "new"), old["fingerprint"])
+
+    assert set(old["stacks"]) == {"base", "base-shard-0"}
+    diffs = snapshots.diff_assemblies(old, new)
+    assert list(diffs) == ["base-shard-0"]
+    assert len(diffs["base-shard-0"]["added"]) == 1
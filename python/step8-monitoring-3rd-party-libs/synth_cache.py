@@ -0,0 +1,140 @@
+"""Content-addressed cache of synthesized cloud assemblies.
+
+The cache key covers everything a synth of my-container-infra.py depends on:
+the source files holding the service, task and monitoring configuration and
+the helper modules, the CDK context, the target account and region, and the
+versions of the CDK libraries. This module does not import aws_cdk, so a cache
+hit returns the cached cloud assembly without starting the jsii runtime.
+
+Set SYNTH_CACHE=off to always synthesize.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from importlib import metadata
+from typing import Any, Dict, List
+
+DEFAULT_SOURCES = [
+    "my-container-infra.py",
+    "catalog.py",
+    "infra.py",
+    "containers.py",
+    "monitoring.py",
+    "networking.py",
+    "sharding.py",
+    "sizing.py",
+]
+DEFAULT_PACKAGES = ["aws-cdk-lib", "cdk-monitoring-constructs", "constructs"]
+DEFAULT_ENV_VARS = ["CDK_DEFAULT_ACCOUNT", "CDK_DEFAULT_REGION"]
+DEFAULT_CACHE_DIR = os.getenv("SYNTH_CACHE_DIR", ".synth-cache")
+
+
+def enabled() -> bool:
+    return os.getenv("SYNTH_CACHE", "on") != "off"
+
+
+def cdk_context(cdk_json: str = "cdk.json") -> Dict[str, Any]:
+    """CDK context from cdk.json, overridden by what the CDK CLI passes in."""
+    context: Dict[str, Any] = {}
+    if os.path.exists(cdk_json):
+        with open(cdk_json) as f:
+            context.update(json.load(f).get("context", {}))
+    context.update(json.loads(os.getenv("CDK_CONTEXT_JSON", "{}")))
+    return context
+
+
+def package_versions(packages: List[str]) -> Dict[str, str | None]:
+    versions: Dict[str, str | None] = {}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def cache_key(
+    sources: List[str] = DEFAULT_SOURCES,
+    context: Dict[str, Any] | None = None,
+    packages: List[str] = DEFAULT_PACKAGES,
+    env_vars: List[str] = DEFAULT_ENV_VARS,
+) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(sources):
+        digest.update(path.encode())
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    inputs = {
+        "context": cdk_context() if context is None else context,
+        "packages": package_versions(packages),
+        "env": {name: os.getenv(name) for name in env_vars},
+    }
+    digest.update(json.dumps(inputs, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def restore(key: str, outdir: str, cache_dir: str = DEFAULT_CACHE_DIR) -> bool:
+    """Copy the cached cloud assembly for key to outdir, if there is one."""
+    cached = os.path.join(cache_dir, key)
+    if not enabled() or not os.path.isdir(cached):
+        return False
+    shutil.copytree(cached, outdir, dirs_exist_ok=True)
+    return True
+
+
+def _assembly_files(outdir: str, prefix: str = "") -> List[str]:
+    """Paths, relative to outdir, of the manifest and the files it lists."""
+    files = [os.path.join(prefix, name) for name in ("manifest.json", "cdk.out")]
+    with open(os.path.join(outdir, prefix, "manifest.json")) as f:
+        manifest = json.load(f)
+    for artifact in manifest.get("artifacts", {}).values():
+        properties = artifact.get("properties", {})
+        if "directoryName" in properties:
+            files += _assembly_files(outdir, os.path.join(prefix, properties["directoryName"]))
+        for name in (properties.get("templateFile"), properties.get("file"), artifact.get("additionalMetadataFile")):
+            if name:
+                files.append(os.path.join(prefix, name))
+        if artifact.get("type") == "cdk:asset-manifest":
+            with open(os.path.join(outdir, prefix, properties["file"])) as f:
+                assets = json.load(f)
+            files += [os.path.join(prefix, asset["source"]["path"]) for asset in assets.get("files", {}).values()]
+            files += [
+                os.path.join(prefix, asset["source"]["directory"])
+                for asset in assets.get("dockerImages", {}).values()
+                if "directory" in asset["source"]
+            ]
+    return files
+
+
+def store(key: str, outdir: str, cache_dir: str = DEFAULT_CACHE_DIR):
+    """Save the cloud assembly in outdir under key.
+
+    Only the manifest and the files it lists are saved, not other directories
+    that happen to be in outdir.
+    """
+    if not enabled():
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, key)
+    if os.path.isdir(cached):
+        return
+    # Copy to a temporary directory first, so a concurrent restore never sees
+    # a half-written assembly.
+    staging = tempfile.mkdtemp(dir=cache_dir)
+    for name in _assembly_files(outdir):
+        # Assets outside the assembly are not part of it.
+        if os.path.isabs(name):
+            continue
+        source = os.path.join(outdir, name)
+        target = os.path.join(staging, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, target, dirs_exist_ok=True)
+        elif os.path.exists(source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+    try:
+        os.rename(staging, cached)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
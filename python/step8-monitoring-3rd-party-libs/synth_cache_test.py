@@ -0,0 +1,86 @@
+import json
+import synth_cache
+
+
+def _write_source(tmp_path, content):
+    source = tmp_path / "my-container-infra.py"
+    source.write_text(content)
+    return [str(source)]
+
+
+def test_cache_key_changes_with_sources_context_and_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("CDK_DEFAULT_REGION", raising=False)
+    sources = _write_source(tmp_path, "desired_count = 2\n")
+    key = synth_cache.cache_key(sources, context={})
+
+    assert synth_cache.cache_key(sources, context={}) == key
+    assert synth_cache.cache_key(sources, context={"vpcname": "my-vpc"}) != key
+    monkeypatch.setenv("CDK_DEFAULT_REGION", "eu-north-1")
+    assert synth_cache.cache_key(sources, context={}) != key
+    monkeypatch.delenv("CDK_DEFAULT_REGION")
+    _write_source(tmp_path, "desired_count = 3\n")
+    assert synth_cache.cache_key(sources, context={}) != key
+
+
+def test_cache_key_includes_library_versions(tmp_path):
+    sources = _write_source(tmp_path, "")
+
+    with_cdk = synth_cache.cache_key(sources, context={}, packages=["aws-cdk-lib"])
+    without_cdk = synth_cache.cache_key(sources, context={}, packages=[])
+
+    assert with_cdk != without_cdk
+
+
+def test_context_from_cli_overrides_cdk_json(tmp_path, monkeypatch):
+    cdk_json = tmp_path / "cdk.json"
+    cdk_json.write_text('{"app": "x", "context": {"vpcname": "a", "other": 1}}')
+    monkeypatch.setenv("CDK_CONTEXT_JSON", '{"vpcname": "b"}')
+
+    assert synth_cache.cdk_context(str(cdk_json)) == {"vpcname": "b", "other": 1}
+
+
+def test_store_and_restore_cloud_assembly(tmp_path, monkeypatch):
+    monkeypatch.delenv("SYNTH_CACHE", raising=False)
+    cache_dir = str(tmp_path / "cache")
+    outdir = tmp_path / "cdk.out"
+    outdir.mkdir()
+    (outdir / "manifest.json").write_text("{}")
+
+    assert not synth_cache.restore("key", str(tmp_path / "restored"), cache_dir)
+    synth_cache.store("key", str(outdir), cache_dir)
+    assert synth_cache.restore("key", str(tmp_path / "restored"), cache_dir)
+    assert (tmp_path / "restored" / "manifest.json").read_text() == "{}"
+
+    monkeypatch.setenv("SYNTH_CACHE", "off")
+    assert not synth_cache.restore("key", str(tmp_path / "again"), cache_dir)
+
+
+def test_store_saves_only_the_files_the_manifest_lists(tmp_path, monkeypatch):
+    monkeypatch.delenv("SYNTH_CACHE", raising=False)
+    cache_dir = str(tmp_path / "cache")
+    outdir = tmp_path / "cdk.out"
+    (outdir / "asset.1234").mkdir(parents=True)
+    (outdir / "asset.1234" / "index.html").write_text("hello")
+    (outdir / "environments" / "prod").mkdir(parents=True)
+    (outdir / "environments" / "prod" / "manifest.json").write_text("{}")
+    (outdir / "manifest.json").write_text(json.dumps({
+        "artifacts": {
+            "stack.assets": {"type": "cdk:asset-manifest", "properties": {"file": "stack.assets.json"}},
+            "stack": {
+                "type": "aws:cloudformation:stack",
+                "properties": {"templateFile": "stack.template.json"},
+                "additionalMetadataFile": "stack.metadata.json",
+            },
+        }
+    }))
+    (outdir / "stack.assets.json").write_text(json.dumps({"files": {"1234": {"source": {"path": "asset.1234"}}}}))
+    (outdir / "stack.template.json").write_text("{}")
+    (outdir / "stack.metadata.json").write_text("{}")
+
+    synth_cache.store("key", str(outdir), cache_dir)
+
+    cached = tmp_path / "cache" / "key"
+    assert sorted(path.name for path in cached.iterdir()) == [
+        "asset.1234", "manifest.json", "stack.assets.json", "stack.metadata.json", "stack.template.json",
+    ]
+    assert (cached / "asset.1234" / "index.html").read_text() == "hello"
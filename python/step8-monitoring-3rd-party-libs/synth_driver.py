@@ -0,0 +1,144 @@
+"""Synthesize the container infrastructure for several environments in parallel.
+
+Each environment gets a Stage built by infra.add_container_infra, synthesized
+in a process pool into a cloud assembly of its own:
+
+    uv run synth_driver.py 111111111111/eu-west-1 222222222222/us-east-1 --workers 2
+    cdk deploy --app cdk.out.environments/eu-west-1-111111111111 'eu-west-1-111111111111/*'
+
+Environments are given as account/region, optionally with a name, e.g.
+prod=111111111111/eu-west-1. Unnamed environments are named region-account,
+since stage names must start with a letter. Assemblies are reused from the
+synth cache when nothing they depend on has changed.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NotRequired, TypedDict
+import synth_cache
+
+# Next to cdk.out rather than in it, so that the assemblies of the main app and
+# of the environments are cached independently.
+DEFAULT_OUTDIR = "cdk.out.environments"
+
+
+class EnvironmentConfig(TypedDict):
+    name: str
+    region: str
+    account: NotRequired[str]
+
+
+class SynthTiming(TypedDict):
+    name: str
+    outdir: str
+    cached: bool
+    construct_seconds: float
+    synth_seconds: float
+
+
+def parse_environment(value: str) -> EnvironmentConfig:
+    """Parse [name=][account/]region into an environment."""
+    name, _, target = value.rpartition("=")
+    account, _, region = target.rpartition("/")
+    if not region:
+        raise ValueError(f"Environment {value} has no region")
+    environment = EnvironmentConfig(name=name or (f"{region}-{account}" if account else region), region=region)
+    if not environment["name"][0].isalpha():
+        raise ValueError(f"Environment name {environment['name']} must start with a letter")
+    if account:
+        environment["account"] = account
+    return environment
+
+
+def synth_environment(
+    environment: EnvironmentConfig, catalog_file: str, outdir: str = DEFAULT_OUTDIR
+) -> SynthTiming:
+    """Synthesize one environment into outdir/<name>. Runs in a worker process."""
+    assembly_dir = os.path.join(outdir, environment["name"])
+    key = synth_cache.cache_key(
+        synth_cache.DEFAULT_SOURCES + [catalog_file],
+        context={**synth_cache.cdk_context(), "environment": environment},
+        env_vars=[],
+    )
+    if synth_cache.restore(key, assembly_dir):
+        return SynthTiming(
+            name=environment["name"], outdir=assembly_dir, cached=True,
+            construct_seconds=0.0, synth_seconds=0.0,
+        )
+
+    # Imported here, so that only the worker processes start the jsii runtime.
+    import aws_cdk as cdk
+    import catalog
+    import infra
+
+    start = time.perf_counter()
+    service_catalog = catalog.load_catalog(catalog_file)
+    app = cdk.App(outdir=assembly_dir, context=synth_cache.cdk_context())
+    env = cdk.Environment(account=environment.get("account"), region=environment["region"])
+    stage = cdk.Stage(app, environment["name"], env=env)
+    infra.add_container_infra(stage, service_catalog, env)
+    constructed = time.perf_counter()
+    app.synth()
+    synthesized = time.perf_counter()
+    synth_cache.store(key, assembly_dir)
+    return SynthTiming(
+        name=environment["name"],
+        outdir=assembly_dir,
+        cached=False,
+        construct_seconds=constructed - start,
+        synth_seconds=synthesized - constructed,
+    )
+
+
+def synth_all(
+    environments: List[EnvironmentConfig],
+    catalog_file: str,
+    outdir: str = DEFAULT_OUTDIR,
+    workers: int | None = None,
+) -> List[SynthTiming]:
+    names = [environment["name"] for environment in environments]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate environment names {duplicates}")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(synth_environment, environment, catalog_file, outdir)
+            for environment in environments
+        ]
+        return [future.result() for future in futures]
+
+
+def format_summary(timings: List[SynthTiming], wall_seconds: float) -> str:
+    lines = [f"{'environment':<30} {'construct s':>12} {'synth s':>10}  assembly"]
+    for timing in timings:
+        if timing["cached"]:
+            lines.append(f"{timing['name']:<30} {'cached':>12} {'cached':>10}  {timing['outdir']}")
+        else:
+            lines.append(
+                f"{timing['name']:<30} {timing['construct_seconds']:>12.2f} "
+                f"{timing['synth_seconds']:>10.2f}  {timing['outdir']}"
+            )
+    total = sum(timing["construct_seconds"] + timing["synth_seconds"] for timing in timings)
+    lines.append(f"{len(timings)} environments in {wall_seconds:.2f}s wall clock, {total:.2f}s of work")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("environments", nargs="+", help="[name=][account/]region")
+    parser.add_argument("--catalog", default=synth_cache.cdk_context().get("catalog", "services.toml"))
+    parser.add_argument("--outdir", default=DEFAULT_OUTDIR)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    args = parser.parse_args(argv)
+
+    environments = [parse_environment(value) for value in args.environments]
+    start = time.perf_counter()
+    timings = synth_all(environments, args.catalog, args.outdir, args.workers)
+    print(format_summary(timings, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
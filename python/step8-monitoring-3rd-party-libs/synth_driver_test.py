@@ -0,0 +1,61 @@
+import json
+import os
+import pytest
+import synth_driver
+
+
+def test_parse_environment():
+    assert synth_driver.parse_environment("prod=111111111111/eu-west-1") == {
+        "name": "prod", "account": "111111111111", "region": "eu-west-1"
+    }
+    assert synth_driver.parse_environment("111111111111/eu-west-1")["name"] == "eu-west-1-111111111111"
+    assert synth_driver.parse_environment("eu-north-1") == {"name": "eu-north-1", "region": "eu-north-1"}
+    with pytest.raises(ValueError):
+        synth_driver.parse_environment("111111111111/")
+    with pytest.raises(ValueError):
+        synth_driver.parse_environment("1prod=111111111111/eu-west-1")
+
+
+def test_synth_all_rejects_duplicate_names():
+    environments = [synth_driver.parse_environment("eu-west-1")] * 2
+
+    with pytest.raises(ValueError):
+        synth_driver.synth_all(environments, "services.toml")
+
+
+def test_synth_environment_writes_a_stage_per_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("SYNTH_CACHE", "off")
+    environment = synth_driver.parse_environment("test=111111111111/eu-north-1")
+
+    timing = synth_driver.synth_environment(environment, "services.toml", str(tmp_path))
+
+    assert timing["outdir"] == os.path.join(str(tmp_path), "test")
+    assert not timing["cached"]
+    manifest = json.loads((tmp_path / "test" / "assembly-test" / "manifest.json").read_text())
+    [stack] = [
+        artifact for artifact in manifest["artifacts"].values()
+        if artifact.get("displayName") == "test/my-container-infra"
+    ]
+    assert stack["environment"] == "aws://111111111111/eu-north-1"
+
+
+def test_synth_environment_without_a_name(tmp_path, monkeypatch):
+    monkeypatch.setenv("SYNTH_CACHE", "off")
+    environment = synth_driver.parse_environment("111111111111/eu-west-1")
+
+    timing = synth_driver.synth_environment(environment, "services.toml", str(tmp_path))
+
+    assert timing["outdir"] == os.path.join(str(tmp_path), "eu-west-1-111111111111")
+    assert (tmp_path / "eu-west-1-111111111111" / "assembly-eu-west-1-111111111111" / "manifest.json").exists()
+
+
+def test_summary_lists_every_environment():
+    timings = [
+        synth_driver.SynthTiming(name="a", outdir="out/a", cached=False, construct_seconds=1.0, synth_seconds=2.0),
+        synth_driver.SynthTiming(name="b", outdir="out/b", cached=True, construct_seconds=0.0, synth_seconds=0.0),
+    ]
+
+    summary = synth_driver.format_summary(timings, 3.5)
+
+    assert "cached" in summary.splitlines()[2]
+    assert summary.splitlines()[-1] == "2 environments in 3.50s wall clock, 3.00s of work"